@@ -0,0 +1,116 @@
+"""
+Llamaball - Text Normalization Benchmark
+File Purpose: Compare FileParser._clean_text with the previous multi-pass cleaner
+Primary Functions: legacy_clean_text, make_corpus, main
+Inputs: --megabytes of synthetic text, --repeat count
+Outputs: Best time and throughput per cleaner, the paragraphs each one leaves,
+    and with --chunk the time to chunk each result
+
+Run from the repository root (or with llamaball installed):
+
+    PYTHONPATH=. python benchmarks/bench_clean_text.py --megabytes 64
+
+The synthetic corpus mixes prose paragraphs, CRLF line endings, tab and
+space runs, indented lines, form feeds and stray control characters, as
+extracted PDF and text files do.
+"""
+
+import argparse
+import random
+import re
+import time
+
+from llamaball.chunker import Chunker
+from llamaball.parsers import FileParser
+
+WORDS = (
+    "the index stores every chunk once and search scores each vector with "
+    "a resident matrix while ingestion streams files through bounded queues"
+).split()
+
+
+# Mostly single spaces, as in real text; control characters are rare
+SEPARATORS = [" "] * 12 + ["  ", "\t", " \t"]
+
+
+def legacy_clean_text(text: str) -> str:
+    """The cleaner before the single-pass rewrite, kept for comparison."""
+    if not text:
+        return ""
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]", "", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\n\s*\n\s*\n", "\n\n", text)
+    return text.strip()
+
+
+def make_corpus(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    parts = []
+    size = 0
+    while size < target:
+        lines = []
+        for _ in range(rng.randint(1, 6)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 18))]
+            separators = [rng.choice(SEPARATORS) for _ in words]
+            if rng.random() < 0.01:
+                separators[0] += "\x00"
+            line = "".join(w + s for w, s in zip(words, separators)).rstrip()
+            lines.append(
+                rng.choice(["", "", "    "]) + line + rng.choice(["", " ", "\t"])
+            )
+        newline = rng.choice(["\n", "\r\n"])
+        paragraph = newline.join(lines)
+        parts.append(paragraph)
+        parts.append(
+            rng.choice([newline * 2, newline * 3, newline + "  " + newline, "\x0c"])
+        )
+        size += len(paragraph) + 2
+    return "".join(parts)
+
+
+def _time(fn, text: str, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--megabytes", type=float, default=32.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--chunk",
+        action="store_true",
+        help="Also time chunking each cleaned text (needs the cl100k_base encoding)",
+    )
+    args = parser.parse_args()
+    chunker = Chunker() if args.chunk else None
+
+    text = make_corpus(args.megabytes)
+    megabytes = len(text.encode("utf-8")) / 2**20
+    print(f"Corpus: {megabytes:.1f} MB, {len(text):,} characters")
+
+    cleaners = [
+        ("legacy (4 passes)", legacy_clean_text),
+        ("single pass", FileParser()._clean_text),
+    ]
+    for name, fn in cleaners:
+        seconds, cleaned = _time(fn, text, args.repeat)
+        paragraphs = len(re.split(r"\n\s*\n", cleaned))
+        print(
+            f"{name:>18}: {seconds:7.3f}s  {megabytes / seconds:8.1f} MB/s  "
+            f"{paragraphs:>9,} paragraphs  {len(cleaned):>12,} chars"
+        )
+        if chunker is not None:
+            seconds, chunks = _time(chunker.chunk, cleaned, 1)
+            print(f"{'':>18}  chunked in {seconds:.3f}s into {len(chunks):,} chunks")
+
+
+if __name__ == "__main__":
+    main()
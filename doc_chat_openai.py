@@ -14,44 +14,49 @@ Usage:
   python doc_chat.py ingest --dir PATH [--db PATH] [--model MODEL_NAME]
   python doc_chat.py chat   [--db PATH] [--model MODEL_NAME] [--topk N]
 """
+
+import csv
+import json
+import logging
 import os
-import sys
-import typer
+import re
 import sqlite3
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import numpy as np
-from numpy.linalg import norm
 import openai
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import typer
+from markdown_it import MarkdownIt
+from numpy.linalg import norm
 from prompt_toolkit import PromptSession
 from prompt_toolkit.formatted_text import HTML
-from prompt_toolkit.styles import Style
 from prompt_toolkit.shortcuts import print_formatted_text
-from markdown_it import MarkdownIt
-import re
-import logging
-import json
-import csv
-import tiktoken
+from prompt_toolkit.styles import Style
 from tqdm import tqdm
-import subprocess
-import tempfile
 
-app = typer.Typer(help="Document Chat CLI: ingest files, build embeddings, and chat via LLM.")
+from llamaball.chunker import Chunker
+from llamaball.concurrency import AIMDController
+
+app = typer.Typer(
+    help="Document Chat CLI: ingest files, build embeddings, and chat via LLM."
+)
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
-# Token limit for embedding models (max 8191 tokens)
-MAX_TOKENS = 8191
-
 # CLI styling for prompt_toolkit HTML tokens
-CLI_STYLE = Style.from_dict({
-    "b": "bold ansigreen",
-    "ans": "ansicyan",
-    "i": "italic",
-    "u": "underline ansiyellow"
-})
+CLI_STYLE = Style.from_dict(
+    {
+        "b": "bold ansigreen",
+        "ans": "ansicyan",
+        "i": "italic",
+        "u": "underline ansiyellow",
+    }
+)
 
 # Markdown renderer for styling
 md = MarkdownIt()
@@ -62,9 +67,12 @@ FILE_LOADERS = {
     ".md": lambda p: open(p, "r", encoding="utf-8").read(),
     ".py": lambda p: open(p, "r", encoding="utf-8").read(),
     ".json": lambda p: json.dumps(json.load(open(p, "r", encoding="utf-8")), indent=2),
-    ".csv": lambda p: "\n".join([", ".join(row) for row in csv.reader(open(p, "r", encoding="utf-8"))])
+    ".csv": lambda p: "\n".join(
+        [", ".join(row) for row in csv.reader(open(p, "r", encoding="utf-8"))]
+    ),
 }
 
+
 # Helper to convert markdown to prompt_toolkit HTML
 def render_markdown_to_html(md_text: str) -> str:
     """
@@ -73,15 +81,16 @@ def render_markdown_to_html(md_text: str) -> str:
     """
     html = md.render(md_text)
     # Convert links to underlined text with URL in parentheses
-    html = re.sub(r'<a href="([^"]+)">([^<]+)</a>', r'<u>\2</u> (\1)', html)
+    html = re.sub(r'<a href="([^"]+)">([^<]+)</a>', r"<u>\2</u> (\1)", html)
     # Map tags to prompt_toolkit HTML
-    html = html.replace('<strong>', '<b>').replace('</strong>', '</b>')
-    html = html.replace('<em>', '<i>').replace('</em>', '</i>')
-    html = html.replace('<ul>', '').replace('</ul>', '')
-    html = html.replace('<li>', '• ').replace('</li>', '\n')
-    html = html.replace('<p>', '').replace('</p>', '\n\n')
+    html = html.replace("<strong>", "<b>").replace("</strong>", "</b>")
+    html = html.replace("<em>", "<i>").replace("</em>", "</i>")
+    html = html.replace("<ul>", "").replace("</ul>", "")
+    html = html.replace("<li>", "• ").replace("</li>", "\n")
+    html = html.replace("<p>", "").replace("</p>", "\n\n")
     return html.strip()
 
+
 # Default parameters
 DEFAULT_DB_PATH = ".clai.db"
 DEFAULT_MODEL_NAME = "text-embedding-3-small"  # OpenAI embedding model
@@ -92,6 +101,7 @@ MAX_CHUNK_SIZE = 32000
 # Initialize OpenAI client
 client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
+
 def init_db(db_path: str) -> sqlite3.Connection:
     """
     Initialize SQLite database with tables for documents and embeddings.
@@ -133,32 +143,28 @@ def init_db(db_path: str) -> sqlite3.Connection:
 
 def get_embedding(text: str, model: str) -> np.ndarray:
     """Get embedding from OpenAI API"""
-    response = client.embeddings.create(
-        input=text,
-        model=model
-    )
+    response = client.embeddings.create(input=text, model=model)
     embedding = np.array(response.data[0].embedding, dtype=np.float32)
     return embedding
 
+
 def _insert_chunk(cursor, filename, idx, text):
     cursor.execute(
         "INSERT OR IGNORE INTO documents (filename, chunk_idx, content) VALUES (?, ?, ?)",
-        (filename, idx, text)
+        (filename, idx, text),
     )
     cursor.connection.commit()
 
+
 # --- Function-calling tool helpers ---
 def run_python_code_func(code: str) -> str:
     """Execute Python code in a temp file and return stdout or stderr."""
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
             f.write(code)
             temp_path = f.name
         proc = subprocess.run(
-            [sys.executable, temp_path],
-            capture_output=True,
-            text=True,
-            check=False
+            [sys.executable, temp_path], capture_output=True, text=True, check=False
         )
         os.unlink(temp_path)
         if proc.stderr:
@@ -167,17 +173,15 @@ def run_python_code_func(code: str) -> str:
     except Exception as e:
         return f"Error running Python code: {e}"
 
+
 def run_bash_command_func(command: str) -> str:
     """Execute a bash command safely and return stdout or stderr."""
-    unsafe = ['sudo', 'rm -rf', '>', '>>', '|', '&', ';']
+    unsafe = ["sudo", "rm -rf", ">", ">>", "|", "&", ";"]
     if any(tok in command for tok in unsafe):
         return "Error: Command contains unsafe operations"
     try:
         proc = subprocess.run(
-            ['sh', '-c', command],
-            capture_output=True,
-            text=True,
-            check=False
+            ["sh", "-c", command], capture_output=True, text=True, check=False
         )
         if proc.stderr:
             return f"Error:\n{proc.stderr}"
@@ -185,20 +189,25 @@ def run_bash_command_func(command: str) -> str:
     except Exception as e:
         return f"Error running bash command: {e}"
 
-def ingest_files(directory: str, db_path: str, model_name: str, recursive: bool) -> None:
+
+def ingest_files(
+    directory: str, db_path: str, model_name: str, recursive: bool
+) -> None:
     """
     Ingest files with plugin loaders, chunk by token boundaries,
     skip unchanged files, and enqueue embedding tasks.
     """
     # Determine walker
-    walker = os.walk(directory) if recursive else [(directory, [], os.listdir(directory))]
+    walker = (
+        os.walk(directory) if recursive else [(directory, [], os.listdir(directory))]
+    )
 
     # Setup DB
     conn = init_db(db_path)
     c = conn.cursor()
 
     # Always use cl100k_base tokenizer for embeddings
-    encoder = tiktoken.get_encoding("cl100k_base")
+    chunker = Chunker.for_model(model_name)
     logger.info(f"Using 'cl100k_base' tokenizer for model {model_name}")
 
     embed_tasks = []
@@ -227,47 +236,49 @@ def ingest_files(directory: str, db_path: str, model_name: str, recursive: bool)
             if not content:
                 continue
 
-            # Split on paragraph boundaries
-            paragraphs = re.split(r'\n\s*\n', content)
-            token_buffer = []
-            for para in paragraphs:
-                para_tokens = encoder.encode(para)
-                if len(token_buffer) + len(para_tokens) > MAX_TOKENS:
-                    # flush buffer
-                    text_chunk = encoder.decode(token_buffer)
-                    # insert chunk
-                    _insert_chunk(c, rel_path, len(embed_tasks), text_chunk)
-                    embed_tasks.append((rel_path, text_chunk))
-                    token_buffer = para_tokens
-                else:
-                    token_buffer += para_tokens
-            if token_buffer:
-                text_chunk = encoder.decode(token_buffer)
-                _insert_chunk(c, rel_path, len(embed_tasks), text_chunk)
-                embed_tasks.append((rel_path, text_chunk))
+            # Token-bounded, overlapping chunks on paragraph boundaries
+            for chunk in chunker.chunk(content):
+                _insert_chunk(c, rel_path, len(embed_tasks), chunk.text)
+                embed_tasks.append((rel_path, chunk.text))
 
             # update file mtime
-            c.execute("INSERT OR REPLACE INTO files (filename, mtime) VALUES (?, ?)", (rel_path, mtime))
+            c.execute(
+                "INSERT OR REPLACE INTO files (filename, mtime) VALUES (?, ?)",
+                (rel_path, mtime),
+            )
             conn.commit()
 
     conn.close()
     logger.info(f"Queued {len(embed_tasks)} chunks for embedding")
 
-    # Parallel embedding with progress bar
+    # Parallel embedding with progress bar; the controller adapts how many
+    # requests are in flight to the API's latency and error rate. Only the
+    # main thread updates the count, as each embedding finishes
+    remaining = [len(embed_tasks)]
+    controller = AIMDController(batch_size=1, queue_depth=lambda: remaining[0])
+
     def embed_worker(task):
         rel_path, chunk = task
         # retrieve doc_id
         conn_thread = sqlite3.connect(db_path, check_same_thread=False)
         c_thread = conn_thread.cursor()
-        c_thread.execute("SELECT id FROM documents WHERE filename = ? AND content = ?", (rel_path, chunk))
+        c_thread.execute(
+            "SELECT id FROM documents WHERE filename = ? AND content = ?",
+            (rel_path, chunk),
+        )
         row = c_thread.fetchone()
         if not row:
             return
         doc_id = row[0]
         try:
-            emb = get_embedding(chunk, model_name)
+            emb = controller.call(
+                lambda texts: get_embedding(texts[0], model_name), [chunk]
+            )
             emb_blob = emb.tobytes()
-            c_thread.execute("INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)", (doc_id, emb_blob))
+            c_thread.execute(
+                "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+                (doc_id, emb_blob),
+            )
             conn_thread.commit()
             logger.info(f"Embedded {rel_path} (doc_id={doc_id})")
         except Exception as e:
@@ -275,16 +286,25 @@ def ingest_files(directory: str, db_path: str, model_name: str, recursive: bool)
         finally:
             conn_thread.close()
 
-    with ThreadPoolExecutor(max_workers=5) as pool:
-        list(tqdm(pool.map(embed_worker, embed_tasks), total=len(embed_tasks), desc="Embedding"))
+    with ThreadPoolExecutor(max_workers=controller.ceiling) as pool:
+        futures = [pool.submit(embed_worker, task) for task in embed_tasks]
+        for future in tqdm(
+            as_completed(futures), total=len(embed_tasks), desc="Embedding"
+        ):
+            remaining[0] -= 1
+            future.result()
 
 
 @app.command()
 def ingest(
     dir: str = typer.Option(..., "--dir", help="Directory containing files to ingest"),
     db: str = typer.Option(DEFAULT_DB_PATH, "--db", help="SQLite DB path"),
-    model: str = typer.Option(DEFAULT_MODEL_NAME, "--model", help="OpenAI embedding model"),
-    recursive: bool = typer.Option(False, "--recursive", help="Recursively ingest files in subdirectories")
+    model: str = typer.Option(
+        DEFAULT_MODEL_NAME, "--model", help="OpenAI embedding model"
+    ),
+    recursive: bool = typer.Option(
+        False, "--recursive", help="Recursively ingest files in subdirectories"
+    ),
 ):
     """
     Ingest files and build embeddings DB.
@@ -295,10 +315,7 @@ def ingest(
     ingest_files(dir, db, model, recursive)
 
 
-def search_embeddings(query: str,
-                      db_path: str,
-                      model_name: str,
-                      top_k: int) -> list:
+def search_embeddings(query: str, db_path: str, model_name: str, top_k: int) -> list:
     """
     Search the SQLite DB for the top_k documents most similar to the query.
     """
@@ -331,16 +348,22 @@ def search_embeddings(query: str,
     conn.close()
     return results
 
+
 SYSTEM_PROMPT = (
     "You are an assistant that identifies the most feature-complete and robust version of code files "
     "based on the provided context."
 )
 
+
 @app.command()
 def chat(
     db: str = typer.Option(DEFAULT_DB_PATH, "--db", help="SQLite DB path"),
-    model: str = typer.Option(DEFAULT_MODEL_NAME, "--model", help="OpenAI embedding model"),
-    topk: int = typer.Option(3, "--topk", help="Number of top documents to use as context")
+    model: str = typer.Option(
+        DEFAULT_MODEL_NAME, "--model", help="OpenAI embedding model"
+    ),
+    topk: int = typer.Option(
+        3, "--topk", help="Number of top documents to use as context"
+    ),
 ):
     """
     Enter interactive chat mode.
@@ -361,12 +384,13 @@ def chat(
         for fname, content, score in docs:
             context += f"== {fname} (score={score:.4f}) ==\n{content}\n\n"
         # Create prompt
-        prompt = (
-            context +
-            "Question: " + user_input + "\nAnswer:"
-        )
+        prompt = context + "Question: " + user_input + "\nAnswer:"
         # Prepare messages
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}] + history + [{"role": "user", "content": prompt}]
+        messages = (
+            [{"role": "system", "content": SYSTEM_PROMPT}]
+            + history
+            + [{"role": "user", "content": prompt}]
+        )
         # Prepare function definitions
         functions = [
             {
@@ -377,8 +401,8 @@ def chat(
                     "properties": {
                         "code": {"type": "string", "description": "Python code to run"}
                     },
-                    "required": ["code"]
-                }
+                    "required": ["code"],
+                },
             },
             {
                 "name": "run_bash_command",
@@ -386,11 +410,14 @@ def chat(
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "command": {"type": "string", "description": "Bash command to run"}
+                        "command": {
+                            "type": "string",
+                            "description": "Bash command to run",
+                        }
                     },
-                    "required": ["command"]
-                }
-            }
+                    "required": ["command"],
+                },
+            },
         ]
         # Initial call with function support
         try:
@@ -413,7 +440,11 @@ def chat(
                 # Send the function result back to the model
                 followup = client.chat.completions.create(
                     model="gpt-4.1-nano",
-                    messages=messages + [msg, {"role": "function", "name": fname, "content": tool_result}],
+                    messages=messages
+                    + [
+                        msg,
+                        {"role": "function", "name": fname, "content": tool_result},
+                    ],
                     temperature=0.2,
                     max_tokens=32000,
                 )
@@ -422,33 +453,42 @@ def chat(
                 answer = msg.content
             # Render assistant response
             html_response = render_markdown_to_html(answer)
-            print_formatted_text(HTML(f"<ans>Assistant:</ans>\n{html_response}\n"), style=CLI_STYLE)
+            print_formatted_text(
+                HTML(f"<ans>Assistant:</ans>\n{html_response}\n"), style=CLI_STYLE
+            )
         except Exception as e:
             typer.echo(f"[Error] OpenAI API call failed: {e}")
 
+
 @app.command()
 def stats(db: str = typer.Option(DEFAULT_DB_PATH, "--db")):
     """Show document & embedding counts."""
-    conn = sqlite3.connect(db); c = conn.cursor()
+    conn = sqlite3.connect(db)
+    c = conn.cursor()
     docs = c.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
     embs = c.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
     typer.echo(f"Documents: {docs}, Embeddings: {embs}")
     conn.close()
 
+
 @app.command("list-files")
 def list_files(db: str = typer.Option(DEFAULT_DB_PATH, "--db")):
     """List all ingested files."""
-    conn = sqlite3.connect(db); c = conn.cursor()
+    conn = sqlite3.connect(db)
+    c = conn.cursor()
     for fname, mtime in c.execute("SELECT filename, mtime FROM files"):
         typer.echo(f"{fname} (mtime={mtime})")
     conn.close()
 
+
 @app.command("clear-db")
 def clear_db(db: str = typer.Option(DEFAULT_DB_PATH, "--db")):
     """Recreate database schema (drops all data)."""
-    conn = sqlite3.connect(db); conn.close()
+    conn = sqlite3.connect(db)
+    conn.close()
     init_db(db)
     typer.echo("Database schema reset.")
 
+
 if __name__ == "__main__":
     app()
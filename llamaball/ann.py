@@ -0,0 +1,186 @@
+"""
+Llamaball - Approximate Nearest Neighbour Index
+File Purpose: Pure-NumPy IVF index with spherical k-means coarse quantization
+Primary Functions: Train, incrementally update, persist and probe inverted lists
+Inputs: Unit-normalized embeddings and their doc_ids
+Outputs: Candidate doc_ids per query, persisted .ivf.npz sidecar
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Below this many vectors exact search is fast enough and always used
+ANN_MIN_VECTORS = int(os.environ.get("LLAMABALL_ANN_MIN_VECTORS", "50000"))
+DEFAULT_NPROBE = 8
+IVF_SUFFIX = ".ivf.npz"
+# Retrain centroids once the index has grown this much since training
+RETRAIN_GROWTH = 4.0
+
+
+def ann_index_path(db_path: str) -> str:
+    """Location of the IVF sidecar for a database."""
+    return db_path + IVF_SUFFIX
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Number of inverted lists for a corpus of n_vectors."""
+    return int(min(4096, max(1, 4 * np.sqrt(n_vectors))))
+
+
+def _assign(
+    data: np.ndarray, centroids: np.ndarray, batch_size: int = 16384
+) -> np.ndarray:
+    """Index of the nearest (highest dot product) centroid for each row."""
+    out = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), batch_size):
+        block = np.asarray(data[start : start + batch_size], dtype=np.float32)
+        out[start : start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int = 15,
+    max_samples_per_centroid: int = 256,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Cluster unit-normalized rows by cosine similarity.
+    Trains on a random sample of at most k * max_samples_per_centroid rows.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(data)
+    k = max(1, min(k, n))
+    sample_size = min(n, k * max_samples_per_centroid)
+    sample_idx = np.sort(rng.choice(n, size=sample_size, replace=False))
+    sample = np.asarray(data[sample_idx], dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty clusters from random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted file index: each doc_id belongs to the list of its nearest
+    centroid, and a query only scores vectors in its nprobe closest lists.
+    Vectors themselves stay in the resident VectorIndex; the IVF keeps only
+    centroids and per-list doc_ids.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        lists: List[np.ndarray],
+        trained_on: int,
+    ):
+        self.centroids = centroids
+        self.lists = lists
+        self.trained_on = trained_on
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.lists)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls, doc_ids: np.ndarray, vectors: np.ndarray, nlist: Optional[int] = None
+    ) -> "IVFIndex":
+        """Cluster vectors and build inverted lists."""
+        nlist = nlist or default_nlist(len(doc_ids))
+        centroids = spherical_kmeans(vectors, nlist)
+        index = cls(centroids, [np.empty(0, dtype=np.int64)] * len(centroids), 0)
+        index.add(doc_ids, vectors)
+        index.trained_on = len(doc_ids)
+        logger.info(
+            f"Trained IVF index: {len(centroids)} lists over {len(doc_ids)} vectors"
+        )
+        return index
+
+    def add(self, doc_ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Assign new vectors to their nearest lists."""
+        if len(doc_ids) == 0:
+            return
+        labels = _assign(vectors, self.centroids)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        self.lists = [
+            (
+                np.concatenate([self.lists[i], ids[bounds[i] : bounds[i + 1]]])
+                if bounds[i + 1] > bounds[i]
+                else self.lists[i]
+            )
+            for i in range(self.nlist)
+        ]
+
+    def remove(self, doc_ids: np.ndarray) -> None:
+        """Drop doc_ids from every list."""
+        if len(doc_ids) == 0:
+            return
+        self.lists = [ids[~np.isin(ids, doc_ids)] for ids in self.lists]
+
+    def doc_ids(self) -> np.ndarray:
+        if not self.lists:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(self.lists)
+
+    def needs_retrain(self) -> bool:
+        return len(self) > RETRAIN_GROWTH * max(self.trained_on, 1)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Indices of the nprobe lists whose centroids are closest to query."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        sims = self.centroids @ query
+        if nprobe >= self.nlist:
+            return np.arange(self.nlist)
+        return np.argpartition(-sims, nprobe - 1)[:nprobe]
+
+    def save(self, path: str) -> None:
+        """Persist atomically as an uncompressed .npz file."""
+        offsets = np.cumsum([0] + [len(ids) for ids in self.lists]).astype(np.int64)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            doc_ids=self.doc_ids(),
+            offsets=offsets,
+            trained_on=np.int64(self.trained_on),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                centroids = data["centroids"]
+                doc_ids = data["doc_ids"]
+                offsets = data["offsets"]
+                trained_on = int(data["trained_on"])
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable IVF index {path}: {e}")
+            return None
+        lists = [doc_ids[offsets[i] : offsets[i + 1]] for i in range(len(centroids))]
+        return cls(centroids, lists, trained_on)
@@ -0,0 +1,821 @@
+"""
+Llamaball - ASGI Server
+File Purpose: Async (Starlette) variant of the web server for high-concurrency serving
+Primary Functions: Same routes as web_server with async Ollama calls, thread-pool database access, per-route concurrency limits
+Inputs: HTTP requests, file uploads, chat messages
+Outputs: HTML pages, JSON API responses, Server-Sent Events
+
+Run with `python start_web_server.py --asgi` or `uvicorn llamaball.asgi:app`.
+Requests wait on asyncio instead of holding threads, so idle chat and SSE
+connections are cheap; SQLite, NumPy search and tool calls run on a bounded
+thread pool. Each route group (chat, search, ingest, read) has its own
+concurrency limit, so slow generations cannot starve searches or health
+checks; requests that wait longer than LLAMABALL_ASGI_QUEUE_TIMEOUT for a
+slot get 503 (or an `error` event on the streaming endpoint).
+
+Chat counts open connections and generations separately. Up to
+LLAMABALL_ASGI_CHAT_CONNECTIONS chat requests and streams are admitted
+at once (the rest get 503 straight away); only their Ollama calls take
+one of the LLAMABALL_ASGI_CHAT_LIMIT generation slots, and they queue for
+one for up to LLAMABALL_ASGI_CHAT_QUEUE_TIMEOUT. Size the connection bound
+for the clients you expect, the generation limit for what Ollama runs in
+parallel (OLLAMA_NUM_PARALLEL), and the chat timeout to cover a full
+queue: roughly connections / limit x seconds per answer.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial, wraps
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+import ollama
+from werkzeug.utils import secure_filename
+
+try:
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.requests import Request
+    from starlette.responses import (
+        JSONResponse,
+        PlainTextResponse,
+        Response,
+        StreamingResponse,
+    )
+    from starlette.routing import Route
+    from starlette.templating import Jinja2Templates
+except ImportError as e:  # pragma: no cover - optional dependency
+    raise ImportError(
+        "The ASGI server requires starlette and uvicorn: pip install 'llamaball[asgi]'"
+    ) from e
+
+from . import core
+from . import web_server as web
+from .cache import normalize_query
+from .lexical import SEARCH_MODES
+from .utils import render_markdown_to_html
+
+logger = logging.getLogger(__name__)
+
+# Threads for SQLite, NumPy search, file writes and tool calls
+DB_THREADS = int(os.environ.get("LLAMABALL_ASGI_THREADS", "32"))
+# Concurrent requests per route group
+ROUTE_LIMITS = {
+    # Concurrent Ollama generations
+    "chat": int(os.environ.get("LLAMABALL_ASGI_CHAT_LIMIT", "4")),
+    # Open chat requests and streams, most of them waiting on a generation
+    "chat_open": int(os.environ.get("LLAMABALL_ASGI_CHAT_CONNECTIONS", "512")),
+    "search": int(os.environ.get("LLAMABALL_ASGI_SEARCH_LIMIT", "16")),
+    "ingest": int(os.environ.get("LLAMABALL_ASGI_INGEST_LIMIT", "2")),
+    "read": int(os.environ.get("LLAMABALL_ASGI_READ_LIMIT", "32")),
+}
+# Seconds a request may wait for a slot before being turned away
+QUEUE_TIMEOUT = float(os.environ.get("LLAMABALL_ASGI_QUEUE_TIMEOUT", "30"))
+# Per-group overrides: admitted chats wait their turn for a generation,
+# chats over the connection bound are turned away without waiting
+GROUP_TIMEOUTS = {
+    "chat": float(os.environ.get("LLAMABALL_ASGI_CHAT_QUEUE_TIMEOUT", "600")),
+    "chat_open": 0.0,
+}
+SESSION_COOKIE = "llamaball_session"
+
+templates = Jinja2Templates(
+    directory=os.path.join(os.path.dirname(os.path.abspath(web.__file__)), "templates")
+)
+# Flask's template global; this server has no flash messages
+templates.env.globals["get_flashed_messages"] = lambda *args, **kwargs: []
+
+
+class ServerBusy(Exception):
+    """No slot in a route group freed up within the queue timeout."""
+
+
+class RouteLimiter:
+    """Per-route-group asyncio semaphores with queue timeouts and counters."""
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        timeout: float = QUEUE_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.limits = dict(limits)
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.active = dict.fromkeys(self.limits, 0)
+        self.waiting = dict.fromkeys(self.limits, 0)
+        self.rejected = dict.fromkeys(self.limits, 0)
+
+    @asynccontextmanager
+    async def slot(self, group: str) -> AsyncIterator[None]:
+        # Created on first use so the semaphore belongs to the serving loop
+        semaphore = self._semaphores.get(group)
+        if semaphore is None:
+            semaphore = self._semaphores[group] = asyncio.Semaphore(self.limits[group])
+        timeout = self.timeouts.get(group, self.timeout)
+        self.waiting[group] += 1
+        try:
+            if timeout <= 0:
+                # wait_for would cancel even a free acquire() before it runs
+                if semaphore.locked():
+                    raise asyncio.TimeoutError
+                await semaphore.acquire()
+            else:
+                await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected[group] += 1
+            raise ServerBusy(group)
+        finally:
+            self.waiting[group] -= 1
+        self.active[group] += 1
+        try:
+            yield
+        finally:
+            self.active[group] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            group: {
+                "limit": limit,
+                "active": self.active[group],
+                "waiting": self.waiting[group],
+                "rejected": self.rejected[group],
+            }
+            for group, limit in self.limits.items()
+        }
+
+
+def limited(group: str) -> Callable:
+    """Run a route handler inside a slot of its route group, or answer 503."""
+
+    def decorate(handler: Callable) -> Callable:
+        @wraps(handler)
+        async def wrapper(request: Request) -> Response:
+            try:
+                async with request.app.state.limiter.slot(group):
+                    return await handler(request)
+            except ServerBusy as e:
+                return JSONResponse(
+                    {"error": f"Server busy ({e} requests), try again shortly"},
+                    status_code=503,
+                    headers={"Retry-After": "1"},
+                )
+
+        return wrapper
+
+    return decorate
+
+
+async def in_thread(app: Starlette, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run blocking work (SQLite, NumPy, subprocesses) on the app's thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.executor, partial(fn, *args, **kwargs))
+
+
+async def json_body(request: Request) -> Optional[dict]:
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def embed_query(app: Starlette, query: str, model: str) -> None:
+    """Put the query's embedding in core's query cache, fetching it without blocking a thread."""
+    cache_model = f"ollama:{model}"
+    if core.query_embedding_cache.contains(cache_model, query):
+        return
+    response = await app.state.ollama.embed(model=model, input=normalize_query(query))
+    emb = np.array(response["embeddings"], dtype=np.float32)
+    await in_thread(
+        app,
+        core.query_embedding_cache.get_embedding,
+        cache_model,
+        query,
+        lambda text: emb,
+    )
+
+
+async def search(
+    app: Starlette,
+    query: str,
+    top_k: int,
+    mode: str = core.DEFAULT_SEARCH_MODE,
+    nprobe: Optional[int] = None,
+    rescore: Optional[int] = None,
+) -> list:
+    """core.search_embeddings with the query embedded asynchronously first."""
+    await embed_query(app, query, web.DEFAULT_MODEL)
+    return await in_thread(
+        app,
+        core.search_embeddings,
+        query,
+        web.DEFAULT_DB_PATH,
+        web.DEFAULT_MODEL,
+        top_k,
+        "ollama",
+        nprobe=nprobe,
+        rescore=rescore,
+        mode=mode,
+    )
+
+
+async def ollama_chat_stream(
+    client: ollama.AsyncClient,
+    chat_model: str,
+    messages: list,
+    options: dict,
+    tools=None,
+) -> AsyncIterator[Any]:
+    """Async counterpart of core's streamed ollama.chat, with the same no-tools fallback."""
+    kwargs = {"tools": tools} if tools else {}
+    stream = await client.chat(
+        model=chat_model, messages=messages, options=options, stream=True, **kwargs
+    )
+    started = False
+    try:
+        async for chunk in stream:
+            started = True
+            yield chunk
+    except Exception as e:
+        if tools and not started and "does not support tools" in str(e):
+            logger.info(
+                f"Model {chat_model} doesn't support tools, falling back to simple chat"
+            )
+            async for chunk in ollama_chat_stream(
+                client, chat_model, messages, options
+            ):
+                yield chunk
+        else:
+            raise
+    finally:
+        # Closing the HTTP stream stops Ollama generating for abandoned requests
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def chat_tokens(
+    app: Starlette,
+    user_input: str,
+    history: list,
+    chat_model: str,
+    docs: list,
+    stats: dict,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    top_p: float = 0.9,
+    top_k: int = 40,
+    repeat_penalty: float = 1.1,
+    response_cache: Optional[bool] = None,
+) -> AsyncIterator[str]:
+    """Async core.chat_stream over already-retrieved docs; fills stats the same way."""
+    started = time.perf_counter()
+    options = core.chat_options(temperature, max_tokens, top_p, top_k, repeat_penalty)
+    stats.update(cached=False, used_tools=False, tokens=0)
+
+    use_cache = (
+        core.RESPONSE_CACHE_ENABLED if response_cache is None else response_cache
+    )
+    if use_cache:
+        generation = await in_thread(
+            app, core.read_index_generation, web.DEFAULT_DB_PATH
+        )
+        cache_slot = await in_thread(
+            app,
+            core.response_cache_slot,
+            web.DEFAULT_DB_PATH,
+            web.DEFAULT_MODEL,
+            "ollama",
+            chat_model,
+            options,
+            history,
+            user_input,
+            docs,
+            generation,
+        )
+        cached = core.chat_response_cache.get(*cache_slot)
+        if cached is not None:
+            stats["cached"] = True
+            first_token = time.perf_counter()
+            yield cached
+            core.finish_stream_stats(stats, started, first_token)
+            return
+
+    parts: List[str] = []
+    first_token = None
+    requests_left = [
+        (core.build_chat_messages(user_input, docs, history), core.CHAT_TOOLS)
+    ]
+    while requests_left:
+        messages, tools = requests_left.pop()
+        tool_calls = []
+        counted = 0
+        # Only the generation holds a chat slot, not the open connection
+        async with app.state.limiter.slot("chat"):
+            async for chunk in ollama_chat_stream(
+                app.state.ollama, chat_model, messages, options, tools
+            ):
+                content, calls, eval_count = core.stream_chunk_parts(chunk)
+                tool_calls.extend(calls)
+                if content:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    counted += 1
+                    parts.append(content)
+                    yield content
+                counted = eval_count or counted
+        stats["tokens"] += counted
+
+        if tool_calls:
+            stats["used_tools"] = True
+            followup = await in_thread(
+                app, core.tool_followup_messages, messages, "".join(parts), tool_calls
+            )
+            requests_left.append((followup, None))
+            parts = []
+
+    core.finish_stream_stats(stats, started, first_token)
+    answer = "".join(parts)
+    if use_cache and answer and not stats["used_tools"]:
+        core.chat_response_cache.put(*cache_slot, answer)
+
+
+async def list_models(app: Starlette) -> List[dict]:
+    """Installed Ollama models in get_available_models' format, [] when unreachable."""
+    try:
+        response = await app.state.ollama.list()
+    except Exception as e:
+        logger.warning(f"Error fetching models from Ollama API: {e}")
+        return []
+    return [
+        {
+            "name": m.model,
+            "size": m.size or 0,
+            "modified_at": m.modified_at.isoformat() if m.modified_at else "",
+            "digest": m.digest or "",
+            "details": m.details.model_dump() if m.details else {},
+        }
+        for m in response.models
+    ]
+
+
+# Pages
+
+
+@limited("read")
+async def index(request: Request) -> Response:
+    try:
+        stats = await in_thread(request.app, web.get_database_stats)
+        recent_files = await in_thread(request.app, web.get_recent_files, 10)
+        models = await list_models(request.app) or await in_thread(
+            request.app, core.get_available_models
+        )
+        return templates.TemplateResponse(
+            request,
+            "index.html",
+            {
+                "stats": stats,
+                "recent_files": recent_files,
+                "models": models,
+                "supported_extensions": list(web.ALLOWED_EXTENSIONS),
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error loading dashboard: {e}")
+        return PlainTextResponse(str(e), status_code=500)
+
+
+@limited("read")
+async def chat_page(request: Request) -> Response:
+    try:
+        session_id = request.cookies.get(SESSION_COOKIE) or (
+            f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        web.get_chat_session(session_id, web.DEFAULT_CHAT_MODEL)
+        stats = await in_thread(request.app, web.get_database_stats)
+        response = templates.TemplateResponse(
+            request,
+            "chat.html",
+            {
+                "session_id": session_id,
+                "stats": stats,
+                "default_model": web.DEFAULT_CHAT_MODEL,
+            },
+        )
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+        return response
+    except Exception as e:
+        logger.error(f"Error loading chat page: {e}")
+        return PlainTextResponse(str(e), status_code=500)
+
+
+@limited("read")
+async def upload_page(request: Request) -> Response:
+    return templates.TemplateResponse(
+        request,
+        "upload.html",
+        {
+            "supported_extensions": list(web.ALLOWED_EXTENSIONS),
+            "max_file_size_mb": web.app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024),
+        },
+    )
+
+
+@limited("read")
+async def stats_page(request: Request) -> Response:
+    try:
+        stats = await in_thread(request.app, web.get_detailed_stats)
+        return templates.TemplateResponse(request, "stats.html", {"stats": stats})
+    except Exception as e:
+        logger.error(f"Error loading stats page: {e}")
+        return PlainTextResponse(str(e), status_code=500)
+
+
+# API endpoints
+
+
+@limited("chat_open")
+async def api_chat(request: Request) -> Response:
+    data = await json_body(request)
+    if not data or "message" not in data:
+        return JSONResponse({"error": "Message is required"}, status_code=400)
+    try:
+        user_message = data["message"]
+        session_id = data.get("session_id", "default")
+        model = data.get("model", web.DEFAULT_CHAT_MODEL)
+        top_k = data.get("top_k", 3)
+        temperature = data.get("temperature", 0.7)
+
+        chat_session = web.get_chat_session(session_id, model)
+        docs = await search(request.app, user_message, top_k)
+        parts = [
+            token
+            async for token in chat_tokens(
+                request.app,
+                user_message,
+                chat_session["history"].copy(),
+                model,
+                docs,
+                {},
+                temperature=temperature,
+            )
+        ]
+        answer = "".join(parts)
+        response = (
+            render_markdown_to_html(answer)
+            if answer
+            else "I'm sorry, I couldn't generate a response."
+        )
+        web.record_exchange(chat_session, user_message, response)
+        return JSONResponse(
+            {
+                "response": response,
+                "session_id": session_id,
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+    except ServerBusy:
+        raise
+    except Exception as e:
+        logger.error(f"Chat API error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def api_chat_stream(request: Request) -> Response:
+    """
+    Server-Sent Events chat, as web_server's /api/chat/stream. The stream
+    holds a chat_open slot and takes a chat slot only while Ollama
+    generates, so queued clients hold just an idle connection; a
+    disconnect cancels the generator and the Ollama request.
+    """
+    data = await json_body(request)
+    if not data or "message" not in data:
+        return JSONResponse({"error": "Message is required"}, status_code=400)
+
+    user_message = data["message"]
+    session_id = data.get("session_id", "default")
+    model = data.get("model", web.DEFAULT_CHAT_MODEL)
+    top_k = data.get("top_k", 3)
+    temperature = data.get("temperature", 0.7)
+    mode = data.get("mode", core.DEFAULT_SEARCH_MODE)
+    if mode not in SEARCH_MODES:
+        return JSONResponse(
+            {"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}, status_code=400
+        )
+
+    app = request.app
+    chat_session = web.get_chat_session(session_id, model)
+    history = chat_session["history"].copy()
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        try:
+            async with app.state.limiter.slot("chat_open"):
+                try:
+                    docs = await search(app, user_message, top_k, mode)
+                except Exception as e:
+                    logger.error(f"Chat stream retrieval error: {e}")
+                    yield web.sse_event("error", {"error": str(e)})
+                    return
+                retrieval_seconds = time.perf_counter() - started
+                yield web.retrieval_event(docs, mode)
+
+                timings: dict = {}
+                parts = []
+                tokens = chat_tokens(
+                    app,
+                    user_message,
+                    history,
+                    model,
+                    docs,
+                    timings,
+                    temperature=temperature,
+                )
+                try:
+                    async for token in tokens:
+                        parts.append(token)
+                        yield web.sse_event("token", {"token": token})
+                except ServerBusy:
+                    raise
+                except Exception as e:
+                    logger.error(f"Chat stream error: {e}")
+                    yield web.sse_event("error", {"error": str(e)})
+                    return
+                finally:
+                    await tokens.aclose()
+        except ServerBusy as e:
+            yield web.sse_event(
+                "error", {"error": f"Server busy ({e} requests), try again shortly"}
+            )
+            return
+
+        answer = "".join(parts) or "I'm sorry, I couldn't generate a response."
+        web.record_exchange(chat_session, user_message, answer)
+        yield web.done_event(session_id, answer, timings, started, retrieval_seconds)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers=web.SSE_HEADERS
+    )
+
+
+@limited("search")
+async def api_search(request: Request) -> Response:
+    data = await json_body(request)
+    if not data or "query" not in data:
+        return JSONResponse({"error": "Query is required"}, status_code=400)
+    mode = data.get("mode", core.DEFAULT_SEARCH_MODE)
+    if mode not in SEARCH_MODES:
+        return JSONResponse(
+            {"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}, status_code=400
+        )
+    try:
+        query = data["query"]
+        results = await search(
+            request.app,
+            query,
+            data.get("top_k", 5),
+            mode,
+            nprobe=data.get("nprobe"),
+            rescore=data.get("rescore"),
+        )
+        formatted_results = [
+            {
+                "filename": filename,
+                "content": content[:500] + "..." if len(content) > 500 else content,
+                "score": float(score),
+                "preview": content[:200] + "..." if len(content) > 200 else content,
+            }
+            for filename, content, score in results
+        ]
+        return JSONResponse(
+            {
+                "results": formatted_results,
+                "query": query,
+                "mode": mode,
+                "total_results": len(formatted_results),
+            }
+        )
+    except Exception as e:
+        logger.error(f"Search API error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def _save_upload(filepath: str, content: bytes) -> int:
+    with open(filepath, "wb") as f:
+        f.write(content)
+    return len(content)
+
+
+@limited("ingest")
+async def api_upload(request: Request) -> Response:
+    try:
+        form = await request.form()
+        files = [f for f in form.getlist("files") if getattr(f, "filename", None)]
+        if not files:
+            return JSONResponse({"error": "No files provided"}, status_code=400)
+
+        uploaded_files = []
+        errors = []
+        for file in files:
+            if not web.allowed_file(file.filename):
+                errors.append(f"File type not supported: {file.filename}")
+                continue
+            # Add timestamp to avoid conflicts
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{timestamp}_{secure_filename(file.filename)}"
+            filepath = os.path.join(web.UPLOAD_FOLDER, filename)
+            try:
+                size = await in_thread(
+                    request.app, _save_upload, filepath, await file.read()
+                )
+                uploaded_files.append(
+                    {
+                        "filename": filename,
+                        "original_name": file.filename,
+                        "size": size,
+                        "path": filepath,
+                    }
+                )
+            except Exception as e:
+                errors.append(f"Failed to save {file.filename}: {str(e)}")
+
+        # Queue ingestion in background
+        job = None
+        if uploaded_files:
+            job = web.ingest_jobs.submit("upload", {"files": uploaded_files})
+
+        return JSONResponse(
+            {
+                "uploaded_files": uploaded_files,
+                "errors": errors,
+                "job_id": job["id"] if job else None,
+                "message": f"Successfully uploaded {len(uploaded_files)} files. Ingestion queued in background.",
+            }
+        )
+    except Exception as e:
+        logger.error(f"Upload API error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@limited("ingest")
+async def api_ingest(request: Request) -> Response:
+    data = await json_body(request) or {}
+    directory = data.get("directory", web.UPLOAD_FOLDER)
+    recursive = data.get("recursive", True)
+    force = data.get("force", False)
+    job = web.ingest_jobs.submit(
+        "directory", {"directory": directory, "recursive": recursive, "force": force}
+    )
+    return JSONResponse(
+        {
+            "message": "Ingestion queued in background",
+            "job_id": job["id"],
+            "directory": directory,
+            "recursive": recursive,
+            "force": force,
+        }
+    )
+
+
+@limited("read")
+async def api_jobs(request: Request) -> Response:
+    return JSONResponse({"jobs": web.ingest_jobs.jobs()})
+
+
+@limited("read")
+async def api_job(request: Request) -> Response:
+    job = web.ingest_jobs.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job)
+
+
+@limited("read")
+async def api_stats(request: Request) -> Response:
+    try:
+        stats = await in_thread(request.app, web.get_detailed_stats)
+        stats["cache"] = core.search_cache_stats()
+        stats["limits"] = request.app.state.limiter.stats()
+        return JSONResponse(stats)
+    except Exception as e:
+        logger.error(f"Stats API error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@limited("read")
+async def api_models(request: Request) -> Response:
+    models = await list_models(request.app)
+    if not models:
+        # Same fallback list the Flask server reports
+        models = await in_thread(request.app, core.get_available_models)
+    return JSONResponse({"models": models})
+
+
+async def api_health(request: Request) -> Response:
+    """Health check; not limited so it answers while every route group is busy."""
+    try:
+        stats = await in_thread(request.app, web.get_database_stats)
+        models = await list_models(request.app)
+        return JSONResponse(
+            {
+                "status": "healthy",
+                "database": "connected",
+                "ollama": "connected" if models else "disconnected",
+                "timestamp": datetime.now().isoformat(),
+                "stats": stats,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Health check error: {e}")
+        return JSONResponse(
+            {
+                "status": "unhealthy",
+                "error": str(e),
+                "timestamp": datetime.now().isoformat(),
+            },
+            status_code=500,
+        )
+
+
+routes = [
+    Route("/", index, name="index"),
+    Route("/chat", chat_page, name="chat_page"),
+    Route("/upload", upload_page, name="upload_page"),
+    Route("/stats", stats_page, name="stats_page"),
+    Route("/api/chat", api_chat, methods=["POST"]),
+    Route("/api/chat/stream", api_chat_stream, methods=["POST"]),
+    Route("/api/search", api_search, methods=["POST"]),
+    Route("/api/upload", api_upload, methods=["POST"]),
+    Route("/api/ingest", api_ingest, methods=["POST"]),
+    Route("/api/jobs", api_jobs),
+    Route("/api/jobs/{job_id}", api_job),
+    Route("/api/stats", api_stats),
+    Route("/api/models", api_models),
+    Route("/api/health", api_health),
+]
+
+
+def create_app(
+    limits: Optional[Dict[str, int]] = None,
+    threads: int = DB_THREADS,
+    queue_timeout: float = QUEUE_TIMEOUT,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Starlette:
+    """Application factory; limits and timeouts override ROUTE_LIMITS and GROUP_TIMEOUTS."""
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        yield
+        app.state.executor.shutdown(wait=False)
+
+    app = Starlette(
+        routes=routes,
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"])],
+        lifespan=lifespan,
+    )
+    app.state.executor = ThreadPoolExecutor(
+        threads, thread_name_prefix="llamaball-asgi"
+    )
+    app.state.ollama = ollama.AsyncClient()
+    app.state.limiter = RouteLimiter(
+        {**ROUTE_LIMITS, **(limits or {})},
+        queue_timeout,
+        {**GROUP_TIMEOUTS, **(timeouts or {})},
+    )
+    return app
+
+
+def run_asgi_server(
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    debug: bool = False,
+    ssl_certfile: Optional[str] = None,
+    ssl_keyfile: Optional[str] = None,
+) -> None:
+    """Serve create_app() with uvicorn"""
+    import uvicorn
+
+    logger.info(f"Starting Llamaball ASGI server on {host}:{port}")
+    logger.info(f"Database: {web.DEFAULT_DB_PATH}")
+    logger.info(f"Route limits: {ROUTE_LIMITS}, threads: {DB_THREADS}")
+    logger.info(f"Queue timeouts: {QUEUE_TIMEOUT}s, per group {GROUP_TIMEOUTS}")
+    uvicorn.run(
+        create_app(),
+        host=host,
+        port=port,
+        log_level="debug" if debug else "info",
+        ssl_certfile=ssl_certfile,
+        ssl_keyfile=ssl_keyfile,
+    )
+
+
+app = create_app()
@@ -0,0 +1,420 @@
+"""
+Llamaball - Embedding Cache
+File Purpose: Embedding and search caches for ingestion and query time
+Primary Functions: Persistent (model, content hash) embedding cache, in-memory LRU caches for query embeddings and search results
+Inputs: Embedding model key, chunk or query texts, embedding rows, search keys
+Outputs: Cached float32 embeddings and result lists, hit/miss counters
+"""
+
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+import numpy as np
+
+from .writer import content_hash, open_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MB = int(os.environ.get("LLAMABALL_EMBED_CACHE_MB", "1024"))
+QUERY_CACHE_SIZE = int(os.environ.get("LLAMABALL_QUERY_CACHE_SIZE", "1024"))
+RESULT_CACHE_SIZE = int(os.environ.get("LLAMABALL_RESULT_CACHE_SIZE", "256"))
+# Also keep query embeddings in the on-disk embedding cache across restarts
+PERSIST_QUERY_EMBEDDINGS = os.environ.get(
+    "LLAMABALL_QUERY_CACHE_PERSIST", ""
+).lower() in (
+    "1",
+    "true",
+    "yes",
+)
+RESPONSE_CACHE_SIZE = int(os.environ.get("LLAMABALL_RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_THRESHOLD = float(
+    os.environ.get("LLAMABALL_RESPONSE_CACHE_THRESHOLD", "0.95")
+)
+RESPONSE_CACHE_TTL = float(os.environ.get("LLAMABALL_RESPONSE_CACHE_TTL", "3600"))
+# Chat answers are only reused when explicitly enabled
+RESPONSE_CACHE_ENABLED = os.environ.get("LLAMABALL_RESPONSE_CACHE", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Fraction of entries dropped per eviction pass once the cache is over budget
+EVICT_FRACTION = 0.1
+
+
+def default_cache_path() -> str:
+    """Cache location: $LLAMABALL_EMBED_CACHE, else under $XDG_CACHE_HOME."""
+    path = os.environ.get("LLAMABALL_EMBED_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "llamaball", "embeddings.db")
+
+
+class EmbeddingCache:
+    """
+    SQLite cache of raw model embeddings keyed by (model, sha256(text)).
+
+    Entries are stored as float32 exactly as the model returned them, so
+    one cache serves databases with any storage dtype. Lookups refresh
+    last_used; once the live pages exceed max_mb the least recently used
+    entries are evicted. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_mb: int = DEFAULT_CACHE_MB):
+        self.path = path or default_cache_path()
+        self.max_bytes = max(1, max_mb) * 1024 * 1024
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = open_connection(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            ) WITHOUT ROWID
+            """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """Return {index: embedding} for the texts already cached."""
+        hashes = [content_hash(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[bytes(h)] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self.conn.commit()
+            hits = {i: found[h] for i, h in enumerate(hashes) if h in found}
+            self.hits += len(hits)
+            self.misses += len(texts) - len(hits)
+        return hits
+
+    def put_many(self, model: str, texts: List[str], embeddings: np.ndarray) -> None:
+        """Store embeddings for texts, then evict if over the size budget."""
+        now = time.time()
+        rows = [
+            (model, content_hash(t), np.asarray(e, dtype=np.float32).tobytes(), now)
+            for t, e in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, embedding, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+            self._evict()
+
+    def _used_bytes(self) -> int:
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def _evict(self) -> None:
+        while self._used_bytes() > self.max_bytes:
+            count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if not count:
+                return
+            drop = max(1, int(count * EVICT_FRACTION))
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE (model, hash) IN "
+                "(SELECT model, hash FROM embeddings ORDER BY last_used LIMIT ?)",
+                (drop,),
+            )
+            self.conn.commit()
+            self.evicted += drop
+            logger.debug(f"Evicted {drop} embedding cache entries")
+
+    def embed(
+        self, model: str, texts: List[str], embed: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """Embed texts, calling embed() only for cache misses."""
+        cached = self.get_many(model, texts)
+        if len(cached) == len(texts):
+            return np.vstack([cached[i] for i in range(len(texts))])
+        missing = [i for i in range(len(texts)) if i not in cached]
+        fresh = np.asarray(embed([texts[i] for i in missing]), dtype=np.float32)
+        self.put_many(model, [texts[i] for i in missing], fresh)
+        if not cached:
+            return fresh
+        out = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+        out[missing] = fresh
+        for i, row in cached.items():
+            out[i] = row
+        return out
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hit_rate,
+            "cache_evicted": self.evicted,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, maxsize)
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Membership test that leaves recency and counters untouched."""
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def normalize_query(text: str) -> str:
+    """Canonical query text: NFC with whitespace runs collapsed."""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+class QueryEmbeddingCache:
+    """
+    LRU of query embeddings keyed by (model, normalized text). With
+    persist=True, memory misses fall back to the on-disk EmbeddingCache
+    so repeated questions survive restarts.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QUERY_CACHE_SIZE,
+        persist: bool = PERSIST_QUERY_EMBEDDINGS,
+        path: Optional[str] = None,
+    ):
+        self.memory = LRUCache(maxsize)
+        self.persist = persist
+        self.path = path
+        self.disk_hits = 0
+        self._store: Optional[EmbeddingCache] = None
+        self._store_lock = threading.Lock()
+
+    def _disk(self) -> EmbeddingCache:
+        with self._store_lock:
+            if self._store is None:
+                self._store = EmbeddingCache(self.path)
+            return self._store
+
+    def get_embedding(
+        self, model: str, text: str, embed: Callable[[str], np.ndarray]
+    ) -> np.ndarray:
+        """Return the (1, dim) embedding of text, calling embed() on a miss."""
+        text = normalize_query(text)
+        key = (model, text)
+        emb = self.memory.get(key)
+        if emb is not None:
+            return emb
+        if self.persist:
+            found = self._disk().get_many(model, [text])
+            if found:
+                self.disk_hits += 1
+                emb = found[0].reshape(1, -1)
+        if emb is None:
+            emb = np.asarray(embed(text), dtype=np.float32).reshape(1, -1)
+            if self.persist:
+                self._disk().put_many(model, [text], emb)
+        emb.setflags(write=False)
+        self.memory.put(key, emb)
+        return emb
+
+    def contains(self, model: str, text: str) -> bool:
+        """Whether the query is held in memory, so get_embedding won't call embed()."""
+        return (model, normalize_query(text)) in self.memory
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk_hits = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "persistent": self.persist,
+        }
+
+
+class CachedResponse(NamedTuple):
+    key: Hashable
+    embedding: np.ndarray
+    doc_set: frozenset
+    generation: int
+    created: float
+    answer: str
+
+
+class ResponseCache:
+    """
+    Semantic cache of chat answers.
+
+    An answer is reused when a new question has the same key (chat model,
+    sampling options, history), its embedding is within `threshold` cosine
+    similarity of the cached question, retrieval returned the same set of
+    chunks, and the entry is younger than `ttl` seconds and from the current
+    index generation. Entries past their ttl are dropped on any lookup; an
+    older generation only expires entries under the same key, since the key
+    names the database and one cache is shared by every database.
+    """
+
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl: float = RESPONSE_CACHE_TTL,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = max(0, maxsize)
+        self._entries: List[CachedResponse] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    def get(
+        self, key: Hashable, embedding: np.ndarray, doc_set: frozenset, generation: int
+    ) -> Optional[str]:
+        """Best cached answer for a similar question over the same documents."""
+        query = self._unit(embedding)
+        now = time.time()
+        best, best_score = None, self.threshold
+        with self._lock:
+            self._entries = [
+                e
+                for e in self._entries
+                if now - e.created <= self.ttl
+                and (e.key != key or e.generation == generation)
+            ]
+            if query is not None:
+                for entry in self._entries:
+                    if entry.key != key or entry.doc_set != doc_set:
+                        continue
+                    if len(entry.embedding) != len(query):
+                        continue
+                    score = float(entry.embedding @ query)
+                    if score >= best_score:
+                        best, best_score = entry, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best.answer
+
+    def put(
+        self,
+        key: Hashable,
+        embedding: np.ndarray,
+        doc_set: frozenset,
+        generation: int,
+        answer: str,
+    ) -> None:
+        query = self._unit(embedding)
+        if query is None or not self.maxsize:
+            return
+        with self._lock:
+            self._entries.append(
+                CachedResponse(key, query, doc_set, generation, time.time(), answer)
+            )
+            del self._entries[: -self.maxsize]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = []
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+        }
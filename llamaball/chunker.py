@@ -0,0 +1,200 @@
+"""
+Llamaball - Token Chunker
+File Purpose: Split document text into overlapping, token-bounded chunks
+Primary Functions: Chunker, chunk_budget, get_tokenizer
+Inputs: Document text, embedding model name, optional chunk size and overlap
+Outputs: Chunk tuples (text, n_tokens, start, end) with character offsets
+
+Paragraphs are encoded together with encode_ordinary_batch on the one
+shared tiktoken encoding, packed into chunks of at most chunk_tokens and
+cut from the original text, so separators survive and every chunk knows
+where it came from. Each chunk after the first starts with the last
+overlap_tokens tokens of the one before it. A paragraph too long for one
+chunk is split at token boundaries instead of producing an oversize chunk.
+"""
+
+import logging
+import os
+import re
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER = "cl100k_base"
+# Chunk size and overlap, in tokens, for models not listed below
+DEFAULT_CHUNK_TOKENS = int(os.environ.get("LLAMABALL_CHUNK_SIZE", "1000"))
+DEFAULT_CHUNK_OVERLAP = int(os.environ.get("LLAMABALL_CHUNK_OVERLAP", "200"))
+# Models whose context is shorter than the default chunk. Budgets are in
+# cl100k tokens with headroom, since the models' own tokenizers produce
+# more tokens for the same text.
+MODEL_CHUNK_BUDGETS = {
+    "all-minilm": (200, 32),
+    "paraphrase-multilingual": (100, 16),
+    "mxbai-embed-large": (400, 64),
+    "snowflake-arctic-embed": (400, 64),
+    "bge-large": (400, 64),
+    "granite-embedding": (400, 64),
+}
+# Paragraphs sent to the tokenizer per encode_ordinary_batch call
+ENCODE_BATCH = 256
+# Approximate tokens added where two paragraphs are joined
+_JOIN_TOKENS = 1
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class Chunk(NamedTuple):
+    text: str
+    n_tokens: int
+    start: int
+    end: int
+
+
+class _Unit(NamedTuple):
+    # A paragraph, or a piece of one, with content[start:end] as its text
+    start: int
+    end: int
+    tokens: List[int]
+    # Absolute character offset of each token, once known
+    offsets: Optional[List[int]]
+
+
+def get_tokenizer():
+    """
+    The shared tiktoken encoding. tiktoken keeps one instance per name,
+    and its batch encoder runs on threads over that same instance.
+    """
+    return tiktoken.get_encoding(TOKENIZER)
+
+
+def chunk_budget(model_name: str) -> Tuple[int, int]:
+    """(chunk tokens, overlap tokens) for an embedding model."""
+    base = model_name.split(":")[0].split("/")[-1]
+    return MODEL_CHUNK_BUDGETS.get(base, (DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_OVERLAP))
+
+
+class Chunker:
+    """
+    Token-bounded chunking with overlap and character offsets.
+
+    chunk_tokens caps every chunk (paragraph joins are estimated at one
+    token each); overlap_tokens is clamped below it. encoder is any object
+    with tiktoken's encode_ordinary_batch and decode_with_offsets,
+    defaulting to the shared cl100k_base encoding.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_CHUNK_OVERLAP,
+        encoder=None,
+    ):
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.overlap_tokens = min(max(0, overlap_tokens), self.chunk_tokens // 2)
+        self.encoder = encoder or get_tokenizer()
+
+    @classmethod
+    def for_model(
+        cls,
+        model_name: str,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        encoder=None,
+    ) -> "Chunker":
+        """A chunker sized for model_name; explicit sizes take precedence."""
+        default_size, default_overlap = chunk_budget(model_name)
+        return cls(
+            chunk_tokens or default_size,
+            default_overlap if overlap_tokens is None else overlap_tokens,
+            encoder,
+        )
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return [
+            len(tokens) for tokens in self.encoder.encode_ordinary_batch(list(texts))
+        ]
+
+    def chunk(self, content: str) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        current: List[_Unit] = []
+        size = 0
+        for unit in self._units(content):
+            n_tokens = len(unit.tokens)
+            if current and size + _JOIN_TOKENS + n_tokens > self.chunk_tokens:
+                chunks.append(self._emit(content, current, size))
+                # Carry the previous chunk's tail, leaving room for this unit
+                room = self.chunk_tokens - n_tokens - _JOIN_TOKENS
+                current = self._tail(current, min(self.overlap_tokens, room))
+                size = self._size(current)
+            size += n_tokens + (_JOIN_TOKENS if current else 0)
+            current.append(unit)
+        if current:
+            chunks.append(self._emit(content, current, size))
+        return chunks
+
+    def _units(self, content: str) -> Iterator[_Unit]:
+        """Paragraph units in order; oversize paragraphs come in pieces."""
+        spans = []
+        position = 0
+        for match in _PARAGRAPH_BREAK.finditer(content):
+            spans.append((position, match.start()))
+            position = match.end()
+        spans.append((position, len(content)))
+        spans = [(start, end) for start, end in spans if content[start:end].strip()]
+
+        # Pieces of a split paragraph leave room for the overlap before them
+        step = self.chunk_tokens - self.overlap_tokens
+        for i in range(0, len(spans), ENCODE_BATCH):
+            batch = spans[i : i + ENCODE_BATCH]
+            encoded = self.encoder.encode_ordinary_batch(
+                [content[s:e] for s, e in batch]
+            )
+            for (start, end), tokens in zip(batch, encoded):
+                if len(tokens) <= self.chunk_tokens:
+                    yield _Unit(start, end, tokens, None)
+                    continue
+                offsets = self._offsets(start, tokens)
+                for j in range(0, len(tokens), step):
+                    piece_end = offsets[j + step] if j + step < len(tokens) else end
+                    yield _Unit(
+                        offsets[j],
+                        piece_end,
+                        tokens[j : j + step],
+                        offsets[j : j + step],
+                    )
+
+    def _offsets(self, start: int, tokens: List[int]) -> List[int]:
+        _, offsets = self.encoder.decode_with_offsets(tokens)
+        return [start + offset for offset in offsets]
+
+    def _tail(self, units: List[_Unit], budget: int) -> List[_Unit]:
+        """The last `budget` tokens of units, as units."""
+        tail: List[_Unit] = []
+        for unit in reversed(units):
+            if budget <= 0:
+                break
+            if len(unit.tokens) <= budget:
+                tail.insert(0, unit)
+                budget -= len(unit.tokens) + _JOIN_TOKENS
+                continue
+            offsets = unit.offsets or self._offsets(unit.start, unit.tokens)
+            tail.insert(
+                0,
+                _Unit(
+                    offsets[-budget], unit.end, unit.tokens[-budget:], offsets[-budget:]
+                ),
+            )
+            break
+        return tail
+
+    @staticmethod
+    def _size(units: List[_Unit]) -> int:
+        if not units:
+            return 0
+        return sum(len(unit.tokens) for unit in units) + _JOIN_TOKENS * (len(units) - 1)
+
+    @staticmethod
+    def _emit(content: str, units: List[_Unit], size: int) -> Chunk:
+        start, end = units[0].start, units[-1].end
+        return Chunk(content[start:end], size, start, end)
@@ -2,7 +2,7 @@
 """
 Llamaball CLI - Accessible document chat and RAG system
 File Purpose: Interactive command-line interface for llamaball
-Primary Functions: ingest, chat, stats, list-files, clear-db
+Primary Functions: ingest, chat, stats, list-files, clear-db, vectors
 Inputs: CLI arguments and interactive prompts
 Outputs: Formatted terminal output with accessibility features
 """
@@ -14,45 +14,53 @@ from typing import Optional
 
 import typer
 from rich import print as rprint
+from rich.align import Align
+from rich.columns import Columns
 from rich.console import Console
+from rich.layout import Layout
+from rich.live import Live
+from rich.markdown import Markdown
 from rich.panel import Panel
-from rich.table import Table
 from rich.progress import (
-    Progress, SpinnerColumn, TextColumn, BarColumn, 
-    TaskProgressColumn, TimeElapsedColumn, TimeRemainingColumn,
-    MofNCompleteColumn
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    SpinnerColumn,
+    TaskProgressColumn,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
 )
-from rich.live import Live
-from rich.layout import Layout
+from rich.spinner import Spinner
+from rich.status import Status
+from rich.syntax import Syntax
+from rich.table import Table
 from rich.text import Text
-from rich.align import Align
-from rich.columns import Columns
 from rich.tree import Tree
-from rich.markdown import Markdown
-from rich.syntax import Syntax
-from rich.status import Status
 
 from . import core
+from .chunker import chunk_budget
+from .lexical import SEARCH_MODES
 
 # Initialize rich console with enhanced settings
 console = Console(
     color_system="truecolor",
     force_terminal=True,
     width=None,  # Auto-detect terminal width
-    legacy_windows=False
+    legacy_windows=False,
 )
 
 # Color themes for different contexts
 THEME_COLORS = {
-    'primary': '#00D4AA',      # Teal
-    'secondary': '#0066CC',    # Blue  
-    'success': '#00C851',      # Green
-    'warning': '#FFB84D',      # Orange
-    'error': '#FF4444',        # Red
-    'info': '#33B5E5',         # Light Blue
-    'muted': '#6C757D',        # Gray
-    'accent': '#9C27B0',       # Purple
-    'highlight': '#FFD700'     # Gold
+    "primary": "#00D4AA",  # Teal
+    "secondary": "#0066CC",  # Blue
+    "success": "#00C851",  # Green
+    "warning": "#FFB84D",  # Orange
+    "error": "#FF4444",  # Red
+    "info": "#33B5E5",  # Light Blue
+    "muted": "#6C757D",  # Gray
+    "accent": "#9C27B0",  # Purple
+    "highlight": "#FFD700",  # Gold
 }
 
 # Simple spinner styles
@@ -82,28 +90,28 @@ def create_gradient_text(text: str, colors: list) -> Text:
     """Create gradient text effect with multiple colors."""
     rich_text = Text()
     text_len = len(text)
-    
+
     if len(colors) < 2:
-        colors = [THEME_COLORS['primary'], THEME_COLORS['accent']]
-    
+        colors = [THEME_COLORS["primary"], THEME_COLORS["accent"]]
+
     for i, char in enumerate(text):
         # Calculate color position (0.0 to 1.0)
         position = i / max(text_len - 1, 1)
-        
+
         # Simple two-color gradient
         if position < 0.5:
             color = colors[0]
         else:
             color = colors[1]
-            
+
         rich_text.append(char, style=color)
-    
+
     return rich_text
 
 
 def show_welcome():
     """Display welcome message with simple styling."""
-    
+
     welcome_content = f"""
 [bold {THEME_COLORS['primary']}]🦙 Llamaball - Document Chat System[/bold {THEME_COLORS['primary']}]
 
@@ -112,13 +120,9 @@ def show_welcome():
 • [bold cyan]llamaball chat[/bold cyan] - Start chatting
 • [bold cyan]llamaball --help[/bold cyan] - Show help
 """
-    
-    panel = Panel(
-        welcome_content,
-        border_style=THEME_COLORS['primary'],
-        padding=(1, 2)
-    )
-    
+
+    panel = Panel(welcome_content, border_style=THEME_COLORS["primary"], padding=(1, 2))
+
     console.print()
     console.print(panel)
     console.print()
@@ -128,36 +132,39 @@ def create_file_type_tree():
     """Create a beautiful tree view of supported file types."""
     tree = Tree(
         f"[bold {THEME_COLORS['primary']}]📁 Supported File Types[/bold {THEME_COLORS['primary']}]",
-        style=THEME_COLORS['primary']
+        style=THEME_COLORS["primary"],
     )
-    
+
     from .parsers import FileParser
+
     parser = FileParser()
-    
+
     categories = [
-        ("📝 Text Documents", parser.TEXT_EXTENSIONS, THEME_COLORS['success']),
-        ("💻 Source Code", parser.CODE_EXTENSIONS, THEME_COLORS['info']),
-        ("🌐 Web Files", parser.WEB_EXTENSIONS, THEME_COLORS['warning']),
-        ("📊 Data Files", parser.DATA_EXTENSIONS, THEME_COLORS['accent']),
-        ("📄 Documents", parser.DOCUMENT_EXTENSIONS, THEME_COLORS['primary']),
-        ("📈 Spreadsheets", parser.SPREADSHEET_EXTENSIONS, THEME_COLORS['success']),
-        ("📓 Notebooks", parser.NOTEBOOK_EXTENSIONS, THEME_COLORS['info']),
-        ("📧 Email", parser.EMAIL_EXTENSIONS, THEME_COLORS['warning']),
-        ("🗜️ Archives", parser.ARCHIVE_EXTENSIONS, THEME_COLORS['error']),
-        ("⚙️ Config", parser.CONFIG_EXTENSIONS, THEME_COLORS['muted'])
+        ("📝 Text Documents", parser.TEXT_EXTENSIONS, THEME_COLORS["success"]),
+        ("💻 Source Code", parser.CODE_EXTENSIONS, THEME_COLORS["info"]),
+        ("🌐 Web Files", parser.WEB_EXTENSIONS, THEME_COLORS["warning"]),
+        ("📊 Data Files", parser.DATA_EXTENSIONS, THEME_COLORS["accent"]),
+        ("📄 Documents", parser.DOCUMENT_EXTENSIONS, THEME_COLORS["primary"]),
+        ("📈 Spreadsheets", parser.SPREADSHEET_EXTENSIONS, THEME_COLORS["success"]),
+        ("📓 Notebooks", parser.NOTEBOOK_EXTENSIONS, THEME_COLORS["info"]),
+        ("📧 Email", parser.EMAIL_EXTENSIONS, THEME_COLORS["warning"]),
+        ("🗜️ Archives", parser.ARCHIVE_EXTENSIONS, THEME_COLORS["error"]),
+        ("⚙️ Config", parser.CONFIG_EXTENSIONS, THEME_COLORS["muted"]),
     ]
-    
+
     for category_name, extensions, color in categories:
         if extensions:
             category_branch = tree.add(f"[bold {color}]{category_name}[/bold {color}]")
-            
+
             # Group extensions by rows for better display
             ext_list = sorted(extensions)
             for i in range(0, len(ext_list), 6):
-                row_extensions = ext_list[i:i+6]
-                row_text = " ".join([f"[{color}]{ext}[/{color}]" for ext in row_extensions])
+                row_extensions = ext_list[i : i + 6]
+                row_text = " ".join(
+                    [f"[{color}]{ext}[/{color}]" for ext in row_extensions]
+                )
                 category_branch.add(row_text)
-    
+
     return tree
 
 
@@ -177,22 +184,25 @@ def main(
     """
     if version:
         from . import __version__
-        
+
         version_panel = Panel(
             f"""[bold {THEME_COLORS['primary']}]Llamaball[/bold {THEME_COLORS['primary']}] version [bold {THEME_COLORS['success']}]{__version__}[/bold {THEME_COLORS['success']}]
 [{THEME_COLORS['muted']}]🦙 High-performance document chat and RAG system[/{THEME_COLORS['muted']}]
 [{THEME_COLORS['accent']}]Built with ❤️  for accessibility and local AI[/{THEME_COLORS['accent']}]""",
             title="[bold]Version Info[/bold]",
-            border_style=THEME_COLORS['primary'],
-            padding=(1, 2)
+            border_style=THEME_COLORS["primary"],
+            padding=(1, 2),
         )
         console.print(version_panel)
         raise typer.Exit()
 
     if verbose:
         import logging
+
         logging.getLogger().setLevel(logging.DEBUG)
-        console.print(f"[dim {THEME_COLORS['muted']}]✓ Verbose logging enabled[/dim {THEME_COLORS['muted']}]")
+        console.print(
+            f"[dim {THEME_COLORS['muted']}]✓ Verbose logging enabled[/dim {THEME_COLORS['muted']}]"
+        )
 
 
 @app.command(name="ingest")
@@ -216,7 +226,67 @@ def ingest_command(
         "", "--exclude", "-e", help="Exclude patterns (comma-separated)"
     ),
     force: bool = typer.Option(
-        False, "--force", "-f", help="Force re-indexing of all files"
+        False, "--force", "-f", help="Drop the database and re-index all files"
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Continue the last ingest into the database with its directory, model and options",
+    ),
+    quantization: Optional[str] = typer.Option(
+        None,
+        "--quantization",
+        "-Q",
+        help="Embedding storage: float32, float16 (half size) or int8 (quarter size); "
+        "default: the database's current format, float32 for a new one",
+    ),
+    batch_size: int = typer.Option(
+        core.EMBED_BATCH_SIZE,
+        "--batch-size",
+        "-b",
+        help="Chunks per embedding request",
+    ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", help="Parser processes (default: one per CPU core)"
+    ),
+    chunk_size: Optional[int] = typer.Option(
+        None,
+        "--chunk-size",
+        help="Tokens per chunk (default: sized for the embedding model)",
+    ),
+    chunk_overlap: Optional[int] = typer.Option(
+        None, "--chunk-overlap", help="Tokens each chunk repeats from the previous one"
+    ),
+    min_concurrency: int = typer.Option(
+        core.CONCURRENCY_FLOOR,
+        "--min-concurrency",
+        help="Fewest concurrent embedding requests the adaptive controller uses",
+    ),
+    max_concurrency: int = typer.Option(
+        core.CONCURRENCY_CEILING,
+        "--max-concurrency",
+        help="Most concurrent embedding requests (set equal to --min-concurrency to fix it)",
+    ),
+    parse_timeout: float = typer.Option(
+        core.DEFAULT_PARSE_TIMEOUT,
+        "--parse-timeout",
+        help="Seconds before a single file's parser is killed",
+    ),
+    parse_memory: Optional[int] = typer.Option(
+        core.DEFAULT_PARSE_MEMORY_MB,
+        "--parse-memory",
+        help="Memory cap per parser process in MB (POSIX only)",
+    ),
+    memory_budget: Optional[int] = typer.Option(
+        core.DEFAULT_MEMORY_BUDGET_MB,
+        "--memory-budget",
+        help="MB of chunk text to queue in memory before spilling to disk",
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Don't reuse or store embeddings in the shared cache"
+    ),
+    no_ignore: bool = typer.Option(
+        False, "--no-ignore", help="Don't honour .gitignore / .llamaballignore files"
     ),
     quiet: bool = typer.Option(False, "--quiet", "-q", help="Suppress progress output"),
     show_types: bool = typer.Option(
@@ -245,21 +315,27 @@ def ingest_command(
       llamaball ingest ./docs -r          # Recursively ingest docs/
       llamaball ingest ~/papers -m qwen3  # Use different model
       llamaball ingest . --exclude "*.log,temp*"  # Exclude patterns
+      llamaball ingest . -r --no-ignore  # Include .gitignored files
+      llamaball ingest ./docs -Q int8     # 4x smaller vectors, rescored search
+      llamaball ingest --resume           # Finish an interrupted ingest
       llamaball ingest --show-types       # Show all supported file types
     """
     # Show supported file types if requested
     if show_types:
         from .parsers import FileParser
+
         parser = FileParser()
-        
+
         console.print("[bold]🗂️  Supported File Types:[/bold]\n")
-        
+
         # Create table of supported types
-        table = Table(title="File Type Support", show_header=True, header_style="bold magenta")
+        table = Table(
+            title="File Type Support", show_header=True, header_style="bold magenta"
+        )
         table.add_column("Category", style="cyan", width=12)
         table.add_column("Extensions", style="green")
         table.add_column("Description", style="dim")
-        
+
         categories = [
             ("Text", parser.TEXT_EXTENSIONS, "Plain text, markdown, documentation"),
             ("Code", parser.CODE_EXTENSIONS, "Source code, configuration files"),
@@ -268,19 +344,50 @@ def ingest_command(
             ("Spreadsheets", parser.SPREADSHEET_EXTENSIONS, "Excel, OpenDocument"),
             ("Notebooks", parser.NOTEBOOK_EXTENSIONS, "Jupyter notebooks"),
         ]
-        
+
         for category, extensions, description in categories:
             ext_list = ", ".join(sorted(extensions))
             if len(ext_list) > 60:
                 ext_list = ext_list[:57] + "..."
             table.add_row(category, ext_list, description)
-        
+
         console.print(table)
-        
+
         total_types = sum(len(exts) for _, exts, _ in categories)
-        console.print(f"\n[bold green]Total supported file types: {total_types}[/bold green]")
+        console.print(
+            f"\n[bold green]Total supported file types: {total_types}[/bold green]"
+        )
         return
 
+    if resume:
+        if force:
+            console.print(
+                "[bold red]Error:[/bold red] --resume cannot be combined with --force"
+            )
+            raise typer.Exit(1)
+        last_run = core.get_ingest_run(db)
+        if last_run is None:
+            console.print(
+                f"[bold red]Error:[/bold red] No ingest recorded in '{db}' to resume"
+            )
+            raise typer.Exit(1)
+        # Reuse the recorded settings; an explicit directory still wins
+        directory = directory or last_run["directory"]
+        recursive = recursive or last_run["recursive"]
+        model, provider = last_run["model_name"], last_run["provider"]
+        quantization = last_run["quantization"]
+        exclude = exclude or ",".join(last_run["exclude_patterns"])
+        no_ignore = no_ignore or not last_run["use_ignore_files"]
+        chunk_size = chunk_size or last_run.get("chunk_tokens")
+        if chunk_overlap is None:
+            chunk_overlap = last_run.get("chunk_overlap")
+        if not quiet:
+            state = "interrupted" if last_run["status"] == "running" else "completed"
+            console.print(
+                f"⏯️  Resuming {state} ingest of [cyan]{directory}[/cyan] "
+                f"({last_run['pending_chunks']} chunks waiting for embeddings)"
+            )
+
     # Use current directory if none specified
     if directory is None:
         directory = "."
@@ -298,7 +405,7 @@ def ingest_command(
         raise typer.Exit(1)
 
     # Interactive confirmation for recursive mode
-    if not recursive and not quiet:
+    if not recursive and not quiet and not resume:
         recursive = typer.confirm(
             f"📁 Recursively scan subdirectories in '{directory}'?", default=False
         )
@@ -316,6 +423,21 @@ def ingest_command(
         console.print(f"🤖 Model: [cyan]{model}[/cyan]")
         console.print(f"🔄 Recursive: [cyan]{recursive}[/cyan]")
         console.print(f"⚡ Force reindex: [cyan]{force}[/cyan]")
+        console.print(
+            f"🗜️  Quantization: [cyan]{quantization or 'database default'}[/cyan]"
+        )
+        console.print(f"📦 Embed batch size: [cyan]{batch_size}[/cyan]")
+        default_size, default_overlap = chunk_budget(model)
+        console.print(
+            f"✂️  Chunks: [cyan]{chunk_size or default_size}[/cyan] tokens, "
+            f"[cyan]{default_overlap if chunk_overlap is None else chunk_overlap}[/cyan] overlap"
+        )
+        console.print(
+            f"🎚️  Embed concurrency: [cyan]{min_concurrency}-{max_concurrency}[/cyan] (adaptive)"
+        )
+        console.print(
+            f"🧵 Parser processes: [cyan]{workers or 'auto'}[/cyan] (timeout {parse_timeout:g}s)"
+        )
         console.print(f"🚫 Exclude: [cyan]{exclude if exclude else 'none'}[/cyan]")
         console.print()
 
@@ -325,54 +447,148 @@ def ingest_command(
             with Progress(
                 SpinnerColumn(),
                 TextColumn("[bold blue]{task.description}"),
-                BarColumn(bar_width=40, style=THEME_COLORS['primary'], complete_style=THEME_COLORS['success']),
+                BarColumn(
+                    bar_width=40,
+                    style=THEME_COLORS["primary"],
+                    complete_style=THEME_COLORS["success"],
+                ),
                 TaskProgressColumn(),
                 console=console,
                 transient=False,
-                expand=False
+                expand=False,
             ) as progress:
-                
+
                 task = progress.add_task("📚 Processing files...", total=None)
-                
+
                 def progress_callback(current, total, filename):
                     if total and total > 0:
                         progress.update(task, completed=current, total=total)
-                
+
                 # Call core function with progress callback
                 stats = core.ingest_files(
-                    directory, db, model, provider, recursive, exclude_patterns, force,
-                    progress_callback=progress_callback
+                    directory,
+                    db,
+                    model,
+                    provider,
+                    recursive,
+                    exclude_patterns,
+                    force,
+                    progress_callback=progress_callback,
+                    quantization=quantization,
+                    embed_batch_size=batch_size,
+                    parse_workers=workers,
+                    embed_concurrency_min=min_concurrency,
+                    embed_concurrency_max=max_concurrency,
+                    parse_timeout=parse_timeout,
+                    parse_memory_mb=parse_memory,
+                    memory_budget_mb=memory_budget,
+                    chunk_tokens=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    use_ignore_files=not no_ignore,
+                    use_embed_cache=not no_cache,
                 )
         else:
             stats = core.ingest_files(
-                directory, db, model, provider, recursive, exclude_patterns, force
+                directory,
+                db,
+                model,
+                provider,
+                recursive,
+                exclude_patterns,
+                force,
+                quantization=quantization,
+                embed_batch_size=batch_size,
+                parse_workers=workers,
+                parse_timeout=parse_timeout,
+                embed_concurrency_min=min_concurrency,
+                embed_concurrency_max=max_concurrency,
+                parse_memory_mb=parse_memory,
+                memory_budget_mb=memory_budget,
+                chunk_tokens=chunk_size,
+                chunk_overlap=chunk_overlap,
+                use_ignore_files=not no_ignore,
+                use_embed_cache=not no_cache,
             )
 
         if not quiet:
             console.print(
                 "[bold green]✅ Ingestion completed successfully![/bold green]"
             )
-            
+
             # Show comprehensive statistics
             console.print(f"\n[bold]📊 Ingestion Results:[/bold]")
-            console.print(f"✅ Processed: [green]{stats['processed_files']}[/green] files")
-            console.print(f"⏭️  Skipped: [yellow]{stats['skipped_files']}[/yellow] files")
+            console.print(
+                f"✅ Processed: [green]{stats['processed_files']}[/green] files"
+            )
+            console.print(
+                f"⏭️  Skipped: [yellow]{stats['skipped_files']}[/yellow] files"
+            )
             console.print(f"❌ Errors: [red]{stats['error_files']}[/red] files")
             console.print(f"📄 Total chunks: [cyan]{stats['total_chunks']}[/cyan]")
-            
-            if stats['processed_extensions']:
-                console.print(f"🗂️  File types: [dim]{', '.join(sorted(stats['processed_extensions']))}[/dim]")
-            
-            if stats['error_files'] > 0:
+            if stats["embedded_chunks"]:
+                console.print(
+                    f"⚡ Embedding: [cyan]{stats['chunks_per_second']}[/cyan] chunks/s "
+                    f"({stats['embed_batches']} batches)"
+                )
+                console.print(
+                    f"⏱️  Ingest: [cyan]{stats['ingest_chunks_per_second']}[/cyan] chunks/s "
+                    f"over {stats['ingest_seconds']}s"
+                )
+            if stats["resumed_chunks"]:
+                console.print(
+                    f"⏯️  Resumed: [cyan]{stats['resumed_chunks']}[/cyan] chunks left "
+                    f"pending by an earlier run"
+                )
+            concurrency = stats["embed_concurrency"]
+            if concurrency.get("adjustments"):
+                console.print(
+                    f"🎚️  Embed concurrency settled at [cyan]{concurrency['limit']}[/cyan] "
+                    f"(batch {concurrency['batch_size']}, {concurrency['adjustments']} adjustments)"
+                )
+            if stats["embed_retries"]:
+                console.print(
+                    f"🔁 Embedding retries: [yellow]{stats['embed_retries']}[/yellow]"
+                )
+            if stats["pending_chunks"]:
+                console.print(
+                    f"⏸️  Still pending: [yellow]{stats['pending_chunks']}[/yellow] chunks "
+                    f"without embeddings (run [cyan]llamaball ingest --resume[/cyan])"
+                )
+            if stats["deduplicated_chunks"]:
+                console.print(
+                    f"🧬 Deduplicated: [cyan]{stats['deduplicated_chunks']}[/cyan] chunks "
+                    f"already stored"
+                )
+            if stats["spilled_batches"]:
+                console.print(
+                    f"💾 Spilled: [cyan]{stats['spilled_batches']}[/cyan] batches "
+                    f"({stats['spilled_mb']} MB) over the memory budget"
+                )
+            if stats["peak_rss_mb"] is not None:
+                console.print(
+                    f"📈 Peak memory: [cyan]{stats['peak_rss_mb']}[/cyan] MB RSS"
+                )
+            if stats["cache_hits"]:
+                console.print(
+                    f"♻️  Embedding cache: [cyan]{stats['cache_hits']}[/cyan] hits "
+                    f"({stats['cache_hit_rate']:.0%} of chunks, model calls saved)"
+                )
+
+            if stats["processed_extensions"]:
+                console.print(
+                    f"🗂️  File types: [dim]{', '.join(sorted(stats['processed_extensions']))}[/dim]"
+                )
+
+            if stats["error_files"] > 0:
                 console.print(f"\n[bold yellow]⚠️  Issues Encountered:[/bold yellow]")
-                
+
                 # Categorize errors for better display
                 dependency_errors = []
                 corruption_errors = []
                 protection_errors = []
                 other_errors = []
-                
-                for error in stats['error_messages']:
+
+                for error in stats["error_messages"]:
                     if "not available" in error and "Install with:" in error:
                         dependency_errors.append(error)
                     elif "corrupted" in error or "not a valid" in error:
@@ -381,32 +597,48 @@ def ingest_command(
                         protection_errors.append(error)
                     else:
                         other_errors.append(error)
-                
+
                 if dependency_errors:
-                    console.print(f"[bold blue]📦 Missing Dependencies ({len(dependency_errors)} files):[/bold blue]")
-                    console.print("  To enable these file types, install: [cyan]pip install llamaball[files][/cyan]")
+                    console.print(
+                        f"[bold blue]📦 Missing Dependencies ({len(dependency_errors)} files):[/bold blue]"
+                    )
+                    console.print(
+                        "  To enable these file types, install: [cyan]pip install llamaball[files][/cyan]"
+                    )
                     for error in dependency_errors[:3]:  # Show first 3
                         file_name = error.split(":")[0]
                         console.print(f"  • {file_name}")
                     if len(dependency_errors) > 3:
-                        console.print(f"  ... and {len(dependency_errors) - 3} more files")
-                
+                        console.print(
+                            f"  ... and {len(dependency_errors) - 3} more files"
+                        )
+
                 if corruption_errors:
-                    console.print(f"[bold red]🗂️  Corrupted Files ({len(corruption_errors)} files):[/bold red]")
+                    console.print(
+                        f"[bold red]🗂️  Corrupted Files ({len(corruption_errors)} files):[/bold red]"
+                    )
                     for error in corruption_errors[:3]:
                         console.print(f"  • {error}")
                     if len(corruption_errors) > 3:
-                        console.print(f"  ... and {len(corruption_errors) - 3} more files")
-                
+                        console.print(
+                            f"  ... and {len(corruption_errors) - 3} more files"
+                        )
+
                 if protection_errors:
-                    console.print(f"[bold yellow]🔒 Protected Files ({len(protection_errors)} files):[/bold yellow]")
+                    console.print(
+                        f"[bold yellow]🔒 Protected Files ({len(protection_errors)} files):[/bold yellow]"
+                    )
                     for error in protection_errors[:3]:
                         console.print(f"  • {error}")
                     if len(protection_errors) > 3:
-                        console.print(f"  ... and {len(protection_errors) - 3} more files")
-                
+                        console.print(
+                            f"  ... and {len(protection_errors) - 3} more files"
+                        )
+
                 if other_errors:
-                    console.print(f"[bold red]❌ Other Errors ({len(other_errors)} files):[/bold red]")
+                    console.print(
+                        f"[bold red]❌ Other Errors ({len(other_errors)} files):[/bold red]"
+                    )
                     for error in other_errors[:3]:
                         console.print(f"  • {error}")
                     if len(other_errors) > 3:
@@ -454,6 +686,26 @@ def chat_command(
     system_prompt: Optional[str] = typer.Option(
         None, "--system", "-s", help="Custom system prompt"
     ),
+    nprobe: Optional[int] = typer.Option(
+        None,
+        "--nprobe",
+        help="IVF lists to probe on large databases (higher = better recall, 0 = exact)",
+    ),
+    rescore: Optional[int] = typer.Option(
+        None,
+        "--rescore",
+        help="Candidates re-ranked at full precision on float16/int8 databases (0 = off)",
+    ),
+    search_mode: str = typer.Option(
+        core.DEFAULT_SEARCH_MODE,
+        "--search-mode",
+        help="Retrieval: vector, hybrid (BM25 + vector, rank-fused) or prefilter (BM25 then vector)",
+    ),
+    response_cache: bool = typer.Option(
+        False,
+        "--response-cache",
+        help="Reuse answers to near-identical questions over the same documents",
+    ),
     list_models: bool = typer.Option(
         False, "--list-models", "-l", help="List available models and exit"
     ),
@@ -486,6 +738,8 @@ def chat_command(
       llamaball chat --top-k 5 --temp 0.3     # More documents, lower temperature
       llamaball chat --system "Be concise"    # Custom system prompt
       llamaball chat --top-p 0.8 --repeat-penalty 1.2  # Advanced parameters
+      llamaball chat --nprobe 32               # Higher recall on large databases
+      llamaball chat --search-mode hybrid      # Also match exact identifiers
     """
 
     # Handle list models option
@@ -493,6 +747,12 @@ def chat_command(
         console.print("[bold]🤖 Available Chat Models:[/bold]\n")
         list_available_models()
         return
+    if search_mode not in SEARCH_MODES:
+        console.print(
+            f"[bold red]❌ Unknown search mode:[/bold red] {search_mode} "
+            f"(choose {', '.join(SEARCH_MODES)})"
+        )
+        raise typer.Exit(1)
     # Check if database exists
     db_path = Path(db)
     if not db_path.exists():
@@ -513,6 +773,16 @@ def chat_command(
         console.print(f"💬 Chat Model: [cyan]{chat_model}[/cyan]")
         console.print(f"📊 Top-K: [cyan]{topk}[/cyan]")
         console.print(f"🌡️  Temperature: [cyan]{temperature}[/cyan]")
+        console.print(
+            f"🧭 nprobe: [cyan]{nprobe if nprobe is not None else 'default'}[/cyan]"
+        )
+        console.print(
+            f"🎯 Rescore: [cyan]{rescore if rescore is not None else 'default'}[/cyan]"
+        )
+        console.print(f"🔎 Search mode: [cyan]{search_mode}[/cyan]")
+        console.print(
+            f"♻️  Response cache: [cyan]{'on' if response_cache else 'off'}[/cyan]"
+        )
         console.print()
 
     # Get database stats
@@ -547,6 +817,10 @@ def chat_command(
         top_p,
         top_k,
         repeat_penalty,
+        nprobe,
+        rescore,
+        search_mode,
+        response_cache or None,
     )
 
 
@@ -587,6 +861,8 @@ def stats_command(
         console.print(f"Documents: {stats_info['docs']}")
         console.print(f"Embeddings: {stats_info['embeddings']}")
         console.print(f"Files: {stats_info['files']}")
+        if stats_info["legacy_layout"]:
+            console.print("Layout: legacy (run 'llamaball ingest' to upgrade)")
     else:
         display_stats_table(stats_info, verbose)
 
@@ -676,13 +952,69 @@ def clear_db_command(
 
     # Clear the database
     try:
-        core.init_db(db)
+        core.init_db(db, reset=True).close()
         console.print("[bold green]✅ Database cleared successfully![/bold green]")
     except Exception as e:
         console.print(f"[bold red]❌ Failed to clear database:[/bold red] {e}")
         raise typer.Exit(1)
 
 
+@app.command(name="vectors")
+def vectors_command(
+    db: str = typer.Option(
+        core.DEFAULT_DB_PATH, "--database", "-d", help="SQLite database path"
+    ),
+    rebuild: bool = typer.Option(
+        False, "--rebuild", "-r", help="Rebuild the vector file from the database"
+    ),
+):
+    """
+    🧮 Check or rebuild the memory-mapped vector file.
+
+    Ingestion keeps an append-only vector file next to the database so new
+    processes can start searching without loading every embedding. This
+    command compares that file with the embeddings table and can rebuild it
+    when they diverge.
+
+    Examples:
+      llamaball vectors                  # Check consistency
+      llamaball vectors --rebuild        # Rebuild from the database
+    """
+    if not Path(db).exists():
+        console.print(f"[bold red]❌ Database not found:[/bold red] {db}")
+        raise typer.Exit(1)
+
+    if rebuild:
+        count = core.rebuild_vector_store(db)
+        console.print(
+            f"[bold green]✅ Rebuilt vector file with {count} vectors[/bold green]"
+        )
+        return
+
+    report = core.check_vector_store(db)
+    table = Table(
+        title=f"[bold {THEME_COLORS['primary']}]🧮 Vector File[/bold {THEME_COLORS['primary']}]",
+        show_header=True,
+        header_style=f"bold {THEME_COLORS['accent']}",
+        border_style=THEME_COLORS["primary"],
+    )
+    table.add_column("Metric", style=f"bold {THEME_COLORS['info']}")
+    table.add_column("Value", style=THEME_COLORS["success"], justify="right")
+    table.add_row("Database embeddings", str(report["database_rows"]))
+    table.add_row("Vector file rows", str(report["sidecar_rows"]))
+    table.add_row("Live rows", str(report["live_rows"]))
+    table.add_row("Stale rows", str(report["stale_rows"]))
+    table.add_row("Missing rows", str(report["missing_rows"]))
+    console.print(table)
+
+    if report["consistent"]:
+        console.print("[bold green]✅ Vector file is consistent[/bold green]")
+    else:
+        console.print("[bold yellow]⚠️  Vector file is out of sync[/bold yellow]")
+        console.print("💡 Run [cyan]llamaball vectors --rebuild[/cyan] to fix it")
+        raise typer.Exit(1)
+
+
 @app.command(name="models")
 def models_command(
     custom_model: Optional[str] = typer.Argument(
@@ -740,6 +1072,7 @@ def models_command(
 def version_command():
     """Show version information."""
     from . import __version__
+
     console.print(f"[bold]Llamaball[/bold] version [green]{__version__}[/green]")
     console.print("🦙 High-performance document chat and RAG system")
     console.print("Built with ❤️  for local AI and accessibility")
@@ -765,15 +1098,24 @@ def get_db_stats(db_path: str) -> dict:
 
 
 def get_detailed_stats(db_path: str, verbose: bool = False) -> dict:
-    """Get detailed database statistics"""
+    """Get detailed database statistics without creating or migrating anything"""
     import os
     import sqlite3
 
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
     c = conn.cursor()
 
+    # Databases from before content-addressed chunks keep one row per file
+    # position in documents; report them as-is instead of migrating here
+    columns = {row[1] for row in c.execute("PRAGMA table_info(documents)")}
+    legacy_layout = "filename" in columns
+
     # Basic counts
     docs = c.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    if legacy_layout:
+        chunk_refs = docs
+    else:
+        chunk_refs = c.execute("SELECT COUNT(*) FROM file_chunks").fetchone()[0]
     embeddings = c.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
     files = c.execute("SELECT COUNT(*) FROM files").fetchone()[0]
 
@@ -782,33 +1124,31 @@ def get_detailed_stats(db_path: str, verbose: bool = False) -> dict:
 
     stats = {
         "docs": docs,
+        "chunk_refs": chunk_refs,
         "embeddings": embeddings,
         "files": files,
         "db_size_mb": round(db_size / 1024 / 1024, 2),
+        "legacy_layout": legacy_layout,
     }
 
     if verbose:
         # File type breakdown
-        file_types = c.execute(
-            """
+        file_types = c.execute("""
             SELECT SUBSTR(filename, INSTR(filename, '.') + 1) as ext, COUNT(*) 
             FROM files 
             WHERE INSTR(filename, '.') > 0 
             GROUP BY ext 
             ORDER BY COUNT(*) DESC
-        """
-        ).fetchall()
+        """).fetchall()
         stats["file_types"] = dict(file_types)
 
         # Recent activity
-        recent_files = c.execute(
-            """
+        recent_files = c.execute("""
             SELECT filename, mtime 
             FROM files 
             ORDER BY mtime DESC 
             LIMIT 5
-        """
-        ).fetchall()
+        """).fetchall()
         stats["recent_files"] = recent_files
 
     conn.close()
@@ -853,16 +1193,29 @@ def display_stats_table(stats_info: dict, verbose: bool = False):
         title=f"[bold {THEME_COLORS['primary']}]📊 Database Statistics[/bold {THEME_COLORS['primary']}]",
         show_header=True,
         header_style=f"bold {THEME_COLORS['accent']}",
-        border_style=THEME_COLORS['primary']
+        border_style=THEME_COLORS["primary"],
     )
     table.add_column("Metric", style=f"bold {THEME_COLORS['info']}")
-    table.add_column("Value", style=THEME_COLORS['success'], justify="right")
-    table.add_column("Description", style=THEME_COLORS['muted'])
+    table.add_column("Value", style=THEME_COLORS["success"], justify="right")
+    table.add_column("Description", style=THEME_COLORS["muted"])
 
-    table.add_row("📄 Documents", str(stats_info["docs"]), "Text chunks for search")
-    table.add_row("🔢 Embeddings", str(stats_info["embeddings"]), "Vector representations")
+    table.add_row(
+        "📄 Documents", str(stats_info["docs"]), "Unique text chunks for search"
+    )
+    table.add_row(
+        "🔗 Chunk References",
+        str(stats_info["chunk_refs"]),
+        "File positions sharing those chunks",
+    )
+    table.add_row(
+        "🔢 Embeddings", str(stats_info["embeddings"]), "Vector representations"
+    )
     table.add_row("📁 Files", str(stats_info["files"]), "Source files indexed")
-    table.add_row("💾 Database Size", f"{stats_info['db_size_mb']} MB", "Storage space used")
+    table.add_row(
+        "💾 Database Size", f"{stats_info['db_size_mb']} MB", "Storage space used"
+    )
+    if stats_info.get("legacy_layout"):
+        table.add_row("⚠️ Layout", "legacy", "Run 'llamaball ingest' to upgrade")
 
     if verbose and "file_types" in stats_info:
         for ext, count in list(stats_info["file_types"].items())[:5]:
@@ -877,7 +1230,7 @@ def display_files_table(files_info: list):
         no_files_panel = Panel(
             f"[bold {THEME_COLORS['warning']}]No files found in database[/bold {THEME_COLORS['warning']}]\n"
             f"[{THEME_COLORS['muted']}]Run [bold]llamaball ingest[/bold] to add files.[/{THEME_COLORS['muted']}]",
-            border_style=THEME_COLORS['warning']
+            border_style=THEME_COLORS["warning"],
         )
         console.print(no_files_panel)
         return
@@ -886,30 +1239,30 @@ def display_files_table(files_info: list):
         title=f"[bold {THEME_COLORS['primary']}]📋 Ingested Files[/bold {THEME_COLORS['primary']}]",
         show_header=True,
         header_style=f"bold {THEME_COLORS['accent']}",
-        border_style=THEME_COLORS['primary']
+        border_style=THEME_COLORS["primary"],
     )
     table.add_column("Filename", style=f"bold {THEME_COLORS['info']}")
-    table.add_column("Modified", style=THEME_COLORS['success'])
-    table.add_column("Type", style=THEME_COLORS['warning'])
+    table.add_column("Modified", style=THEME_COLORS["success"])
+    table.add_column("Type", style=THEME_COLORS["warning"])
 
     for filename, mtime in files_info:
         import datetime
         from pathlib import Path
-        
+
         mod_time = datetime.datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M")
         file_ext = Path(filename).suffix.lower()
-        
+
         # Add file type emoji
         type_emoji = "📄"
-        if file_ext in {'.py', '.js', '.ts', '.html', '.css'}:
+        if file_ext in {".py", ".js", ".ts", ".html", ".css"}:
             type_emoji = "💻"
-        elif file_ext in {'.pdf', '.docx', '.doc'}:
+        elif file_ext in {".pdf", ".docx", ".doc"}:
             type_emoji = "📄"
-        elif file_ext in {'.csv', '.xlsx', '.json'}:
+        elif file_ext in {".csv", ".xlsx", ".json"}:
             type_emoji = "📊"
-        elif file_ext in {'.md', '.txt'}:
+        elif file_ext in {".md", ".txt"}:
             type_emoji = "📝"
-        
+
         table.add_row(filename, mod_time, f"{type_emoji} {file_ext}")
 
     console.print(table)
@@ -928,6 +1281,10 @@ def start_interactive_chat(
     top_p: float = 0.9,
     top_k: int = 40,
     repeat_penalty: float = 1.1,
+    nprobe: Optional[int] = None,
+    rescore: Optional[int] = None,
+    search_mode: str = core.DEFAULT_SEARCH_MODE,
+    response_cache: Optional[bool] = None,
 ):
     """Start the interactive chat session with enhanced styling"""
     from prompt_toolkit import PromptSession
@@ -958,21 +1315,25 @@ def start_interactive_chat(
     chat_session.top_p = top_p
     chat_session.top_k = top_k
     chat_session.repeat_penalty = repeat_penalty
+    chat_session.nprobe = nprobe
+    chat_session.rescore = rescore
+    chat_session.search_mode = search_mode
+    if response_cache is not None:
+        chat_session.response_cache = response_cache
 
     while True:
         try:
             # Enhanced user prompt with styling
             user_input = prompt_session.prompt(
-                HTML(f"<user>🤔 You:</user> "), 
-                style=CLI_STYLE
+                HTML(f"<user>🤔 You:</user> "), style=CLI_STYLE
             )
 
             if user_input.lower() in ("exit", "quit", "q"):
                 goodbye_panel = Panel(
                     f"[bold {THEME_COLORS['primary']}]👋 Thanks for using Llamaball![/bold {THEME_COLORS['primary']}]\n"
                     f"[{THEME_COLORS['muted']}]Your conversations help make AI more accessible.[/{THEME_COLORS['muted']}]",
-                    border_style=THEME_COLORS['primary'],
-                    padding=(0, 1)
+                    border_style=THEME_COLORS["primary"],
+                    padding=(0, 1),
                 )
                 console.print(goodbye_panel)
                 break
@@ -986,13 +1347,15 @@ def start_interactive_chat(
                     f"[{THEME_COLORS['success']}]📄 Documents: {stats_info['docs']}[/{THEME_COLORS['success']}]\n"
                     f"[{THEME_COLORS['accent']}]🔢 Embeddings: {stats_info['embeddings']}[/{THEME_COLORS['accent']}]\n"
                     f"[{THEME_COLORS['warning']}]📁 Files: {stats_info['files']}[/{THEME_COLORS['warning']}]",
-                    border_style=THEME_COLORS['info']
+                    border_style=THEME_COLORS["info"],
                 )
                 console.print(stats_panel)
                 continue
             elif user_input.lower() == "clear":
                 chat_session.reset_history()
-                console.print(f"[{THEME_COLORS['success']}]🧹 Conversation history cleared[/{THEME_COLORS['success']}]")
+                console.print(
+                    f"[{THEME_COLORS['success']}]🧹 Conversation history cleared[/{THEME_COLORS['success']}]"
+                )
                 continue
             elif not user_input.strip():
                 continue
@@ -1003,68 +1366,121 @@ def start_interactive_chat(
                 command_panel = Panel(
                     f"[{THEME_COLORS['info']}]{command_result}[/{THEME_COLORS['info']}]",
                     title=f"[bold {THEME_COLORS['accent']}]🔧 System[/bold {THEME_COLORS['accent']}]",
-                    border_style=THEME_COLORS['accent']
+                    border_style=THEME_COLORS["accent"],
                 )
                 console.print(command_panel)
                 continue
 
-            # Simple progress indicator
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[bold blue]🤖 Processing..."),
-                console=console,
-                transient=True
-            ) as progress:
-                progress.add_task("", total=None)
-                
-                try:
-                    response = core.chat(
-                        db=chat_session.db,
-                        model=chat_session.model,
-                        provider=chat_session.provider,
-                        chat_model=chat_session.chat_model,
-                        topk=chat_session.topk,
-                        user_input=user_input,
-                        history=chat_session.history.copy(),
-                        temperature=chat_session.temperature,
-                        max_tokens=chat_session.max_tokens,
-                        top_p=chat_session.top_p,
-                        top_k=chat_session.top_k,
-                        repeat_penalty=chat_session.repeat_penalty,
-                    )
-                    chat_session.history.append({"role": "user", "content": user_input})
-                    chat_session.history.append(
-                        {"role": "assistant", "content": response}
-                    )
-                except Exception as e:
-                    error_panel = Panel(
-                        f"[bold {THEME_COLORS['error']}]❌ Error:[/bold {THEME_COLORS['error']}] {e}",
-                        border_style=THEME_COLORS['error']
-                    )
-                    console.print(error_panel)
-                    if debug:
-                        import traceback
-                        console.print(f"[dim {THEME_COLORS['muted']}]{traceback.format_exc()}[/dim {THEME_COLORS['muted']}]")
-                    continue
-
-            # Display enhanced response
-            response_panel = Panel(
-                response,
-                title=f"[bold {THEME_COLORS['accent']}]🦙 Llamaball Assistant[/bold {THEME_COLORS['accent']}]",
-                border_style=THEME_COLORS['accent'],
-                padding=(1, 2)
+            # Render the answer as it streams in
+            title = f"[bold {THEME_COLORS['accent']}]🦙 Llamaball Assistant[/bold {THEME_COLORS['accent']}]"
+            timings = {}
+            parts = []
+            stream = core.chat_stream(
+                db=chat_session.db,
+                model=chat_session.model,
+                provider=chat_session.provider,
+                chat_model=chat_session.chat_model,
+                topk=chat_session.topk,
+                user_input=user_input,
+                history=chat_session.history.copy(),
+                temperature=chat_session.temperature,
+                max_tokens=chat_session.max_tokens,
+                top_p=chat_session.top_p,
+                top_k=chat_session.top_k,
+                repeat_penalty=chat_session.repeat_penalty,
+                nprobe=chat_session.nprobe,
+                rescore=chat_session.rescore,
+                search_mode=chat_session.search_mode,
+                response_cache=chat_session.response_cache,
+                stats=timings,
             )
-            console.print(response_panel)
+            try:
+                with Live(
+                    Spinner("dots", text="[bold blue]🤖 Processing..."),
+                    console=console,
+                    refresh_per_second=12,
+                ) as live:
+                    for token in stream:
+                        parts.append(token)
+                        live.update(
+                            Panel(
+                                Markdown("".join(parts)),
+                                title=title,
+                                border_style=THEME_COLORS["accent"],
+                                padding=(1, 2),
+                            )
+                        )
+                    if not parts:
+                        live.update(
+                            Panel(
+                                "I'm sorry, I couldn't generate a response.",
+                                title=title,
+                                border_style=THEME_COLORS["accent"],
+                                padding=(1, 2),
+                            )
+                        )
+            except KeyboardInterrupt:
+                # Ctrl+C while generating cancels this answer, not the session
+                stream.close()
+                console.print(
+                    f"[{THEME_COLORS['muted']}]⏹️  Generation cancelled[/{THEME_COLORS['muted']}]"
+                )
+                console.print()
+                continue
+            except Exception as e:
+                stream.close()
+                error_panel = Panel(
+                    f"[bold {THEME_COLORS['error']}]❌ Error:[/bold {THEME_COLORS['error']}] {e}",
+                    border_style=THEME_COLORS["error"],
+                )
+                console.print(error_panel)
+                if debug:
+                    import traceback
+
+                    console.print(
+                        f"[dim {THEME_COLORS['muted']}]{traceback.format_exc()}[/dim {THEME_COLORS['muted']}]"
+                    )
+                continue
+
+            response = "".join(parts)
+            if response:
+                chat_session.history.append({"role": "user", "content": user_input})
+                chat_session.history.append({"role": "assistant", "content": response})
+            if debug:
+                console.print(
+                    f"[{THEME_COLORS['muted']}]{format_chat_timings(timings)}[/{THEME_COLORS['muted']}]"
+                )
             console.print()
 
         except KeyboardInterrupt:
-            console.print(f"\n[{THEME_COLORS['muted']}]👋 Goodbye![/{THEME_COLORS['muted']}]")
+            console.print(
+                f"\n[{THEME_COLORS['muted']}]👋 Goodbye![/{THEME_COLORS['muted']}]"
+            )
             break
         except EOFError:
-            console.print(f"\n[{THEME_COLORS['muted']}]👋 Goodbye![/{THEME_COLORS['muted']}]")
+            console.print(
+                f"\n[{THEME_COLORS['muted']}]👋 Goodbye![/{THEME_COLORS['muted']}]"
+            )
             break
 
 
+def format_chat_timings(timings: dict) -> str:
+    """One-line latency summary of a streamed answer for --debug output"""
+    if timings.get("cached"):
+        return f"⏱️  Response cache hit in {timings.get('total_seconds', 0):.2f}s"
+    if "first_token_seconds" not in timings:
+        return f"⏱️  No tokens generated ({timings.get('total_seconds', 0):.2f}s)"
+    line = (
+        f"⏱️  Retrieval {timings['retrieval_seconds']:.2f}s · "
+        f"first token {timings['first_token_seconds']:.2f}s · "
+        f"{timings['tokens']} tokens at {timings['tokens_per_second']:.1f} tok/s · "
+        f"total {timings['total_seconds']:.2f}s"
+    )
+    if timings.get("used_tools"):
+        line += " · tool call"
+    return line
+
+
 def show_chat_help():
     """Show enhanced help during chat session"""
     help_content = f"""
@@ -1094,15 +1510,15 @@ def show_chat_help():
 • Adjust creativity with [bold cyan]/temp[/bold cyan] (0.0=focused, 1.0=creative)
 
 [bold {THEME_COLORS['accent']}]⌨️ Shortcuts:[/bold {THEME_COLORS['accent']}]
-• [bold cyan]Ctrl+C[/bold cyan] - End session
+• [bold cyan]Ctrl+C[/bold cyan] - Stop the answer being generated, or end session
 • [bold cyan]Ctrl+D[/bold cyan] - End session (Unix/Mac)
 """
-    
+
     help_panel = Panel(
         help_content,
         title=f"[bold {THEME_COLORS['primary']}]Chat Help[/bold {THEME_COLORS['primary']}]",
-        border_style=THEME_COLORS['primary'],
-        padding=(1, 2)
+        border_style=THEME_COLORS["primary"],
+        padding=(1, 2),
     )
     console.print(help_panel)
 
@@ -1123,6 +1539,10 @@ class ChatSession:
         self.top_p = 0.9
         self.top_k = 40
         self.repeat_penalty = 1.1
+        self.nprobe = None
+        self.rescore = None
+        self.search_mode = core.DEFAULT_SEARCH_MODE
+        self.response_cache = core.RESPONSE_CACHE_ENABLED
 
         if system_prompt:
             self.history.append({"role": "system", "content": system_prompt})
@@ -1142,7 +1562,11 @@ class ChatSession:
 • Top-K Retrieval: {self.topk}
 • Top-P: {self.top_p}
 • Top-K Sampling: {self.top_k}
-• Repeat Penalty: {self.repeat_penalty}"""
+• Repeat Penalty: {self.repeat_penalty}
+• nprobe: {self.nprobe if self.nprobe is not None else 'default'}
+• Rescore: {self.rescore if self.rescore is not None else 'default'}
+• Search Mode: {self.search_mode}
+• Response Cache: {'on' if self.response_cache else 'off'}"""
 
 
 def list_available_models(custom_model=None):
@@ -1155,8 +1579,8 @@ def list_available_models(custom_model=None):
         no_models_panel = Panel(
             f"[bold {THEME_COLORS['warning']}]No models found[/bold {THEME_COLORS['warning']}]\n"
             f"[{THEME_COLORS['muted']}]Make sure Ollama is running and models are installed.[/{THEME_COLORS['muted']}]",
-            border_style=THEME_COLORS['warning'],
-            title="[bold]No Models[/bold]"
+            border_style=THEME_COLORS["warning"],
+            title="[bold]No Models[/bold]",
         )
         console.print(no_models_panel)
         return
@@ -1165,17 +1589,17 @@ def list_available_models(custom_model=None):
         # Show detailed info for single model
         model = models[0]
         details = model.get("details", {})
-        
+
         model_details = f"""[bold {THEME_COLORS['primary']}]Model:[/bold {THEME_COLORS['primary']}] {model['name']}
 [bold {THEME_COLORS['success']}]Size:[/bold {THEME_COLORS['success']}] {format_model_size(model['size'])}
 [bold {THEME_COLORS['info']}]Family:[/bold {THEME_COLORS['info']}] {details.get('family', 'unknown')}
 [bold {THEME_COLORS['accent']}]Parameters:[/bold {THEME_COLORS['accent']}] {details.get('parameter_size', 'unknown')}
 [bold {THEME_COLORS['warning']}]Quantization:[/bold {THEME_COLORS['warning']}] {details.get('quantization_level', 'unknown')}"""
-        
+
         model_panel = Panel(
             model_details,
             title=f"[bold {THEME_COLORS['primary']}]Model Details[/bold {THEME_COLORS['primary']}]",
-            border_style=THEME_COLORS['primary']
+            border_style=THEME_COLORS["primary"],
         )
         console.print(model_panel)
     else:
@@ -1183,12 +1607,12 @@ def list_available_models(custom_model=None):
             title=f"[bold {THEME_COLORS['primary']}]🤖 Available Models[/bold {THEME_COLORS['primary']}]",
             show_header=True,
             header_style=f"bold {THEME_COLORS['accent']}",
-            border_style=THEME_COLORS['primary']
+            border_style=THEME_COLORS["primary"],
         )
         table.add_column("Model Name", style=f"bold {THEME_COLORS['info']}")
-        table.add_column("Size", style=THEME_COLORS['success'])
-        table.add_column("Family", style=THEME_COLORS['warning'])
-        table.add_column("Parameters", style=THEME_COLORS['accent'])
+        table.add_column("Size", style=THEME_COLORS["success"])
+        table.add_column("Family", style=THEME_COLORS["warning"])
+        table.add_column("Parameters", style=THEME_COLORS["accent"])
 
         for model in models:
             details = model.get("details", {})
@@ -1199,7 +1623,7 @@ def list_available_models(custom_model=None):
             table.add_row(model["name"], size_str, family, param_size)
 
         console.print(table)
-    
+
     return models
 
 
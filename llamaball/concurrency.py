@@ -0,0 +1,201 @@
+"""
+Llamaball - Adaptive Embedding Concurrency
+File Purpose: AIMD control of in-flight embedding requests and batch size
+Primary Functions: AIMDController (request slots, observations, logged decisions)
+Inputs: Per-request latency, chunk counts, errors and timeouts, embed queue depth
+Outputs: Current concurrency limit and batch size, decision history
+
+A CPU-only Ollama slows down for every request added past what it can
+run in parallel, while a large GPU server sits idle at a fixed low
+count. The controller starts small and adds one in-flight request per
+window while batches are waiting and per-chunk latency stays near the
+best seen (additive increase). Timeouts, errors or latency well above
+that baseline halve it (multiplicative decrease); timeouts also halve
+the batch size, which then grows back while requests are healthy.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# In-flight embedding requests: lower and upper bound, and where to start
+CONCURRENCY_FLOOR = int(os.environ.get("LLAMABALL_EMBED_CONCURRENCY_MIN", "1"))
+CONCURRENCY_CEILING = int(os.environ.get("LLAMABALL_EMBED_CONCURRENCY_MAX", "16"))
+CONCURRENCY_START = int(os.environ.get("LLAMABALL_EMBED_CONCURRENCY_START", "4"))
+# Smallest batch the controller shrinks to; the configured batch size is the ceiling
+BATCH_FLOOR = int(os.environ.get("LLAMABALL_EMBED_BATCH_MIN", "1"))
+# Median per-chunk latency this many times the best window counts as congestion
+LATENCY_TOLERANCE = float(os.environ.get("LLAMABALL_EMBED_LATENCY_TOLERANCE", "2.0"))
+# Share of failed requests in a window that counts as overload
+ERROR_RATE_LIMIT = 0.2
+DECREASE_FACTOR = 0.5
+# Completed requests per decision (at least the current limit)
+MIN_WINDOW = 4
+# Per-window growth of the latency baseline, so one lucky window cannot pin it
+BASELINE_DRIFT = 1.05
+# Decisions kept for stats
+DECISION_HISTORY = 50
+
+
+def is_timeout(error: BaseException) -> bool:
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+class AIMDController:
+    """
+    Gate embedding requests with an adjustable limit and tune it, plus the
+    batch size, from what the requests observe.
+
+    Callers run each model request through ``call(fn, texts)``, or wrap
+    it in ``slot()`` and report it with ``record(seconds, chunks, error)``;
+    cache hits should bypass both so they do not skew latency. queue_depth
+    returns how many
+    batches are waiting; the limit only grows while work is queued, since
+    more concurrency cannot help a producer-bound ingest. Every change is
+    logged at INFO with its reason and kept in ``decisions``.
+    """
+
+    def __init__(
+        self,
+        floor: int = CONCURRENCY_FLOOR,
+        ceiling: int = CONCURRENCY_CEILING,
+        start: int = CONCURRENCY_START,
+        batch_size: int = 32,
+        batch_floor: int = BATCH_FLOOR,
+        latency_tolerance: float = LATENCY_TOLERANCE,
+        queue_depth: Optional[Callable[[], int]] = None,
+    ):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = min(self.ceiling, max(self.floor, start))
+        self.batch_ceiling = max(1, batch_size)
+        self.batch_floor = min(self.batch_ceiling, max(1, batch_floor))
+        self.batch_size = self.batch_ceiling
+        self.latency_tolerance = latency_tolerance
+        self.queue_depth = queue_depth or (lambda: 0)
+        self.adaptive = (
+            self.floor < self.ceiling or self.batch_floor < self.batch_ceiling
+        )
+        self.decisions: List[Dict] = []
+        self.adjustments = 0
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._window: List[tuple] = []
+        self._baseline: Optional[float] = None
+
+    @classmethod
+    def fixed(cls, workers: int, batch_size: int) -> "AIMDController":
+        """A controller that never changes the limit or batch size."""
+        return cls(workers, workers, workers, batch_size, batch_floor=batch_size)
+
+    @contextmanager
+    def slot(self):
+        """Block until fewer than ``limit`` requests are in flight."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def call(self, fn: Callable[[list], object], items: list):
+        """Run fn(items) in a slot and record its latency or failure."""
+        with self.slot():
+            started = time.perf_counter()
+            try:
+                result = fn(items)
+            except Exception as e:
+                self.record(time.perf_counter() - started, len(items), e)
+                raise
+        self.record(time.perf_counter() - started, len(items))
+        return result
+
+    def record(
+        self, seconds: float, chunks: int, error: Optional[BaseException] = None
+    ) -> None:
+        """Report one finished request; decides once a window is complete."""
+        with self._cond:
+            timeout = error is not None and is_timeout(error)
+            self._window.append((seconds / max(1, chunks), error is None, timeout))
+            if len(self._window) >= max(MIN_WINDOW, self.limit):
+                self._decide()
+
+    def _decide(self) -> None:
+        window, self._window = self._window, []
+        if not self.adaptive:
+            return
+        latencies = sorted(latency for latency, ok, _ in window if ok)
+        errors = sum(1 for _, ok, _ in window if not ok)
+        timeouts = sum(1 for _, _, timeout in window if timeout)
+        median = latencies[len(latencies) // 2] if latencies else None
+        if median is not None:
+            if self._baseline is None:
+                self._baseline = median
+            else:
+                self._baseline = min(median, self._baseline * BASELINE_DRIFT)
+        depth = self.queue_depth()
+
+        limit, batch_size = self.limit, self.batch_size
+        if timeouts:
+            reason = f"{timeouts} timeouts"
+            limit = int(limit * DECREASE_FACTOR)
+            batch_size = int(batch_size * DECREASE_FACTOR)
+        elif errors / len(window) >= ERROR_RATE_LIMIT:
+            reason = f"{errors}/{len(window)} requests failed"
+            limit = int(limit * DECREASE_FACTOR)
+        elif median is not None and median > self._baseline * self.latency_tolerance:
+            reason = (
+                f"latency {median * 1000:.1f}ms/chunk over "
+                f"{self.latency_tolerance:g}x baseline {self._baseline * 1000:.1f}ms"
+            )
+            limit = int(limit * DECREASE_FACTOR)
+        else:
+            reason = f"healthy, {depth} batches queued"
+            if depth > 0:
+                limit += 1
+            batch_size += max(1, self.batch_ceiling // 8)
+        limit = min(self.ceiling, max(self.floor, limit))
+        batch_size = min(self.batch_ceiling, max(self.batch_floor, batch_size))
+
+        if (limit, batch_size) == (self.limit, self.batch_size):
+            logger.debug(
+                f"Embedding concurrency holds at {limit} (batch {batch_size}): {reason}"
+            )
+            return
+        logger.info(
+            f"Embedding concurrency {self.limit} -> {limit}, batch size "
+            f"{self.batch_size} -> {batch_size}: {reason}"
+        )
+        self.decisions.append(
+            {
+                "time": time.time(),
+                "limit": limit,
+                "batch_size": batch_size,
+                "reason": reason,
+                "median_seconds_per_chunk": median,
+                "queue_depth": depth,
+            }
+        )
+        del self.decisions[:-DECISION_HISTORY]
+        self.adjustments += 1
+        self.limit, self.batch_size = limit, batch_size
+        self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "batch_size": self.batch_size,
+                "floor": self.floor,
+                "ceiling": self.ceiling,
+                "adjustments": self.adjustments,
+            }
@@ -6,25 +6,70 @@ Inputs: Files, queries, chat messages
 Outputs: Embeddings, search results, chat responses
 """
 
+import json
 import logging
 import os
-import re
 import sqlite3
 import subprocess
 import sys
 import tempfile
+import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import List, Optional, Tuple, Dict, Union
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import ollama
 import requests
-import tiktoken
-from numpy.linalg import norm
 
+from .ann import ann_index_path
+from .cache import (
+    RESPONSE_CACHE_ENABLED,
+    RESULT_CACHE_SIZE,
+    EmbeddingCache,
+    LRUCache,
+    QueryEmbeddingCache,
+    ResponseCache,
+    normalize_query,
+)
+from .chunker import Chunker
+from .concurrency import CONCURRENCY_CEILING, CONCURRENCY_FLOOR, AIMDController
+from .discovery import DEFAULT_DISCOVERY_WORKERS, walk_files
+from .index import (
+    bump_index_generation,
+    check_embedding_config,
+    clear_embedding_config,
+    current_index_generation,
+    ensure_meta_table,
+    get_embedding_config,
+    get_meta,
+    get_vector_index,
+    record_embedding_config,
+    set_meta,
+    update_ann_index,
+)
+from .lexical import (
+    DEFAULT_SEARCH_MODE,
+    HYBRID_CANDIDATES,
+    PREFILTER_CANDIDATES,
+    bm25_search,
+    ensure_fts_index,
+    reciprocal_rank_fusion,
+    validate_search_mode,
+)
+from .parse_pool import (
+    DEFAULT_PARSE_MEMORY_MB,
+    DEFAULT_PARSE_TIMEOUT,
+    ParsePool,
+    default_parse_workers,
+)
+from .parsers import FileParser, get_supported_extensions
+from .pipeline import EmbedBatcher, IngestPipeline
+from .quantization import validate_dtype
+from .spill import DEFAULT_MEMORY_BUDGET_MB, peak_rss_mb
 from .utils import render_markdown_to_html
-from .parsers import FileParser, is_supported_file, get_supported_extensions
+from .vector_store import VectorStore
+from .writer import IngestWriter, content_hash, open_connection
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -36,56 +81,201 @@ DEFAULT_MODEL_NAME = "nomic-embed-text:latest"
 DEFAULT_PROVIDER = "ollama"
 DEFAULT_CHAT_MODEL = os.environ.get("CHAT_MODEL", "llama3.2:1b")
 MAX_CHUNK_SIZE = 32000
+# Chunks sent per ollama.embed request, and the token budget for one request
+EMBED_BATCH_SIZE = int(os.environ.get("LLAMABALL_EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_TOKENS = int(
+    os.environ.get("LLAMABALL_EMBED_BATCH_TOKENS", str(MAX_TOKENS))
+)
 OLLAMA_ENDPOINT = os.environ.get("OLLAMA_ENDPOINT", "http://localhost:11434")
+# meta key holding the settings and status of the last ingest (for --resume)
+INGEST_RUN_KEY = "ingest_run"
 
 # Initialize file parser
 file_parser = FileParser()
 
+# Query-time caches: embeddings by (model, query text), and ranked results
+# keyed by index generation so ingestion invalidates them automatically
+query_embedding_cache = QueryEmbeddingCache()
+search_result_cache = LRUCache(RESULT_CACHE_SIZE)
+# Opt-in semantic cache of chat answers (see chat(response_cache=...))
+chat_response_cache = ResponseCache()
+
 SYSTEM_PROMPT = (
     "You are an assistant that identifies the most feature-complete and robust version of code files "
     "based on the provided context."
 )
 
 
-def init_db(db_path: str) -> sqlite3.Connection:
+def init_db(db_path: str, reset: bool = False) -> sqlite3.Connection:
     """
     Initialize SQLite database with tables for documents and embeddings.
+
+    documents holds each distinct chunk once, keyed by content hash, and
+    file_chunks maps every (filename, chunk_idx) to its document, so
+    duplicated files share rows and vectors. Existing data is kept (and
+    older per-file layouts migrated) unless reset=True, which drops every table.
     """
-    conn = sqlite3.connect(db_path)
+    conn = open_connection(db_path)
     c = conn.cursor()
-    c.execute("DROP TABLE IF EXISTS documents")
-    c.execute("DROP TABLE IF EXISTS embeddings")
-    c.execute("DROP TABLE IF EXISTS files")
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT,
-            chunk_idx INTEGER,
-            content TEXT,
-            UNIQUE(filename, chunk_idx)
-        )
-    """
-    )
-    c.execute(
-        """
+    if reset:
+        c.execute("DROP TABLE IF EXISTS documents_fts")
+        c.execute("DROP TABLE IF EXISTS file_chunks")
+        c.execute("DROP TABLE IF EXISTS documents")
+        c.execute("DROP TABLE IF EXISTS embeddings")
+        c.execute("DROP TABLE IF EXISTS pending_embeddings")
+        c.execute("DROP TABLE IF EXISTS files")
+    elif _has_legacy_documents(conn):
+        _migrate_legacy_documents(conn, db_path)
+    _create_chunk_tables(c)
+    c.execute("""
         CREATE TABLE IF NOT EXISTS embeddings (
             doc_id INTEGER PRIMARY KEY,
             embedding BLOB,
             FOREIGN KEY(doc_id) REFERENCES documents(id)
         )
-    """
-    )
-    c.execute(
-        """
+    """)
+    c.execute("""
     CREATE TABLE IF NOT EXISTS files (
         filename TEXT PRIMARY KEY,
-        mtime REAL
+        mtime REAL,
+        status TEXT NOT NULL DEFAULT 'complete'
     )
+    """)
+    if "status" not in {row[1] for row in c.execute("PRAGMA table_info(files)")}:
+        c.execute(
+            "ALTER TABLE files ADD COLUMN status TEXT NOT NULL DEFAULT 'complete'"
+        )
+    _create_pending_table(c)
+    ensure_meta_table(conn)
+    conn.commit()
+    # Lexical index over chunk text, kept current by triggers on documents
+    ensure_fts_index(conn)
+    if reset:
+        clear_embedding_config(conn)
+        # Tables were just recreated, so the sidecars and any resident index are stale
+        VectorStore(db_path).reset()
+        if os.path.exists(ann_index_path(db_path)):
+            os.remove(ann_index_path(db_path))
+        bump_index_generation(conn)
+    return conn
+
+
+def _create_chunk_tables(c: sqlite3.Cursor) -> None:
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash BLOB UNIQUE NOT NULL,
+            content TEXT
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS file_chunks (
+            filename TEXT NOT NULL,
+            chunk_idx INTEGER NOT NULL,
+            doc_id INTEGER NOT NULL,
+            char_start INTEGER,
+            char_end INTEGER,
+            PRIMARY KEY (filename, chunk_idx),
+            FOREIGN KEY(doc_id) REFERENCES documents(id)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_file_chunks_doc ON file_chunks(doc_id)")
+    # Character offsets of each chunk in its file (NULL for older chunks)
+    columns = {row[1] for row in c.execute("PRAGMA table_info(file_chunks)")}
+    for column in ("char_start", "char_end"):
+        if column not in columns:
+            c.execute(f"ALTER TABLE file_chunks ADD COLUMN {column} INTEGER")
+
+
+def _create_pending_table(c: sqlite3.Cursor) -> None:
+    """
+    Checkpoint of chunks still waiting for a vector. Databases that predate
+    it are seeded with every chunk that has no embedding.
+    """
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pending_embeddings'"
+    ).fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS pending_embeddings (
+            doc_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            FOREIGN KEY(doc_id) REFERENCES documents(id)
+        )
+    """)
+    if not exists:
+        c.execute("""
+            INSERT INTO pending_embeddings (doc_id)
+            SELECT id FROM documents
+            WHERE id NOT IN (SELECT doc_id FROM embeddings)
+        """)
+
+
+def _has_legacy_documents(conn: sqlite3.Connection) -> bool:
+    """True for databases written before chunks were content-addressed."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    return "filename" in columns
+
+
+def _migrate_legacy_documents(conn: sqlite3.Connection, db_path: str) -> None:
+    """
+    Fold per-file document rows into content-addressed chunks, keeping
+    one embedding per distinct chunk, then rebuild the vector sidecar
+    since doc_ids change.
     """
+    logger.info("Migrating database to content-addressed chunk storage")
+    c = conn.cursor()
+    c.execute("BEGIN")
+    c.execute("ALTER TABLE documents RENAME TO legacy_documents")
+    c.execute("ALTER TABLE embeddings RENAME TO legacy_embeddings")
+    _create_chunk_tables(c)
+    c.execute("""
+        CREATE TABLE embeddings (
+            doc_id INTEGER PRIMARY KEY,
+            embedding BLOB,
+            FOREIGN KEY(doc_id) REFERENCES documents(id)
+        )
+    """)
+    new_ids = {}
+    rows = c.execute(
+        "SELECT id, filename, chunk_idx, content FROM legacy_documents ORDER BY id"
+    ).fetchall()
+    for old_id, filename, chunk_idx, content in rows:
+        content = content or ""
+        h = content_hash(content)
+        c.execute(
+            "INSERT OR IGNORE INTO documents (hash, content) VALUES (?, ?)",
+            (h, content),
+        )
+        new_ids[old_id] = c.execute(
+            "SELECT id FROM documents WHERE hash = ?", (h,)
+        ).fetchone()[0]
+        c.execute(
+            "INSERT OR REPLACE INTO file_chunks (filename, chunk_idx, doc_id) VALUES (?, ?, ?)",
+            (filename, chunk_idx, new_ids[old_id]),
+        )
+    c.executemany(
+        "INSERT OR IGNORE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+        (
+            (new_ids[old_id], blob)
+            for old_id, blob in c.execute(
+                "SELECT doc_id, embedding FROM legacy_embeddings ORDER BY doc_id"
+            ).fetchall()
+            if old_id in new_ids
+        ),
     )
+    c.execute("DROP TABLE legacy_embeddings")
+    c.execute("DROP TABLE legacy_documents")
     conn.commit()
-    return conn
+    logger.info(
+        f"Migrated {len(rows)} chunks into {len(set(new_ids.values()))} unique chunks"
+    )
+
+    ensure_meta_table(conn)
+    VectorStore(db_path, get_embedding_config(conn)["dtype"]).rebuild(conn)
+    if os.path.exists(ann_index_path(db_path)):
+        os.remove(ann_index_path(db_path))
+    bump_index_generation(conn)
 
 
 def get_embedding(
@@ -97,12 +287,49 @@ def get_embedding(
     return np.array(emb, dtype=np.float32)
 
 
-def _insert_chunk(cursor, filename, idx, text):
-    cursor.execute(
-        "INSERT OR IGNORE INTO documents (filename, chunk_idx, content) VALUES (?, ?, ?)",
-        (filename, idx, text),
+def get_query_embedding(
+    query: str, model: str, provider: str = DEFAULT_PROVIDER
+) -> np.ndarray:
+    """get_embedding for search queries, served from the query embedding cache."""
+    return query_embedding_cache.get_embedding(
+        f"{provider}:{model}", query, lambda text: get_embedding(text, model, provider)
     )
-    cursor.connection.commit()
+
+
+def search_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Hit/miss counters of the query embedding and search result caches."""
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_results": search_result_cache.stats(),
+        "chat_responses": chat_response_cache.stats(),
+    }
+
+
+def get_embeddings(
+    texts: List[str], model: str, provider: str = DEFAULT_PROVIDER
+) -> np.ndarray:
+    """Embed several texts in one request; returns one row per text."""
+    resp = ollama.embed(model=model, input=list(texts))
+    emb = np.array(resp["embeddings"], dtype=np.float32)
+    if len(emb) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(emb)}")
+    return emb
+
+
+def pack_embed_batches(
+    tasks: List[tuple],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_tokens: int = EMBED_BATCH_TOKENS,
+) -> List[List[tuple]]:
+    """
+    Group embed tasks (rel_path, chunk, chunk_idx, n_tokens, ...) into
+    batches of at most batch_size chunks and max_tokens tokens. A chunk
+    that alone exceeds max_tokens is sent on its own.
+    """
+    batcher = EmbedBatcher(batch_size, max_tokens)
+    batches = [batch for batch in map(batcher.add, tasks) if batch]
+    last = batcher.flush()
+    return batches + [last] if last else batches
 
 
 def run_python_code_func(code: str) -> str:
@@ -147,11 +374,50 @@ def ingest_files(
     exclude_patterns: Optional[List[str]] = None,
     force: bool = False,
     progress_callback: Optional[callable] = None,
+    quantization: Optional[str] = None,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    parse_workers: Optional[int] = None,
+    embed_workers: Optional[int] = None,
+    embed_concurrency_min: int = CONCURRENCY_FLOOR,
+    embed_concurrency_max: int = CONCURRENCY_CEILING,
+    parse_timeout: float = DEFAULT_PARSE_TIMEOUT,
+    parse_memory_mb: Optional[int] = DEFAULT_PARSE_MEMORY_MB,
+    parse_in_processes: bool = True,
+    use_ignore_files: bool = True,
+    discover_workers: int = DEFAULT_DISCOVERY_WORKERS,
+    use_embed_cache: bool = True,
+    embed_cache_path: Optional[str] = None,
+    memory_budget_mb: Optional[int] = DEFAULT_MEMORY_BUDGET_MB,
+    chunk_tokens: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
 ) -> Dict[str, Union[int, List[str]]]:
     """
     Ingest files with comprehensive parsing, chunk by token boundaries,
-    skip unchanged files, and enqueue embedding tasks.
-    
+    skip unchanged files, and embed the chunks.
+
+    Ingestion is incremental: only new or modified files are parsed, and
+    their old chunks and embeddings are replaced in one transaction.
+    Files missing from directory are left in the database, since callers
+    such as the web upload ingest a temporary directory into a shared
+    database. force=True drops everything and rebuilds from scratch.
+
+    Discovery, parsing, chunking, embedding and persistence run as a
+    streaming pipeline over bounded queues (see pipeline.IngestPipeline),
+    so embedding starts with the first chunks and memory does not grow
+    with corpus size.
+
+    Progress is checkpointed in the database: chunks are listed in
+    pending_embeddings until their vector is stored, files carry a
+    status, and the run's settings are recorded (see get_ingest_run).
+    Every run first embeds chunks an interrupted run left pending, so
+    re-running (or `llamaball ingest --resume`) continues where it
+    stopped. Transient embedding errors are retried with backoff.
+
+    With memory_budget_mb, chunk text waiting for the embedder beyond
+    the budget spills to a temporary file and is read back in order, so
+    a burst of huge files keeps memory flat; stats report the spill and
+    the process's peak RSS.
+
     Args:
         directory: Directory to scan for files
         db_path: SQLite database path
@@ -159,296 +425,419 @@ def ingest_files(
         provider: Provider (ollama or openai)
         recursive: Whether to scan recursively
         exclude_patterns: Patterns to exclude
-        force: Force re-indexing all files
-        progress_callback: Optional callback for progress updates
-        
+        force: Drop the database and re-index all files
+        progress_callback: Optional callback(done, total, rel_path) per file;
+            total is None until discovery has finished
+        quantization: Embedding storage format (float32, float16 or int8);
+            None keeps the database's format (float32 for a new database)
+        embed_batch_size: Chunks per embedding request
+        parse_workers: Parser processes (default: one per CPU core)
+        embed_workers: Fixed number of concurrent embedding requests; by
+            default an AIMD controller tunes it (and the batch size, up to
+            embed_batch_size) from latency, errors and queue depth
+        embed_concurrency_min: Fewest in-flight requests the controller uses
+        embed_concurrency_max: Most in-flight requests the controller uses
+        parse_timeout: Seconds a single file may take to parse
+        parse_memory_mb: Optional address-space cap per parser process
+        parse_in_processes: Parse in isolated worker processes; False
+            parses on pipeline threads with no timeout or memory cap
+        use_ignore_files: Honour .gitignore and .llamaballignore files
+        discover_workers: Threads scanning directories in parallel
+        use_embed_cache: Reuse embeddings of identical chunks from the
+            shared (model, content hash) cache instead of re-embedding
+        embed_cache_path: Cache file (default: LLAMABALL_EMBED_CACHE or
+            ~/.cache/llamaball/embeddings.db)
+        memory_budget_mb: MB of queued chunk text to hold in memory before
+            spilling to disk (default: LLAMABALL_INGEST_MEMORY_MB, unset
+            keeps a bounded in-memory queue)
+        chunk_tokens: Tokens per chunk (default: the model's budget, see
+            chunker.chunk_budget)
+        chunk_overlap: Tokens each chunk repeats from the previous one
+
     Returns:
         Dictionary with statistics about ingestion process
-        
+
     Performance:
-        - Multi-threaded embedding generation
+        - Streaming, multi-threaded, batched embedding generation
         - Intelligent file change detection
         - Memory-efficient chunking
         - Comprehensive error handling
         - Real-time progress tracking
     """
-    import fnmatch
-    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
+    from rich.progress import (
+        BarColumn,
+        Progress,
+        SpinnerColumn,
+        TaskProgressColumn,
+        TextColumn,
+        TimeElapsedColumn,
+    )
 
     if exclude_patterns is None:
         exclude_patterns = []
+    if quantization is not None:
+        validate_dtype(quantization)
 
-    # First pass: count files for progress tracking
-    total_files = 0
-    file_list = []
-    
-    walker = (
-        os.walk(directory) if recursive else [(directory, [], os.listdir(directory))]
+    # Initialize database and setup
+    conn = init_db(db_path, reset=force)
+    if quantization is None:
+        quantization = get_embedding_config(conn)["dtype"]
+    # Vectors from different models or formats cannot share one index
+    check_embedding_config(conn, model_name, quantization)
+    record_embedding_config(conn, model_name, quantization)
+    # One shared tokenizer, with chunk size and overlap fitted to the model
+    chunker = Chunker.for_model(model_name, chunk_tokens, chunk_overlap)
+    run = {
+        "directory": os.path.abspath(directory),
+        "model_name": model_name,
+        "provider": provider,
+        "recursive": recursive,
+        "exclude_patterns": exclude_patterns,
+        "quantization": quantization,
+        "use_ignore_files": use_ignore_files,
+        "chunk_tokens": chunker.chunk_tokens,
+        "chunk_overlap": chunker.overlap_tokens,
+        "status": "running",
+        "started_at": time.time(),
+    }
+    set_meta(conn, INGEST_RUN_KEY, json.dumps(run))
+    conn.commit()
+    conn.close()
+    writer = IngestWriter(db_path, quantization)
+    known_mtimes = {} if force else writer.file_mtimes()
+    # Chunks an interrupted run stored without vectors, read back a page at
+    # a time by the chunk stage so they stay within the memory budget
+    resumed_chunks = writer.pending_count()
+
+    def pending_tasks():
+        for rows in writer.pending_pages():
+            counts = chunker.count_tokens([row[1] for row in rows])
+            for (filename, text, chunk_idx, doc_id), n_tokens in zip(rows, counts):
+                yield (filename, text, chunk_idx, n_tokens, doc_id)
+
+    pending = pending_tasks()
+    if resumed_chunks:
+        logger.info(
+            f"Resuming {resumed_chunks} chunks left without embeddings by an earlier run"
+        )
+    logger.info(
+        f"Chunking for {model_name}: {chunker.chunk_tokens} tokens with "
+        f"{chunker.overlap_tokens} overlap ('cl100k_base' tokenizer)"
     )
-    
-    for root, dirs, files in walker:
-        for fname in files:
-            path = os.path.join(root, fname)
-            rel_path = os.path.relpath(path, directory) if recursive else fname
-            
-            # Check exclude patterns
-            if any(
-                fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(fname, pattern)
-                for pattern in exclude_patterns
-            ):
-                continue
-                
-            # Check if file type is supported
-            if not is_supported_file(path):
-                continue
-                
-            if not os.path.isfile(path):
-                continue
-                
-            file_list.append((path, rel_path))
-            total_files += 1
 
-    # Initialize database and setup
-    conn = init_db(db_path)
-    c = conn.cursor()
-    encoder = tiktoken.get_encoding("cl100k_base")
-    logger.info(f"Using 'cl100k_base' tokenizer for model {model_name}")
-    
     # Statistics tracking
     stats = {
-        'processed_files': 0,
-        'skipped_files': 0,
-        'error_files': 0,
-        'total_chunks': 0,
-        'supported_extensions': list(get_supported_extensions()),
-        'processed_extensions': set(),
-        'error_messages': []
+        "processed_files": 0,
+        "skipped_files": 0,
+        "error_files": 0,
+        "total_chunks": 0,
+        "supported_extensions": list(get_supported_extensions()),
+        "processed_extensions": set(),
+        "error_messages": [],
+        "embedded_chunks": 0,
+        "embed_batches": 0,
+        "embed_seconds": 0.0,
+        "chunks_per_second": 0.0,
+        "ingest_seconds": 0.0,
+        "ingest_chunks_per_second": 0.0,
+        "write_transactions": 0,
+        "stage_seconds": {},
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "cache_hit_rate": 0.0,
+        "deduplicated_chunks": 0,
+        "resumed_chunks": resumed_chunks,
+        "embed_retries": 0,
+        "pending_chunks": 0,
+        "embed_concurrency": {},
+        "spilled_batches": 0,
+        "spilled_mb": 0.0,
+        "peak_rss_mb": None,
     }
-    
-    embed_tasks = []
-    
-    # Enhanced progress tracking
-    if progress_callback:
-        # Use external progress callback (from CLI)
-        for i, (path, rel_path) in enumerate(file_list):
-            progress_callback(i + 1, total_files, rel_path)
-            _process_single_file(
-                path, rel_path, c, encoder, force, stats, embed_tasks, directory
+
+    def on_embedded(batch):
+        stats["embedded_chunks"] += len(batch)
+
+    def on_embed_error(batch, error):
+        for rel_path, _, chunk_idx, *_ in batch:
+            stats["error_messages"].append(
+                f"Embedding {rel_path} chunk {chunk_idx}: {str(error)}"
             )
+        # The chunks stay pending for the next run
+        writer.record_embed_failure([task[4] for task in batch], str(error))
+
+    parse_workers = parse_workers or default_parse_workers()
+    pool = None
+    parse = file_parser.parse_file
+    if parse_in_processes:
+        pool = ParsePool(
+            parse_workers, timeout=parse_timeout, memory_mb=parse_memory_mb
+        )
+        parse = pool.parse_file
+
+    cache = EmbeddingCache(embed_cache_path) if use_embed_cache else None
+
+    if embed_workers:
+        controller = AIMDController.fixed(embed_workers, embed_batch_size)
     else:
-        # Internal progress display for API usage
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            TimeElapsedColumn(),
-        ) as progress:
-            task = progress.add_task("Processing files...", total=total_files)
-            
-            for i, (path, rel_path) in enumerate(file_list):
-                progress.update(task, advance=1, description=f"Processing {rel_path}")
-                _process_single_file(
-                    path, rel_path, c, encoder, force, stats, embed_tasks, directory
+        controller = AIMDController(
+            embed_concurrency_min, embed_concurrency_max, batch_size=embed_batch_size
+        )
+
+    def model_embed(texts):
+        # Only model requests take a slot, so cache hits never skew latency
+        return controller.call(
+            lambda batch: get_embeddings(batch, model_name, provider), texts
+        )
+
+    def embed(texts):
+        if cache is None:
+            return model_embed(texts)
+        return cache.embed(f"{provider}:{model_name}", texts, model_embed)
+
+    def make_pipeline(on_file, on_batch):
+        def embedded(batch):
+            on_embedded(batch)
+            on_batch(batch)
+
+        return IngestPipeline(
+            load_file=lambda path, rel_path, mtime, size: _load_file(
+                path, rel_path, known_mtimes, parse, mtime
+            ),
+            chunk_file=lambda loaded: _chunk_loaded_file(loaded, chunker, stats),
+            embed=embed,
+            writer=writer,
+            batch_size=embed_batch_size,
+            max_batch_tokens=EMBED_BATCH_TOKENS,
+            parse_workers=parse_workers,
+            on_file=on_file,
+            on_embedded=embedded,
+            on_embed_error=on_embed_error,
+            controller=controller,
+            memory_budget=memory_budget_mb * 1024 * 1024 if memory_budget_mb else None,
+        )
+
+    files = walk_files(
+        directory,
+        recursive,
+        exclude_patterns=exclude_patterns,
+        use_ignore_files=use_ignore_files,
+        workers=discover_workers,
+    )
+    start = time.perf_counter()
+    try:
+        if progress_callback:
+            # Use external progress callback (from CLI)
+            pipeline = make_pipeline(progress_callback, lambda batch: None)
+            pipeline.run(files, pending)
+        else:
+            # Internal progress display for API usage
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TaskProgressColumn(),
+                TimeElapsedColumn(),
+            ) as progress:
+                file_task = progress.add_task("Processing files...", total=None)
+                embed_task = progress.add_task("Generating embeddings...", total=None)
+
+                def on_file(done, total, rel_path):
+                    progress.update(
+                        file_task,
+                        completed=done,
+                        total=total,
+                        description=f"Processing {rel_path}",
+                    )
+                    progress.update(embed_task, total=stats["total_chunks"])
+
+                pipeline = make_pipeline(
+                    on_file, lambda batch: progress.advance(embed_task, len(batch))
                 )
-    
-    conn.close()
-    
+                pipeline.run(files, pending)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+        if cache is not None:
+            cache.close()
+    elapsed = time.perf_counter() - start
+
     # Convert processed_extensions set to list for JSON serialization
-    stats['processed_extensions'] = list(stats['processed_extensions'])
-    
-    logger.info(f"Queued {len(embed_tasks)} chunks for embedding from {stats['processed_files']} files")
+    stats["processed_extensions"] = list(stats["processed_extensions"])
+    stats["embed_batches"] = pipeline.embed_batches
+    stats["embed_retries"] = pipeline.embed_retries_used
+    stats["embed_concurrency"] = controller.stats()
+    # Embedding throughput counts only time with a request in flight;
+    # ingest throughput is over the whole run, parsing and writes included
+    stats["embed_seconds"] = round(pipeline.embed_active_seconds, 3)
+    stats["ingest_seconds"] = round(elapsed, 3)
+    if stats["embedded_chunks"] and pipeline.embed_active_seconds > 0:
+        stats["chunks_per_second"] = round(
+            stats["embedded_chunks"] / pipeline.embed_active_seconds, 2
+        )
+    if stats["embedded_chunks"] and elapsed > 0:
+        stats["ingest_chunks_per_second"] = round(stats["embedded_chunks"] / elapsed, 2)
+    stats["write_transactions"] = writer.transactions
+    stats["stage_seconds"] = {k: round(v, 3) for k, v in pipeline.stage_seconds.items()}
+    stats["deduplicated_chunks"] = pipeline.reused_chunks
+    stats["spilled_batches"] = pipeline.spilled_batches
+    stats["spilled_mb"] = round(pipeline.spilled_bytes / 2**20, 2)
+    if cache is not None:
+        stats["cache_hits"] = cache.hits
+        stats["cache_misses"] = cache.misses
+        stats["cache_hit_rate"] = round(cache.hit_rate, 4)
+
+    logger.info(
+        f"Embedded {stats['embedded_chunks']} chunks from {stats['processed_files']} files"
+    )
     logger.info(f"Processed file types: {', '.join(stats['processed_extensions'])}")
-    
-    if stats['error_files'] > 0:
+
+    if stats["error_files"] > 0:
         logger.warning(f"Encountered errors in {stats['error_files']} files")
 
-    # Enhanced parallel embedding generation with progress
-    if embed_tasks:
-        if progress_callback:
-            _process_embeddings_with_callback(embed_tasks, db_path, model_name, provider, stats, progress_callback)
-        else:
-            _process_embeddings_internal(embed_tasks, db_path, model_name, provider, stats)
-    
-    logger.info(f"Ingestion complete: {stats['processed_files']} files, {stats['total_chunks']} chunks")
-    
+    # Fold new vectors into the ANN index (built once the corpus is large)
+    update_ann_index(db_path)
+
+    # Publish the new embeddings to resident indexes
+    conn = sqlite3.connect(db_path)
+    stats["pending_chunks"] = conn.execute(
+        "SELECT COUNT(*) FROM pending_embeddings"
+    ).fetchone()[0]
+    if stats["pending_chunks"]:
+        logger.warning(
+            f"{stats['pending_chunks']} chunks still have no embedding; "
+            "re-run ingestion (or 'llamaball ingest --resume') to retry them"
+        )
+    run.update(status="complete", finished_at=time.time())
+    set_meta(conn, INGEST_RUN_KEY, json.dumps(run))
+    bump_index_generation(conn)
+    conn.close()
+    # Includes parsing on pipeline threads, but not parser processes
+    stats["peak_rss_mb"] = peak_rss_mb()
+
+    logger.info(
+        f"Ingestion complete: {stats['processed_files']} files, {stats['total_chunks']} chunks"
+    )
+
     return stats
 
 
-def _process_single_file(path, rel_path, cursor, encoder, force, stats, embed_tasks, directory):
-    """Process a single file for ingestion."""
+def get_ingest_run(db_path: str) -> Optional[dict]:
+    """
+    Settings and status ("running" until it finishes) of the last ingest
+    into db_path, with the number of chunks still waiting for a vector.
+    None if nothing has been ingested with checkpointing.
+    """
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        value = get_meta(conn, INGEST_RUN_KEY)
+        if value is None:
+            return None
+        run = json.loads(value)
+        try:
+            run["pending_chunks"] = conn.execute(
+                "SELECT COUNT(*) FROM pending_embeddings"
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            run["pending_chunks"] = 0
+        return run
+    finally:
+        conn.close()
+
+
+def _load_file(path, rel_path, known_mtimes, parse=None, mtime=None):
+    """
+    Parse one file unless its mtime matches the last ingest.
+    Runs in parse workers, so it reports outcomes instead of touching stats.
+    parse defaults to the in-process FileParser; ingest_files passes a
+    ParsePool so slow or crashing parsers cannot stall the run. mtime is
+    the stat gathered during discovery, saving a second stat per file.
+    """
+    loaded = {
+        "rel_path": rel_path,
+        "path": path,
+        "mtime": None,
+        "status": "ok",
+        "content": "",
+        "error": None,
+    }
     try:
-        # Check if file has changed (unless force mode)
-        if not force:
-            mtime = os.path.getmtime(path)
-            cursor.execute("SELECT mtime FROM files WHERE filename = ?", (rel_path,))
-            row = cursor.fetchone()
-            if row and row[0] == mtime:
-                logger.debug(f"Skipping unchanged file: {rel_path}")
-                stats['skipped_files'] += 1
-                return
-        
+        # Skip files whose mtime matches the last ingest (empty under --force)
+        loaded["mtime"] = mtime if mtime is not None else os.path.getmtime(path)
+        if known_mtimes.get(rel_path) == loaded["mtime"]:
+            loaded["status"] = "unchanged"
+            return loaded
+
         # Parse file content
-        parse_result = file_parser.parse_file(path)
-        
-        if parse_result['error']:
-            error_msg = parse_result['error']
-            # Categorize errors for better user experience
-            if "not available" in error_msg and "Install with:" in error_msg:
-                logger.info(f"Optional dependency missing for {rel_path}: {error_msg}")
-                stats['skipped_files'] += 1
-                return
-            elif "corrupted" in error_msg or "not a valid" in error_msg:
-                logger.warning(f"Corrupted file {rel_path}: {error_msg}")
-                stats['error_files'] += 1
-                stats['error_messages'].append(f"{rel_path}: {error_msg}")
-                return
-            elif "password protected" in error_msg or "encrypted" in error_msg:
-                logger.warning(f"Protected file {rel_path}: {error_msg}")
-                stats['error_files'] += 1
-                stats['error_messages'].append(f"{rel_path}: {error_msg}")
-                return
-            else:
-                logger.warning(f"Error parsing {rel_path}: {error_msg}")
-                stats['error_files'] += 1
-                stats['error_messages'].append(f"{rel_path}: {error_msg}")
-                return
-        
-        content = parse_result['content'].strip()
-        if not content:
-            logger.debug(f"Empty content for {rel_path}")
-            stats['skipped_files'] += 1
-            return
-            
-        # Track file extension
-        ext = Path(path).suffix.lower()
-        stats['processed_extensions'].add(ext)
-            
+        parse_result = (parse or file_parser.parse_file)(path)
+        if parse_result["error"]:
+            loaded["status"] = "parse_error"
+            loaded["error"] = parse_result["error"]
+            return loaded
+        loaded["content"] = parse_result["content"].strip()
+        if not loaded["content"]:
+            loaded["status"] = "empty"
     except Exception as e:
-        logger.warning(f"Unexpected error loading {rel_path}: {e}")
-        stats['error_files'] += 1
-        stats['error_messages'].append(f"{rel_path}: Unexpected error - {str(e)}")
-        return
-    
-    # Chunk content by token boundaries
-    paragraphs = re.split(r"\n\s*\n", content)
-    token_buffer = []
-    chunk_count = 0
-    
-    for para in paragraphs:
-        para_tokens = encoder.encode(para, disallowed_special=())
-        if len(token_buffer) + len(para_tokens) > MAX_TOKENS:
-            if token_buffer:  # Only create chunk if buffer has content
-                text_chunk = encoder.decode(token_buffer)
-                _insert_chunk(cursor, rel_path, chunk_count, text_chunk)
-                embed_tasks.append((rel_path, text_chunk, chunk_count))
-                chunk_count += 1
-                stats['total_chunks'] += 1
-            token_buffer = para_tokens
-        else:
-            token_buffer += para_tokens
-    
-    # Handle remaining buffer
-    if token_buffer:
-        text_chunk = encoder.decode(token_buffer)
-        _insert_chunk(cursor, rel_path, chunk_count, text_chunk)
-        embed_tasks.append((rel_path, text_chunk, chunk_count))
-        stats['total_chunks'] += 1
-    
-    # Update file modification time
-    mtime = os.path.getmtime(path)
-    cursor.execute(
-        "INSERT OR REPLACE INTO files (filename, mtime) VALUES (?, ?)",
-        (rel_path, mtime),
-    )
-    cursor.connection.commit()
-    
-    stats['processed_files'] += 1
-    logger.debug(f"Processed {rel_path} -> {chunk_count + 1 if token_buffer else chunk_count} chunks")
-
-
-def _process_embeddings_with_callback(embed_tasks, db_path, model_name, provider, stats, progress_callback):
-    """Process embeddings with external progress callback."""
-    def embed_worker(task):
-        rel_path, chunk, chunk_idx = task
-        conn_thread = sqlite3.connect(db_path, check_same_thread=False)
-        c_thread = conn_thread.cursor()
-        c_thread.execute(
-            "SELECT id FROM documents WHERE filename = ? AND content = ?",
-            (rel_path, chunk),
-        )
-        row = c_thread.fetchone()
-        if not row:
-            conn_thread.close()
-            return
-        doc_id = row[0]
-        try:
-            emb = get_embedding(chunk, model_name, provider)
-            emb_blob = emb.tobytes()
-            c_thread.execute(
-                "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
-                (doc_id, emb_blob),
-            )
-            conn_thread.commit()
-            logger.debug(f"Embedded {rel_path} chunk {chunk_idx} (doc_id={doc_id})")
-        except Exception as e:
-            logger.error(f"Error embedding {rel_path} chunk {chunk_idx}: {e}")
-            stats['error_messages'].append(f"Embedding {rel_path} chunk {chunk_idx}: {str(e)}")
-        finally:
-            conn_thread.close()
-
-    # Use ThreadPoolExecutor for parallel embedding
-    max_workers = min(8, len(embed_tasks)) if embed_tasks else 1
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        list(pool.map(embed_worker, embed_tasks))
-
-
-def _process_embeddings_internal(embed_tasks, db_path, model_name, provider, stats):
-    """Process embeddings with internal progress display."""
-    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
-    
-    def embed_worker(task):
-        rel_path, chunk, chunk_idx = task
-        conn_thread = sqlite3.connect(db_path, check_same_thread=False)
-        c_thread = conn_thread.cursor()
-        c_thread.execute(
-            "SELECT id FROM documents WHERE filename = ? AND content = ?",
-            (rel_path, chunk),
+        loaded["status"] = "exception"
+        loaded["error"] = str(e)
+    return loaded
+
+
+def _chunk_loaded_file(loaded, chunker, stats):
+    """
+    Record a parsed file's outcome in stats and chunk its content.
+    Returns (rel_path, mtime, [Chunk, ...]) for files whose chunks should
+    be (re)written, or None to leave the database alone.
+    """
+    rel_path = loaded["rel_path"]
+    status = loaded["status"]
+    if status == "unchanged":
+        logger.debug(f"Skipping unchanged file: {rel_path}")
+        stats["skipped_files"] += 1
+        return None
+
+    if status == "exception":
+        logger.warning(f"Unexpected error loading {rel_path}: {loaded['error']}")
+        stats["error_files"] += 1
+        stats["error_messages"].append(
+            f"{rel_path}: Unexpected error - {loaded['error']}"
         )
-        row = c_thread.fetchone()
-        if not row:
-            conn_thread.close()
-            return
-        doc_id = row[0]
-        try:
-            emb = get_embedding(chunk, model_name, provider)
-            emb_blob = emb.tobytes()
-            c_thread.execute(
-                "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
-                (doc_id, emb_blob),
-            )
-            conn_thread.commit()
-            logger.debug(f"Embedded {rel_path} chunk {chunk_idx} (doc_id={doc_id})")
-        except Exception as e:
-            logger.error(f"Error embedding {rel_path} chunk {chunk_idx}: {e}")
-            stats['error_messages'].append(f"Embedding {rel_path} chunk {chunk_idx}: {str(e)}")
-        finally:
-            conn_thread.close()
-
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TaskProgressColumn(),
-        TimeElapsedColumn(),
-    ) as progress:
-        task = progress.add_task("Generating embeddings...", total=len(embed_tasks))
-        
-        # Use ThreadPoolExecutor for parallel embedding
-        max_workers = min(8, len(embed_tasks)) if embed_tasks else 1
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            for _ in pool.map(embed_worker, embed_tasks):
-                progress.advance(task)
+        return None
+
+    if status == "parse_error":
+        error_msg = loaded["error"]
+        # Categorize errors for better user experience
+        if "not available" in error_msg and "Install with:" in error_msg:
+            logger.info(f"Optional dependency missing for {rel_path}: {error_msg}")
+            stats["skipped_files"] += 1
+            return None
+        elif "corrupted" in error_msg or "not a valid" in error_msg:
+            logger.warning(f"Corrupted file {rel_path}: {error_msg}")
+        elif "password protected" in error_msg or "encrypted" in error_msg:
+            logger.warning(f"Protected file {rel_path}: {error_msg}")
+        else:
+            logger.warning(f"Error parsing {rel_path}: {error_msg}")
+        stats["error_files"] += 1
+        stats["error_messages"].append(f"{rel_path}: {error_msg}")
+        return None
+
+    if status == "empty":
+        logger.debug(f"Empty content for {rel_path}")
+        stats["skipped_files"] += 1
+        # Drop whatever an earlier version of the file contributed
+        return rel_path, loaded["mtime"], []
+
+    # Track file extension
+    stats["processed_extensions"].add(Path(loaded["path"]).suffix.lower())
+
+    chunks = chunker.chunk(loaded["content"])
+    stats["total_chunks"] += len(chunks)
+    stats["processed_files"] += 1
+    logger.debug(f"Processed {rel_path} -> {len(chunks)} chunks")
+    return rel_path, loaded["mtime"], chunks
 
 
 def search_embeddings(
@@ -457,34 +846,143 @@ def search_embeddings(
     model_name: str,
     top_k: int,
     provider: str = DEFAULT_PROVIDER,
+    nprobe: Optional[int] = None,
+    rescore: Optional[int] = None,
+    mode: str = DEFAULT_SEARCH_MODE,
 ) -> list:
     """
     Search the SQLite DB for the top_k documents most similar to the query.
+
+    mode selects the retriever: "vector" (embeddings only), "hybrid" (BM25
+    over the FTS5 index and vector search run concurrently, fused with
+    reciprocal rank fusion; scores are RRF scores) or "prefilter" (vector
+    scoring restricted to the best BM25 matches, falling back to a full
+    vector search when nothing matches lexically). Searching never writes:
+    a database ingested before the FTS5 index existed gets vector results
+    until the next ingest builds it.
+
+    Each distinct chunk is scored once and then expanded to one result per
+    file containing it, so duplicated files can return more than top_k rows.
+    Scoring runs against the resident vector index, which is loaded once per
+    process and reloaded only when ingestion bumps the index generation.
+    Large databases with an IVF index only score the nprobe nearest lists;
+    pass nprobe=0 to force exact search. Quantized databases re-rank the best
+    rescore candidates at full precision (rescore=0 disables this).
+
+    Query embeddings and ranked results are cached in memory; result
+    entries are keyed by the index generation, so any ingestion that
+    changes the index makes them unreachable.
+
+    Raises ValueError if model_name is not the model the database was built
+    with, or for an unknown mode.
     """
-    query_emb = get_embedding(query, model_name, provider)
+    validate_search_mode(mode)
+    conn = sqlite3.connect(db_path)
+    try:
+        check_embedding_config(conn, model_name)
+        generation = current_index_generation(db_path, conn)
+    finally:
+        conn.close()
+    cache_key = (
+        os.path.abspath(db_path),
+        provider,
+        model_name,
+        normalize_query(query),
+        top_k,
+        nprobe,
+        rescore,
+        mode,
+        generation,
+    )
+    cached = search_result_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    def lexical(limit):
+        conn = sqlite3.connect(db_path)
+        try:
+            return bm25_search(conn, query, limit)
+        finally:
+            conn.close()
+
+    def vector(limit, candidates=None):
+        query_emb = get_query_embedding(query, model_name, provider)
+        return get_vector_index(db_path).search(
+            query_emb, limit, nprobe=nprobe, rescore=rescore, candidates=candidates
+        )
+
+    if mode == "hybrid":
+        limit = max(top_k, HYBRID_CANDIDATES)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            lexical_hits = pool.submit(lexical, limit)
+            vector_hits = vector(limit)
+            top = reciprocal_rank_fusion([lexical_hits.result(), vector_hits], top_k)
+    elif mode == "prefilter":
+        candidates = [doc_id for doc_id, _ in lexical(PREFILTER_CANDIDATES)]
+        top = vector(top_k, candidates or None)
+    else:
+        top = vector(top_k)
+    results = _expand_hits(db_path, top) if top else []
+    search_result_cache.put(cache_key, tuple(results))
+    return results
+
+
+def _expand_hits(db_path: str, top: List[Tuple[int, float]]) -> list:
+    """Turn ranked (doc_id, score) hits into (filename, content, score) rows."""
+
+    # Fetch all hit contents, and every file containing them, in one round trip
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
-    c.execute("SELECT doc_id, embedding FROM embeddings")
-    scores = []
-    for doc_id, emb_blob in c.fetchall():
-        emb = np.frombuffer(emb_blob, dtype=np.float32)
-        sim = np.dot(query_emb, emb) / (norm(query_emb) * norm(emb))
-        sim = sim.item() if hasattr(sim, "item") else float(sim)
-        scores.append((doc_id, sim))
+    placeholders = ",".join("?" * len(top))
+    c.execute(
+        f"""
+        SELECT d.id, f.filename, d.content
+        FROM documents d JOIN file_chunks f ON f.doc_id = d.id
+        WHERE d.id IN ({placeholders})
+        ORDER BY f.filename, f.chunk_idx
+        """,
+        [doc_id for doc_id, _ in top],
+    )
+    docs: Dict[int, list] = {}
+    for doc_id, fname, content in c.fetchall():
+        docs.setdefault(doc_id, []).append((fname, content))
     conn.close()
-    scores.sort(key=lambda x: x[1], reverse=True)
-    top = scores[:top_k]
+
+    # Each unique chunk was scored once; expand it to every file that contains it
     results = []
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
     for doc_id, score in top:
-        c.execute("SELECT filename, content FROM documents WHERE id = ?", (doc_id,))
-        fname, content = c.fetchone()
-        results.append((fname, content, score))
-    conn.close()
+        seen = set()
+        for fname, content in docs.get(doc_id, []):
+            if fname not in seen:
+                seen.add(fname)
+                results.append((fname, content, score))
     return results
 
 
+def check_vector_store(db_path: str) -> Dict[str, Union[bool, int]]:
+    """
+    Compare the memory-mapped vector sidecar with the embeddings table.
+    Returns counts of live, stale and missing rows plus a 'consistent' flag.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return VectorStore(db_path, get_embedding_config(conn)["dtype"]).check(conn)
+    finally:
+        conn.close()
+
+
+def rebuild_vector_store(db_path: str) -> int:
+    """Rewrite the vector sidecar from the embeddings table; returns row count."""
+    conn = sqlite3.connect(db_path)
+    try:
+        count = VectorStore(db_path, get_embedding_config(conn)["dtype"]).rebuild(conn)
+        # Resident indexes should remap the fresh files
+        bump_index_generation(conn)
+        return count
+    finally:
+        conn.close()
+
+
 def get_available_models(filter_model: Optional[str] = None) -> List[dict]:
     """
     Fetch available Ollama models using the /tags endpoint.
@@ -575,31 +1073,132 @@ def format_model_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} PB"
 
 
-def chat(
-    db: str = DEFAULT_DB_PATH,
-    model: str = DEFAULT_MODEL_NAME,
-    provider: str = DEFAULT_PROVIDER,
-    chat_model: str = DEFAULT_CHAT_MODEL,
-    topk: int = 3,
-    user_input: Optional[str] = None,
-    history: Optional[list] = None,
-    temperature: float = 0.7,
-    max_tokens: int = 512,
-    top_p: float = 0.9,
-    top_k: int = 40,
-    repeat_penalty: float = 1.1,
-) -> str:
+CHAT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "run_python_code",
+            "description": "Execute Python code and return the output.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string", "description": "Python code to run"}
+                },
+                "required": ["code"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "run_bash_command",
+            "description": "Execute a bash command and return the output.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "command": {
+                        "type": "string",
+                        "description": "Bash command to run",
+                    }
+                },
+                "required": ["command"],
+            },
+        },
+    },
+]
+
+
+def chat_options(
+    temperature: float, max_tokens: int, top_p: float, top_k: int, repeat_penalty: float
+) -> dict:
+    """Ollama sampling options for a chat request."""
+    return {
+        "temperature": temperature,
+        "num_predict": max_tokens,
+        "top_p": top_p,
+        "top_k": top_k,
+        "repeat_penalty": repeat_penalty,
+    }
+
+
+def read_index_generation(db: str) -> int:
+    conn = sqlite3.connect(db)
+    try:
+        return current_index_generation(db, conn)
+    finally:
+        conn.close()
+
+
+def response_cache_slot(
+    db: str,
+    model: str,
+    provider: str,
+    chat_model: str,
+    options: dict,
+    history: list,
+    user_input: str,
+    docs: list,
+    generation: int,
+) -> tuple:
     """
-    Run a chat session or single chat turn. Returns the assistant's response as Markdown.
+    (key, query embedding, doc_set, generation) locating a chat turn in
+    chat_response_cache; pass to get(), or to put() followed by the answer.
     """
-    if history is None:
-        history = []
+    # Served from the query cache, so this costs no extra embed call
+    query_emb = get_query_embedding(user_input, model, provider)
+    doc_set = frozenset((fname, content_hash(content)) for fname, content, _ in docs)
+    key = (
+        os.path.abspath(db),
+        chat_model,
+        tuple(sorted(options.items())),
+        content_hash(json.dumps(history, sort_keys=True, default=str)),
+    )
+    return key, query_emb, doc_set, generation
 
-    if user_input is None:
-        raise ValueError("user_input is required")
 
-    # Search for relevant documents
-    docs = search_embeddings(user_input, db, model, topk, provider)
+def _field(obj, name: str, default=None):
+    """Read a field from an ollama response given as a dict or a model object."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def stream_chunk_parts(chunk) -> Tuple[str, list, Optional[int]]:
+    """(content, tool_calls, eval_count) of one streamed chat chunk; eval_count only when done."""
+    msg = _field(chunk, "message") or {}
+    eval_count = _field(chunk, "eval_count") if _field(chunk, "done") else None
+    return (
+        _field(msg, "content") or "",
+        list(_field(msg, "tool_calls") or []),
+        eval_count,
+    )
+
+
+def finish_stream_stats(
+    stats: dict, started: float, first_token: Optional[float]
+) -> None:
+    """Record total time, time to first token and decode rate of a streamed answer."""
+    ended = time.perf_counter()
+    stats["total_seconds"] = round(ended - started, 4)
+    if first_token is not None:
+        stats["first_token_seconds"] = round(first_token - started, 4)
+        decode = ended - first_token
+        stats["tokens_per_second"] = (
+            round(stats["tokens"] / decode, 2) if decode > 0 else 0.0
+        )
+
+
+def tool_followup_messages(
+    messages: list, content: str, tool_calls: list
+) -> List[dict]:
+    """Run the first requested tool and return the messages for the model's follow-up."""
+    function_name, tool_result = _run_tool_call(tool_calls[0])
+    assistant = {"role": "assistant", "content": content, "tool_calls": tool_calls}
+    tool_message = {"role": "tool", "name": function_name, "content": tool_result}
+    return messages + [assistant, tool_message]
+
+
+def build_chat_messages(user_input: str, docs: list, history: list) -> List[dict]:
     context = ""
     for fname, content, score in docs:
         context += f"== {fname} (score={score:.4f}) ==\n{content}\n\n"
@@ -614,140 +1213,224 @@ Question: {user_input}
 
 Please provide a helpful answer based on the context provided. If the context doesn't contain relevant information, say so clearly."""
 
-    # Prepare messages for chat
-    messages = (
+    return (
         [{"role": "system", "content": SYSTEM_PROMPT}]
         + history.copy()
         + [{"role": "user", "content": prompt_text}]
     )
 
-    # Define available tools
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "run_python_code",
-                "description": "Execute Python code and return the output.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "code": {"type": "string", "description": "Python code to run"}
-                    },
-                    "required": ["code"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "run_bash_command",
-                "description": "Execute a bash command and return the output.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "command": {
-                            "type": "string",
-                            "description": "Bash command to run",
-                        }
-                    },
-                    "required": ["command"],
-                },
-            },
-        },
-    ]
-
-    # Prepare model options
-    options = {
-        "temperature": temperature,
-        "num_predict": max_tokens,
-        "top_p": top_p,
-        "top_k": top_k,
-        "repeat_penalty": repeat_penalty,
-    }
 
+def _stream_ollama_chat(chat_model: str, messages: list, options: dict, tools=None):
+    """
+    Yield streamed ollama.chat chunks, retrying without tools for models
+    that reject them. Closing this generator closes the HTTP stream, which
+    stops Ollama generating.
+    """
+    kwargs = {"tools": tools} if tools else {}
+    stream = ollama.chat(
+        model=chat_model, messages=messages, options=options, stream=True, **kwargs
+    )
+    started = False
     try:
-        # Try with tools first
-        response = ollama.chat(
-            model=chat_model,
-            messages=messages,
-            tools=tools,
-            options=options,
-            stream=False,
-        )
+        for chunk in stream:
+            started = True
+            yield chunk
     except Exception as e:
-        if "does not support tools" in str(e):
-            # Fallback to chat without tools
+        if tools and not started and "does not support tools" in str(e):
             logger.info(
                 f"Model {chat_model} doesn't support tools, falling back to simple chat"
             )
-            response = ollama.chat(
-                model=chat_model, messages=messages, options=options, stream=False
-            )
+            yield from _stream_ollama_chat(chat_model, messages, options)
         else:
-            raise e
+            raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
 
-    try:
-        # Handle response based on ollama API structure
-        if isinstance(response, dict):
-            msg = response.get("message", {})
-        else:
-            msg = response.message if hasattr(response, "message") else {}
-
-        # Check for tool calls
-        if isinstance(msg, dict) and msg.get("tool_calls"):
-            tool_calls = msg["tool_calls"]
-            for tool_call in tool_calls:
-                function_name = tool_call["function"]["name"]
-                arguments = tool_call["function"]["arguments"]
-
-                if function_name == "run_python_code":
-                    tool_result = run_python_code_func(arguments["code"])
-                elif function_name == "run_bash_command":
-                    tool_result = run_bash_command_func(arguments["command"])
-                else:
-                    tool_result = f"Unknown function: {function_name}"
-
-                # Add tool result to messages and get final response
-                tool_message = {
-                    "role": "tool",
-                    "name": function_name,
-                    "content": tool_result,
-                }
-
-                followup = ollama.chat(
-                    model=chat_model,
-                    messages=messages + [msg, tool_message],
-                    options=options,
-                    stream=False,
-                )
 
-                if isinstance(followup, dict):
-                    followup_msg = followup.get("message", {})
-                else:
-                    followup_msg = (
-                        followup.message if hasattr(followup, "message") else {}
-                    )
+def _run_tool_call(tool_call) -> Tuple[str, str]:
+    function = _field(tool_call, "function", {})
+    function_name = _field(function, "name")
+    arguments = _field(function, "arguments", {})
+    if function_name == "run_python_code":
+        return function_name, run_python_code_func(arguments["code"])
+    if function_name == "run_bash_command":
+        return function_name, run_bash_command_func(arguments["command"])
+    return function_name, f"Unknown function: {function_name}"
 
-                answer = (
-                    followup_msg.get("content", "")
-                    if isinstance(followup_msg, dict)
-                    else getattr(followup_msg, "content", "")
-                )
-                break
-        else:
-            # No tool calls, just return the content
-            answer = (
-                msg.get("content", "")
-                if isinstance(msg, dict)
-                else getattr(msg, "content", "")
-            )
 
-        return (
-            render_markdown_to_html(answer)
-            if answer
-            else "I'm sorry, I couldn't generate a response."
+def chat_stream(
+    db: str = DEFAULT_DB_PATH,
+    model: str = DEFAULT_MODEL_NAME,
+    provider: str = DEFAULT_PROVIDER,
+    chat_model: str = DEFAULT_CHAT_MODEL,
+    topk: int = 3,
+    user_input: Optional[str] = None,
+    history: Optional[list] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    top_p: float = 0.9,
+    top_k: int = 40,
+    repeat_penalty: float = 1.1,
+    nprobe: Optional[int] = None,
+    rescore: Optional[int] = None,
+    search_mode: str = DEFAULT_SEARCH_MODE,
+    response_cache: Optional[bool] = None,
+    docs: Optional[list] = None,
+    stats: Optional[dict] = None,
+) -> Iterator[str]:
+    """
+    Generate a chat answer as Markdown text fragments, yielded as Ollama
+    streams them (including the answer that follows a tool call).
+
+    docs skips retrieval with already-retrieved search_embeddings results,
+    so callers can show sources before the first token. stats, when given,
+    is filled with retrieval_seconds, first_token_seconds (from the call),
+    tokens, tokens_per_second (decode rate after the first token),
+    total_seconds, cached and used_tools once the stream finishes.
+    Closing the generator early cancels the upstream request. Other
+    parameters are as for chat().
+    """
+    if history is None:
+        history = []
+    if stats is None:
+        stats = {}
+    if user_input is None:
+        raise ValueError("user_input is required")
+
+    started = time.perf_counter()
+    options = chat_options(temperature, max_tokens, top_p, top_k, repeat_penalty)
+
+    use_cache = RESPONSE_CACHE_ENABLED if response_cache is None else response_cache
+    if use_cache:
+        # Read before retrieval so a concurrent ingest can only make the entry stale
+        generation = read_index_generation(db)
+
+    if docs is None:
+        docs = search_embeddings(
+            user_input,
+            db,
+            model,
+            topk,
+            provider,
+            nprobe=nprobe,
+            rescore=rescore,
+            mode=search_mode,
+        )
+    stats.update(
+        retrieval_seconds=round(time.perf_counter() - started, 4),
+        cached=False,
+        used_tools=False,
+        tokens=0,
+    )
+
+    if use_cache:
+        cache_slot = response_cache_slot(
+            db,
+            model,
+            provider,
+            chat_model,
+            options,
+            history,
+            user_input,
+            docs,
+            generation,
         )
+        cached = chat_response_cache.get(*cache_slot)
+        if cached is not None:
+            logger.debug("Answer served from the response cache")
+            stats["cached"] = True
+            first_token = time.perf_counter()
+            yield cached
+            finish_stream_stats(stats, started, first_token)
+            return
 
-    except Exception as e:
-        logger.error(f"Error in chat function: {e}")
-        return f"Error generating response: {e}"
+    parts: List[str] = []
+    first_token = None
+    # The follow-up to a tool call is sent without tools, so this runs at most twice
+    requests_left = [(build_chat_messages(user_input, docs, history), CHAT_TOOLS)]
+    while requests_left:
+        messages, tools = requests_left.pop()
+        tool_calls = []
+        counted = 0
+        for chunk in _stream_ollama_chat(chat_model, messages, options, tools):
+            content, calls, eval_count = stream_chunk_parts(chunk)
+            tool_calls.extend(calls)
+            if content:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                counted += 1
+                parts.append(content)
+                yield content
+            # Prefer Ollama's token count over the number of fragments
+            counted = eval_count or counted
+        stats["tokens"] += counted
+
+        if tool_calls:
+            # Run the first tool and stream the model's answer to its output
+            stats["used_tools"] = True
+            requests_left.append(
+                (tool_followup_messages(messages, "".join(parts), tool_calls), None)
+            )
+            parts = []
+
+    finish_stream_stats(stats, started, first_token)
+    answer = "".join(parts)
+    if use_cache and answer and not stats["used_tools"]:
+        chat_response_cache.put(*cache_slot, answer)
+
+
+def chat(
+    db: str = DEFAULT_DB_PATH,
+    model: str = DEFAULT_MODEL_NAME,
+    provider: str = DEFAULT_PROVIDER,
+    chat_model: str = DEFAULT_CHAT_MODEL,
+    topk: int = 3,
+    user_input: Optional[str] = None,
+    history: Optional[list] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    top_p: float = 0.9,
+    top_k: int = 40,
+    repeat_penalty: float = 1.1,
+    nprobe: Optional[int] = None,
+    rescore: Optional[int] = None,
+    search_mode: str = DEFAULT_SEARCH_MODE,
+    response_cache: Optional[bool] = None,
+) -> str:
+    """
+    Run a chat session or single chat turn. Returns the assistant's response as Markdown.
+    search_mode picks the retriever (vector, hybrid or prefilter; see search_embeddings).
+    Use chat_stream to receive the answer as it is generated.
+
+    With response_cache (default: LLAMABALL_RESPONSE_CACHE), an earlier answer
+    is returned without generating when the question embeds within the
+    cache's cosine threshold of a cached one, retrieval found the same
+    chunks, and chat model, sampling options and history match. Entries
+    expire after a TTL or when the index generation changes; answers that
+    ran tools are never cached.
+    """
+    answer = "".join(
+        chat_stream(
+            db,
+            model,
+            provider,
+            chat_model,
+            topk,
+            user_input,
+            history,
+            temperature,
+            max_tokens,
+            top_p,
+            top_k,
+            repeat_penalty,
+            nprobe=nprobe,
+            rescore=rescore,
+            search_mode=search_mode,
+            response_cache=response_cache,
+        )
+    )
+    if not answer:
+        return "I'm sorry, I couldn't generate a response."
+    return render_markdown_to_html(answer)
@@ -0,0 +1,283 @@
+"""
+Llamaball - File Discovery
+File Purpose: Fast scandir-based walker for ingestion with ignore-file support
+Primary Functions: Walk directories (optionally multi-threaded), prune ignored paths, apply exclude patterns
+Inputs: Root directory, exclude patterns, .gitignore / .llamaballignore files
+Outputs: DiscoveredFile(path, rel_path, mtime, size) for each supported file
+"""
+
+import fnmatch
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+
+from .parsers import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Directories that never hold documents worth indexing
+DEFAULT_IGNORED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "__pycache__",
+        ".venv",
+        "venv",
+        ".tox",
+        ".nox",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+    }
+)
+IGNORE_FILES = (".gitignore", ".llamaballignore")
+DEFAULT_DISCOVERY_WORKERS = 4
+
+
+class DiscoveredFile(NamedTuple):
+    """A file to ingest, with the stat results gathered while walking."""
+
+    path: str
+    rel_path: str
+    mtime: float
+    size: int
+
+
+class IgnoreRule(NamedTuple):
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """Translate one gitignore glob (without !, trailing /) to a regex."""
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.lstrip("/")
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    body = "".join(out)
+    # Unanchored patterns match at any depth
+    return ("" if anchored else "(?:.*/)?") + body + "$"
+
+
+def parse_ignore_lines(lines: Iterable[str]) -> List[IgnoreRule]:
+    """Compile gitignore-style lines into rules (later rules win)."""
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip("\r")
+        if not line.strip() or line.startswith("#"):
+            continue
+        line = line.rstrip() if not line.endswith("\\ ") else line
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        try:
+            regex = re.compile(_translate_gitignore(line))
+        except re.error:
+            logger.debug(f"Ignoring invalid ignore pattern: {line}")
+            continue
+        rules.append(IgnoreRule(regex, negate, dir_only))
+    return rules
+
+
+class IgnoreSpec(NamedTuple):
+    """Rules from one ignore file, relative to the directory holding it."""
+
+    base: str
+    rules: List[IgnoreRule]
+
+
+def is_ignored(specs: Tuple[IgnoreSpec, ...], rel_path: str, is_dir: bool) -> bool:
+    """Apply ignore specs from the root downwards; the last matching rule decides."""
+    ignored = False
+    for spec in specs:
+        if spec.base:
+            if not rel_path.startswith(spec.base + "/"):
+                continue
+            local = rel_path[len(spec.base) + 1 :]
+        else:
+            local = rel_path
+        for rule in spec.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(local):
+                ignored = not rule.negate
+    return ignored
+
+
+def compile_excludes(patterns: Iterable[str]) -> Optional[Pattern]:
+    """Combine fnmatch-style exclude patterns into one regex."""
+    patterns = [p for p in patterns if p]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+def _load_ignore_spec(
+    dir_path: str, rel_dir: str, names: Iterable[str]
+) -> Optional[IgnoreSpec]:
+    rules: List[IgnoreRule] = []
+    for name in IGNORE_FILES:
+        if name not in names:
+            continue
+        try:
+            with open(
+                os.path.join(dir_path, name), "r", encoding="utf-8", errors="replace"
+            ) as f:
+                rules.extend(parse_ignore_lines(f))
+        except OSError as e:
+            logger.debug(f"Could not read {name} in {dir_path}: {e}")
+    return IgnoreSpec(rel_dir, rules) if rules else None
+
+
+class FileWalker:
+    """
+    scandir-based directory walker.
+
+    Directories named in ignored_dirs, matched by an exclude pattern or by
+    a .gitignore / .llamaballignore rule are pruned before descending.
+    Exclude patterns are fnmatch globs tested against both the relative
+    path and the bare name, compiled once. Extensions are checked against
+    a frozen set, and each file's DirEntry stat is reused for its mtime.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        recursive: bool = True,
+        exclude_patterns: Iterable[str] = (),
+        ignored_dirs: Iterable[str] = DEFAULT_IGNORED_DIRS,
+        use_ignore_files: bool = True,
+        extensions: frozenset = SUPPORTED_EXTENSIONS,
+        workers: int = DEFAULT_DISCOVERY_WORKERS,
+    ):
+        self.directory = directory
+        self.recursive = recursive
+        self.exclude = compile_excludes(exclude_patterns)
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self.use_ignore_files = use_ignore_files
+        self.extensions = extensions
+        self.workers = max(1, workers)
+
+    def __iter__(self) -> Iterator[DiscoveredFile]:
+        root = (self.directory, "", ())
+        if self.workers == 1 or not self.recursive:
+            stack = [root]
+            while stack:
+                files, subdirs = self._scan(*stack.pop())
+                yield from files
+                stack.extend(reversed(subdirs))
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="discover"
+        ) as pool:
+            pending = {pool.submit(self._scan, *root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    for subdir in subdirs:
+                        pending.add(pool.submit(self._scan, *subdir))
+                    yield from files
+
+    def _excluded(self, rel_path: str, name: str) -> bool:
+        return self.exclude is not None and bool(
+            self.exclude.match(rel_path) or self.exclude.match(name)
+        )
+
+    def _scan(
+        self, dir_path: str, rel_dir: str, specs: Tuple[IgnoreSpec, ...]
+    ) -> Tuple[List[DiscoveredFile], List[Tuple[str, str, Tuple[IgnoreSpec, ...]]]]:
+        """List one directory: returns (files, subdirectories to descend into)."""
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.warning(f"Cannot scan {dir_path}: {e}")
+            return [], []
+
+        if self.use_ignore_files:
+            spec = _load_ignore_spec(dir_path, rel_dir, {e.name for e in entries})
+            if spec is not None:
+                specs = specs + (spec,)
+
+        files, subdirs = [], []
+        for entry in entries:
+            name = entry.name
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (
+                        not self.recursive
+                        or name in self.ignored_dirs
+                        or self._excluded(rel_path, name)
+                        or (specs and is_ignored(specs, rel_path, True))
+                    ):
+                        continue
+                    subdirs.append((entry.path, rel_path, specs))
+                    continue
+                if os.path.splitext(name)[1].lower() not in self.extensions:
+                    continue
+                if self._excluded(rel_path, name):
+                    continue
+                if specs and is_ignored(specs, rel_path, False):
+                    continue
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files.append(
+                DiscoveredFile(
+                    entry.path, rel_path.replace("/", os.sep), st.st_mtime, st.st_size
+                )
+            )
+        return files, subdirs
+
+
+def walk_files(directory: str, recursive: bool = True, **kwargs) -> FileWalker:
+    """Iterate supported files under directory (see FileWalker)."""
+    return FileWalker(directory, recursive, **kwargs)
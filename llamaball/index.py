@@ -0,0 +1,689 @@
+"""
+Llamaball - Resident Vector Index
+File Purpose: In-process, pre-normalized embedding matrix for fast semantic search
+Primary Functions: Load embeddings once, answer cosine top-k queries, track index generations
+Inputs: SQLite embeddings table, query embeddings
+Outputs: Ranked (doc_id, score) pairs
+"""
+
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ann import ANN_MIN_VECTORS, DEFAULT_NPROBE, IVFIndex, ann_index_path
+from .quantization import (
+    DEFAULT_EMBEDDING_DTYPE,
+    DEFAULT_RESCORE,
+    decode_embeddings,
+    dequantize_rows,
+    quantize_rows,
+)
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "index_generation"
+EMBEDDING_MODEL_KEY = "embedding_model"
+EMBEDDING_DTYPE_KEY = "embedding_dtype"
+EMBEDDING_DIM_KEY = "embedding_dim"
+
+# Rows widened to float32 at a time when scoring compact storage; small
+# enough that the widened block stays in cache for the matmul
+SCORE_BLOCK_ROWS = 2048
+
+# Published generation manifest and per-generation live doc_id snapshots
+PUBLISHED_SUFFIX = ".published.json"
+LIVE_IDS_SUFFIX = ".live-{generation}.npy"
+
+# Resident indexes keyed by absolute database path
+_index_cache: Dict[str, "VectorIndex"] = {}
+_index_lock = threading.Lock()
+# When set, searches use the last published generation (see publish_index)
+_serve_published = False
+
+
+def ensure_meta_table(conn: sqlite3.Connection) -> None:
+    """Create the key/value metadata table if it does not exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    """Read one metadata value (None if unset or the table is missing)."""
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: Optional[str]) -> None:
+    """Write one metadata value; None deletes the key. Caller commits."""
+    ensure_meta_table(conn)
+    if value is None:
+        conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+    else:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+
+def get_index_generation(conn: sqlite3.Connection) -> int:
+    """Return the current index generation (0 for databases without metadata)."""
+    value = get_meta(conn, GENERATION_KEY)
+    return int(value) if value is not None else 0
+
+
+def bump_index_generation(conn: sqlite3.Connection) -> int:
+    """
+    Advance the index generation so resident indexes reload on next query.
+    Must be called whenever rows in the embeddings table change.
+    """
+    ensure_meta_table(conn)
+    conn.execute(
+        "INSERT OR IGNORE INTO meta (key, value) VALUES (?, '0')", (GENERATION_KEY,)
+    )
+    conn.execute(
+        "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = ?",
+        (GENERATION_KEY,),
+    )
+    conn.commit()
+    generation = get_index_generation(conn)
+    # Databases served in published mode get every new generation published
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if db_path and os.path.exists(published_manifest_path(db_path)):
+        publish_index(db_path)
+    return generation
+
+
+def published_manifest_path(db_path: str) -> str:
+    return db_path + PUBLISHED_SUFFIX
+
+
+def read_published_manifest(db_path: str) -> Optional[Dict]:
+    """The last generation published for db_path, or None if never published."""
+    try:
+        with open(published_manifest_path(db_path), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if "generation" in manifest else None
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def publish_index(db_path: str) -> Optional[int]:
+    """
+    Publish the current index generation for processes in published mode.
+
+    The generation and its live doc_ids are read from one SQLite snapshot,
+    saved next to the database with the sidecar length at that point, and
+    made visible by atomically replacing the manifest. Readers therefore
+    switch between complete generations and never see a half-finished
+    ingestion. Returns the generation, or None (after logging) when the
+    sidecar lacks some of its vectors and readers must keep using SQLite.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("BEGIN")
+        generation = get_index_generation(conn)
+        dtype = get_embedding_config(conn)["dtype"]
+        live_ids = np.fromiter(
+            (
+                r[0]
+                for r in conn.execute("SELECT doc_id FROM embeddings ORDER BY doc_id")
+            ),
+            dtype=np.int64,
+        )
+        conn.rollback()
+    finally:
+        conn.close()
+
+    store = VectorStore(db_path, dtype)
+    mapped = store.open()
+    rows = len(mapped.ids) if mapped is not None else 0
+    if len(live_ids):
+        ids = np.asarray(mapped.ids) if mapped is not None else np.empty(0, np.int64)
+        _, missing = store.live_mask(ids, live_ids)
+        if len(missing):
+            logger.warning(
+                f"Not publishing generation {generation}: the vector sidecar is missing "
+                f"{len(missing)} embeddings; run 'llamaball vectors --rebuild'"
+            )
+            return None
+
+    live_path = db_path + LIVE_IDS_SUFFIX.format(generation=generation)
+    _atomic_write(live_path, lambda f: np.save(f, live_ids))
+    manifest = {
+        "generation": generation,
+        "rows": rows,
+        "dtype": dtype,
+        "live_ids": os.path.basename(live_path),
+    }
+    _atomic_write(
+        published_manifest_path(db_path),
+        lambda f: f.write(json.dumps(manifest).encode()),
+    )
+    # Keep the previous snapshot for readers that are still loading it
+    prefix = db_path + LIVE_IDS_SUFFIX.split("{")[0]
+    for path in glob.glob(glob.escape(prefix) + "*.npy"):
+        try:
+            old = int(path[len(prefix) : -len(".npy")])
+        except ValueError:
+            continue
+        if old < generation - 1:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    logger.info(f"Published index generation {generation} ({len(live_ids)} vectors)")
+    return generation
+
+
+def serve_published_index(enabled: bool = True) -> None:
+    """
+    Make this process search only published generations of databases that
+    have a manifest (used by prefork server workers); others are unaffected.
+    """
+    global _serve_published
+    _serve_published = enabled
+    invalidate_vector_index()
+
+
+def current_index_generation(db_path: str, conn: sqlite3.Connection) -> int:
+    """The generation searches in this process see for db_path."""
+    if _serve_published:
+        manifest = read_published_manifest(db_path)
+        if manifest is not None:
+            return int(manifest["generation"])
+    return get_index_generation(conn)
+
+
+def get_embedding_config(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """Embedding model, storage dtype and dimension recorded for a database."""
+    return {
+        "model": get_meta(conn, EMBEDDING_MODEL_KEY),
+        "dtype": get_meta(conn, EMBEDDING_DTYPE_KEY) or DEFAULT_EMBEDDING_DTYPE,
+        "dim": get_meta(conn, EMBEDDING_DIM_KEY),
+    }
+
+
+def check_embedding_config(
+    conn: sqlite3.Connection, model: str, dtype: Optional[str] = None
+) -> None:
+    """
+    Raise ValueError if model (or dtype, when given) differs from what the
+    database was built with. Vectors from different models are not
+    comparable, so mixing them would silently corrupt rankings.
+    """
+    config = get_embedding_config(conn)
+    if config["model"] is None:
+        return
+    if config["model"] != model:
+        raise ValueError(
+            f"Database embeddings were built with '{config['model']}', not "
+            f"'{model}'. Use the same model or re-ingest with --force."
+        )
+    if dtype is not None and config["dtype"] != dtype:
+        raise ValueError(
+            f"Database embeddings are stored as {config['dtype']}, not {dtype}. "
+            "Use the same quantization or re-ingest with --force."
+        )
+
+
+def record_embedding_config(
+    conn: sqlite3.Connection, model: str, dtype: str, dim: Optional[int] = None
+) -> None:
+    """Record the embedding model and storage format for a database."""
+    set_meta(conn, EMBEDDING_MODEL_KEY, model)
+    set_meta(conn, EMBEDDING_DTYPE_KEY, dtype)
+    if dim is not None:
+        set_meta(conn, EMBEDDING_DIM_KEY, str(dim))
+    conn.commit()
+
+
+def clear_embedding_config(conn: sqlite3.Connection) -> None:
+    """Forget the recorded embedding model and format (after a full reset)."""
+    for key in (EMBEDDING_MODEL_KEY, EMBEDDING_DTYPE_KEY, EMBEDDING_DIM_KEY):
+        set_meta(conn, key, None)
+    conn.commit()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length in place; all-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _unit_query(query_emb: np.ndarray) -> Optional[np.ndarray]:
+    query = np.asarray(query_emb, dtype=np.float32).ravel()
+    qnorm = np.linalg.norm(query)
+    if qnorm == 0:
+        return None
+    return query / qnorm
+
+
+class VectorIndex:
+    """
+    Contiguous matrix of unit-normalized embeddings.
+
+    Cosine similarity against every stored vector is a single matrix-vector
+    product, and top-k selection uses argpartition instead of a full sort.
+    Ties are broken by doc_id so rankings match a stable sort of all scores.
+
+    Rows may be float16 or int8 codes (int8 with per-row scales). Codes are
+    scored directly against the query to pick candidates, and only the best
+    ``rescore`` candidates are dequantized and re-ranked exactly.
+    """
+
+    def __init__(
+        self,
+        doc_ids: np.ndarray,
+        matrix: np.ndarray,
+        generation: int = 0,
+        mask: Optional[np.ndarray] = None,
+        dtype: str = DEFAULT_EMBEDDING_DTYPE,
+        scales: Optional[np.ndarray] = None,
+    ):
+        self.doc_ids = doc_ids
+        self.matrix = matrix
+        self.generation = generation
+        # Rows to ignore (superseded or deleted) when backed by the sidecar
+        self.mask = mask
+        self.dtype = dtype
+        self.scales = scales
+        self.ann: Optional[IVFIndex] = None
+        self._ann_rows: List[np.ndarray] = []
+        self._unindexed_rows = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        if self.mask is not None:
+            return int(self.mask.sum())
+        return len(self.doc_ids)
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != "float32"
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "VectorIndex":
+        """Build an index from every row of the embeddings table."""
+        generation = get_index_generation(conn)
+        dtype = get_embedding_config(conn)["dtype"]
+        rows = conn.execute(
+            "SELECT doc_id, embedding FROM embeddings ORDER BY doc_id"
+        ).fetchall()
+        if not rows:
+            return cls(
+                np.empty(0, dtype=np.int64),
+                np.empty((0, 0), dtype=np.float32),
+                generation,
+                dtype=dtype,
+            )
+
+        doc_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        matrix = normalize_rows(decode_embeddings([r[1] for r in rows], dtype))
+        codes, scales = quantize_rows(matrix, dtype)
+        logger.debug(
+            f"Loaded vector index: {len(doc_ids)} {dtype} vectors, "
+            f"generation {generation}"
+        )
+        return cls(doc_ids, codes, generation, dtype=dtype, scales=scales)
+
+    @classmethod
+    def from_store(
+        cls, store: VectorStore, conn: sqlite3.Connection
+    ) -> Optional["VectorIndex"]:
+        """
+        Map the sidecar vector file instead of deserializing BLOBs.
+        Returns None when the sidecar is missing or lags the database.
+        """
+        mapped = store.open()
+        if mapped is None:
+            return None
+        if mapped.dtype != get_embedding_config(conn)["dtype"]:
+            logger.warning(
+                f"Vector sidecar is stored as {mapped.dtype}; "
+                "run 'llamaball vectors --rebuild' to resync it"
+            )
+            return None
+        generation = get_index_generation(conn)
+        db_ids = np.fromiter(
+            (r[0] for r in conn.execute("SELECT doc_id FROM embeddings")),
+            dtype=np.int64,
+        )
+        mask, missing = store.live_mask(np.asarray(mapped.ids), db_ids)
+        if len(missing):
+            logger.warning(
+                f"Vector sidecar is missing {len(missing)} embeddings; "
+                "run 'llamaball vectors --rebuild' to resync it"
+            )
+            return None
+        logger.debug(
+            f"Mapped vector sidecar: {int(mask.sum())} live {mapped.dtype} vectors, "
+            f"generation {generation}"
+        )
+        return cls(
+            np.asarray(mapped.ids),
+            mapped.codes,
+            generation,
+            None if mask.all() else mask,
+            dtype=mapped.dtype,
+            scales=mapped.scales,
+        )
+
+    @classmethod
+    def from_published(cls, db_path: str, manifest: Dict) -> Optional["VectorIndex"]:
+        """
+        Map the sidecar as it was when manifest was published: only its first
+        ``rows`` rows, restricted to the generation's live doc_ids. Returns
+        None when the snapshot or sidecar is no longer usable.
+        """
+        generation = int(manifest["generation"])
+        dtype = manifest["dtype"]
+        try:
+            live_ids = np.load(
+                os.path.join(os.path.dirname(db_path), manifest["live_ids"])
+            )
+        except (OSError, ValueError):
+            return None
+        rows = int(manifest["rows"])
+        if rows == 0:
+            return cls(
+                np.empty(0, dtype=np.int64),
+                np.empty((0, 0), dtype=np.float32),
+                generation,
+                dtype=dtype,
+            )
+        store = VectorStore(db_path, dtype)
+        mapped = store.open()
+        if mapped is None or mapped.dtype != dtype or len(mapped.ids) < rows:
+            return None
+        ids = np.asarray(mapped.ids[:rows])
+        mask, missing = store.live_mask(ids, live_ids)
+        if len(missing):
+            return None
+        logger.debug(
+            f"Mapped published vector index: {int(mask.sum())} live {dtype} vectors, "
+            f"generation {generation}"
+        )
+        return cls(
+            ids,
+            mapped.codes[:rows],
+            generation,
+            None if mask.all() else mask,
+            dtype=dtype,
+            scales=mapped.scales[:rows] if mapped.scales is not None else None,
+        )
+
+    @classmethod
+    def load(cls, db_path: str) -> "VectorIndex":
+        """Open db_path and build an index, preferring the mmap sidecar."""
+        conn = sqlite3.connect(db_path)
+        try:
+            return _load_index(db_path, conn)
+        finally:
+            conn.close()
+
+    def live_rows(self) -> np.ndarray:
+        """Row positions holding current vectors."""
+        if self.mask is not None:
+            return np.flatnonzero(self.mask)
+        return np.arange(len(self.doc_ids))
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Float32 (dequantized) copies of the given rows."""
+        scales = self.scales[rows] if self.scales is not None else None
+        return dequantize_rows(self.matrix[rows], scales, self.dtype)
+
+    def attach_ann(self, ann: Optional[IVFIndex]) -> None:
+        """
+        Use an IVF index for candidate generation. Inverted lists are mapped
+        from doc_ids to row positions once; live rows missing from the IVF
+        are always scored exhaustively so no vector is ever unreachable.
+        """
+        self.ann = ann
+        self._ann_rows = []
+        self._unindexed_rows = np.empty(0, dtype=np.int64)
+        if ann is None:
+            return
+        live = self.live_rows()
+        live_ids = self.doc_ids[live]
+        sorter = np.argsort(live_ids, kind="stable")
+        sorted_ids = live_ids[sorter]
+        covered = np.zeros(len(live), dtype=bool)
+        for ids in ann.lists:
+            if len(sorted_ids) == 0 or len(ids) == 0:
+                self._ann_rows.append(np.empty(0, dtype=np.int64))
+                continue
+            pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+            rows = sorter[pos[sorted_ids[pos] == ids]]
+            covered[rows] = True
+            self._ann_rows.append(np.sort(live[rows]))
+        self._unindexed_rows = live[~covered]
+
+    def uses_ann(self, nprobe: Optional[int] = None) -> bool:
+        """Whether a query with this nprobe would go through the IVF index."""
+        if nprobe is not None and nprobe <= 0:
+            return False
+        return self.ann is not None and len(self) >= ANN_MIN_VECTORS
+
+    def _dot(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Dot products of query with stored rows (all rows when rows is None).
+        Compact codes are widened a block at a time into one reused buffer
+        and int8 scales are applied to the scores, never to the rows.
+        """
+        if not self.quantized:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            return np.asarray(matrix @ query, dtype=np.float32)
+        n = len(self.doc_ids) if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        buffer = np.empty(
+            (min(n, SCORE_BLOCK_ROWS), self.matrix.shape[1]), dtype=np.float32
+        )
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, n)
+            codes = (
+                self.matrix[start:stop]
+                if rows is None
+                else self.matrix[rows[start:stop]]
+            )
+            block = buffer[: stop - start]
+            np.copyto(block, codes, casting="unsafe")
+            np.matmul(block, query, out=out[start:stop])
+        if self.scales is not None:
+            out *= self.scales if rows is None else self.scales[rows]
+        return out
+
+    def scores(self, query_emb: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every stored vector."""
+        query = _unit_query(query_emb)
+        if query is None:
+            return np.zeros(len(self.doc_ids), dtype=np.float32)
+        return self._dot(query)
+
+    def search(
+        self,
+        query_emb: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        rescore: Optional[int] = None,
+        candidates: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Return up to top_k (doc_id, score) pairs, best first.
+
+        With an attached IVF index and a large enough corpus, only the nprobe
+        closest inverted lists are scored; nprobe=0 forces exact search.
+        For float16/int8 storage the best max(top_k, rescore) candidates are
+        re-ranked against the full-precision query; rescore=0 skips that.
+        candidates restricts scoring to those doc_ids (e.g. lexical matches).
+        """
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return []
+        query = _unit_query(query_emb)
+        if query is None:
+            return []
+
+        rows = None
+        if candidates is not None:
+            live = self.live_rows()
+            rows = live[
+                np.isin(self.doc_ids[live], np.asarray(candidates, dtype=np.int64))
+            ]
+            if len(rows) == 0:
+                return []
+        elif self.uses_ann(nprobe):
+            probed = self.ann.probe(query, nprobe or DEFAULT_NPROBE)
+            rows = np.concatenate(
+                [self._ann_rows[i] for i in probed] + [self._unindexed_rows]
+            )
+            if len(rows) == 0:
+                return []
+            rows.sort()
+
+        rescore = DEFAULT_RESCORE if rescore is None else rescore
+        rescoring = self.quantized and rescore > 0
+        scores = self._dot(query, rows)
+        if rows is None:
+            rows = np.arange(len(self.doc_ids))
+            if self.mask is not None:
+                scores = np.where(self.mask, scores, -np.inf)
+        ids = self.doc_ids[rows]
+
+        if not rescoring:
+            order = top_k_indices(scores, min(top_k, len(rows)), ids)
+            return [(int(ids[i]), float(scores[i])) for i in order]
+
+        candidates = top_k_indices(scores, min(max(top_k, rescore), len(rows)), ids)
+        candidates = candidates[np.isfinite(scores[candidates])]
+        exact = self.vectors(rows[candidates]) @ query
+        order = top_k_indices(exact, min(top_k, len(candidates)), ids[candidates])
+        return [(int(ids[candidates[i]]), float(exact[i])) for i in order]
+
+
+def top_k_indices(
+    scores: np.ndarray, top_k: int, tiebreak: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Positions of the top_k highest scores, best first.
+    Equal scores are ordered by tiebreak (default: position), matching a
+    stable descending sort over rows in doc_id order.
+    """
+    n = len(scores)
+    if top_k < n:
+        part = np.argpartition(-scores, top_k - 1)[:top_k]
+        kth = scores[part].min()
+        # Pull in every tie at the boundary so the stable order is preserved
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    keys = candidates if tiebreak is None else tiebreak[candidates]
+    order = np.lexsort((keys, -scores[candidates]))
+    return candidates[order[:top_k]]
+
+
+def _load_index(db_path: str, conn: sqlite3.Connection) -> VectorIndex:
+    dtype = get_embedding_config(conn)["dtype"]
+    index = VectorIndex.from_store(VectorStore(db_path, dtype), conn)
+    if index is None:
+        index = VectorIndex.from_connection(conn)
+    return index
+
+
+def get_vector_index(db_path: str) -> VectorIndex:
+    """
+    Return the resident index for db_path, reloading it when the stored
+    index generation no longer matches the cached one. In published mode
+    (see serve_published_index) the manifest's generation is used instead.
+    """
+    key = os.path.abspath(db_path)
+    manifest = read_published_manifest(db_path) if _serve_published else None
+    conn = sqlite3.connect(db_path)
+    try:
+        if manifest is not None:
+            generation = int(manifest["generation"])
+        else:
+            generation = get_index_generation(conn)
+        with _index_lock:
+            cached = _index_cache.get(key)
+            if cached is not None and cached.generation == generation:
+                return cached
+            index = None
+            if manifest is not None:
+                index = VectorIndex.from_published(db_path, manifest)
+                if index is None:
+                    logger.warning(
+                        f"Published generation {generation} is unavailable; "
+                        "loading the live index instead"
+                    )
+            if index is None:
+                index = _load_index(db_path, conn)
+            index.attach_ann(IVFIndex.load(ann_index_path(db_path)))
+            _index_cache[key] = index
+            return index
+    finally:
+        conn.close()
+
+
+def update_ann_index(
+    db_path: str, min_vectors: int = ANN_MIN_VECTORS
+) -> Optional[IVFIndex]:
+    """
+    Bring the IVF sidecar in line with the embeddings table.
+
+    New vectors are assigned to existing lists and removed ones are dropped,
+    so ingestion only pays for what changed. The index is (re)trained when
+    the corpus first reaches min_vectors or has grown well past the size
+    its centroids were trained on. Smaller corpora keep using exact search.
+    """
+    path = ann_index_path(db_path)
+    ivf = IVFIndex.load(path)
+    index = VectorIndex.load(db_path)
+    if len(index) < min_vectors:
+        if ivf is not None:
+            os.remove(path)
+        return None
+
+    live = index.live_rows()
+    live_ids = index.doc_ids[live]
+    if ivf is None or ivf.needs_retrain():
+        ivf = IVFIndex.train(live_ids, index.vectors(live))
+    else:
+        known = ivf.doc_ids()
+        ivf.remove(known[~np.isin(known, live_ids)])
+        new = ~np.isin(live_ids, known)
+        if new.any():
+            ivf.add(live_ids[new], index.vectors(live[new]))
+        if ivf.needs_retrain():
+            ivf = IVFIndex.train(live_ids, index.vectors(live))
+    ivf.save(path)
+    return ivf
+
+
+def invalidate_vector_index(db_path: Optional[str] = None) -> None:
+    """Drop the resident index for db_path, or every cached index."""
+    with _index_lock:
+        if db_path is None:
+            _index_cache.clear()
+        else:
+            _index_cache.pop(os.path.abspath(db_path), None)
@@ -0,0 +1,214 @@
+"""
+Llamaball - Ingestion Jobs
+File Purpose: Single-writer background queue for web ingestion requests
+Primary Functions: JobQueue, coalesce_key
+Inputs: Upload batches and directory ingest requests from the web servers
+Outputs: Job ids and status snapshots (state, progress, timings, result, errors)
+
+Jobs run one at a time on one background thread, so concurrent uploads
+never race each other on SQLite or init_db. Queued jobs that can share a
+pass are coalesced: a burst of small uploads becomes a single ingestion
+of all their files, and repeated requests for the same directory run once.
+Every job in a coalesced pass reports the same progress and result.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Finished jobs whose status stays available
+JOB_HISTORY = int(os.environ.get("LLAMABALL_JOB_HISTORY", "100"))
+# Seconds to wait for more uploads before starting a pass
+COALESCE_SECONDS = float(os.environ.get("LLAMABALL_JOB_COALESCE_SECONDS", "0.5"))
+
+
+def coalesce_key(kind: str, params: Dict) -> Tuple:
+    """Jobs with equal keys can be served by one ingestion pass."""
+    if kind == "upload":
+        return (kind,)
+    return (kind,) + tuple(sorted(params.items()))
+
+
+class JobQueue:
+    """
+    Background ingestion queue with job status tracking.
+
+    runners maps a job kind to callable(params_list, progress_callback)
+    returning ingestion stats; params_list holds the params of every job
+    coalesced into the pass, and progress_callback(done, total, rel_path)
+    matches ingest_files. Snapshots are plain dicts kept in ``store``, which
+    may be a multiprocessing manager dict so other processes can read them.
+    When ``forward`` is set (a queue), submit() hands jobs to the process
+    that owns the runner thread instead of running them here.
+    """
+
+    def __init__(
+        self,
+        runners: Dict[str, Callable],
+        store=None,
+        coalesce_seconds: float = COALESCE_SECONDS,
+        history: int = JOB_HISTORY,
+    ):
+        self.runners = runners
+        self.store = {} if store is None else store
+        self.forward = None
+        self.coalesce_seconds = coalesce_seconds
+        self.history = history
+        self._pending: List[Tuple[str, str, Dict]] = []
+        self._finished = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+    def submit(self, kind: str, params: Dict) -> Dict:
+        """Queue a job and return its initial snapshot."""
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "state": QUEUED,
+            "params": params,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"files_done": 0, "files_total": None, "current_file": None},
+            "timings": {},
+            "coalesced_jobs": [job_id],
+            "result": None,
+            "error": None,
+        }
+        self.store[job_id] = job
+        if self.forward is not None:
+            self.forward.put((job_id, kind, params))
+        else:
+            self.enqueue(job_id, kind, params)
+        return dict(job)
+
+    def enqueue(self, job_id: str, kind: str, params: Dict) -> None:
+        """Add an already recorded job to this process's runner thread."""
+        with self._cond:
+            self._pending.append((job_id, kind, params))
+            if self._thread is None or not self._thread.is_alive():
+                self._closing = False
+                self._thread = threading.Thread(
+                    target=self._run, name="llamaball-ingest", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        return dict(job) if job is not None else None
+
+    def jobs(self) -> List[Dict]:
+        """Snapshots of known jobs, newest first."""
+        jobs = [dict(job) for job in list(self.store.values())]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Finish queued jobs, then stop the runner thread."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _take_batch(self) -> Optional[List[Tuple[str, str, Dict]]]:
+        with self._cond:
+            while not self._pending:
+                if self._closing:
+                    return None
+                self._cond.wait()
+        if self.coalesce_seconds:
+            # Let the rest of an upload burst arrive
+            time.sleep(self.coalesce_seconds)
+        with self._cond:
+            key = coalesce_key(*self._pending[0][1:])
+            # Only the run at the head, so jobs never overtake one another
+            count = 1
+            while (
+                count < len(self._pending)
+                and coalesce_key(*self._pending[count][1:]) == key
+            ):
+                count += 1
+            batch, self._pending = self._pending[:count], self._pending[count:]
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _update(self, job_ids: List[str], **fields) -> None:
+        for job_id in job_ids:
+            job = self.store.get(job_id)
+            if job is None:
+                continue
+            job.update(fields)
+            # Reassign so manager-backed stores see the change
+            self.store[job_id] = job
+
+    def _run_batch(self, batch: List[Tuple[str, str, Dict]]) -> None:
+        job_ids = [job_id for job_id, _, _ in batch]
+        kind = batch[0][1]
+        started = time.time()
+        self._update(job_ids, state=RUNNING, started_at=started, coalesced_jobs=job_ids)
+        if len(batch) > 1:
+            logger.info(f"Coalesced {len(batch)} {kind} jobs into one ingestion pass")
+
+        def on_file(done, total, rel_path):
+            self._update(
+                job_ids,
+                progress={
+                    "files_done": done,
+                    "files_total": total,
+                    "current_file": rel_path,
+                },
+            )
+
+        result, error = None, None
+        try:
+            result = self.runners[kind]([params for _, _, params in batch], on_file)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_ids[0]} failed: {e}")
+            error = str(e)
+        self._finish(job_ids, started, result, error)
+
+    def _finish(self, job_ids: List[str], started: float, result, error) -> None:
+        finished = time.time()
+        for job_id in job_ids:
+            job = self.store.get(job_id)
+            if job is None:
+                continue
+            job.update(
+                state=FAILED if error else COMPLETED,
+                finished_at=finished,
+                result=result,
+                error=error,
+                timings={
+                    "queued_seconds": round(started - job["created_at"], 3),
+                    "run_seconds": round(finished - started, 3),
+                    "stage_seconds": (result or {}).get("stage_seconds", {}),
+                },
+            )
+            job["progress"] = dict(job["progress"], current_file=None)
+            self.store[job_id] = job
+            self._finished.append(job_id)
+        while len(self._finished) > self.history:
+            self.store.pop(self._finished.popleft(), None)
@@ -0,0 +1,144 @@
+"""
+Llamaball - Lexical Search
+File Purpose: SQLite FTS5 index over chunk text for BM25 and hybrid retrieval
+Primary Functions: Maintain the FTS5 table, BM25 search, reciprocal rank fusion
+Inputs: SQLite connection, query text, ranked (doc_id, score) lists
+Outputs: Ranked (doc_id, score) pairs
+"""
+
+import logging
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "documents_fts"
+# vector: embeddings only; hybrid: BM25 and vector fused with RRF;
+# prefilter: vector scoring restricted to BM25 candidates
+SEARCH_MODES = ("vector", "hybrid", "prefilter")
+DEFAULT_SEARCH_MODE = "vector"
+# Standard RRF damping constant (Cormack et al.)
+RRF_K = 60
+# Candidates each ranker contributes to fusion
+HYBRID_CANDIDATES = 50
+PREFILTER_CANDIDATES = 1000
+
+_TERM = re.compile(r"\S+")
+
+
+def validate_search_mode(mode: str) -> str:
+    if mode not in SEARCH_MODES:
+        raise ValueError(
+            f"Unknown search mode '{mode}'; choose one of {', '.join(SEARCH_MODES)}"
+        )
+    return mode
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Whether this SQLite build was compiled with FTS5."""
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)"
+        )
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_fts_index(conn: sqlite3.Connection) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (FTS_TABLE,),
+        ).fetchone()
+        is not None
+    )
+
+
+def ensure_fts_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create the FTS5 table over documents.content, kept in sync by triggers
+    on documents (whose rows are only ever inserted or deleted). A newly
+    created index is backfilled from existing chunks. Returns False, after
+    logging, when SQLite lacks FTS5.
+    """
+    if has_fts_index(conn):
+        return True
+    if not fts5_available(conn):
+        logger.warning("SQLite was built without FTS5; lexical search is unavailable")
+        return False
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "content, content='documents', content_rowid='id')"
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, content) VALUES (new.id, new.content);
+        END
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END
+        """)
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: each whitespace-separated term
+    becomes a quoted phrase (so identifiers like ERR_CONN-42 or foo.bar
+    match their token sequence) and terms are OR-ed for BM25 to rank.
+    """
+    terms = []
+    for term in _TERM.findall(query):
+        if not any(ch.isalnum() for ch in term):
+            continue
+        terms.append('"' + term.replace('"', '""') + '"')
+    return " OR ".join(terms) if terms else None
+
+
+def bm25_search(
+    conn: sqlite3.Connection, query: str, limit: int
+) -> List[Tuple[int, float]]:
+    """
+    Best `limit` (doc_id, score) BM25 matches, higher score is better.
+    Read-only: a database without the FTS5 index (built by init_db during
+    ingestion) yields no matches, so callers fall back to vector search.
+    """
+    expression = match_expression(query)
+    if expression is None or limit <= 0:
+        return []
+    if not has_fts_index(conn):
+        logger.warning(
+            "Database has no lexical index; run 'llamaball ingest' to build it. "
+            "Using vector search only"
+        )
+        return []
+    rows = conn.execute(
+        f"SELECT rowid, bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH ? ORDER BY bm25({FTS_TABLE}), rowid LIMIT ?",
+        (expression, limit),
+    ).fetchall()
+    # FTS5's bm25() is negated so that smaller sorts first
+    return [(int(doc_id), -float(score)) for doc_id, score in rows]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[int, float]]], top_k: int, k: int = RRF_K
+) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked (doc_id, score) lists by summing 1 / (k + rank). Only
+    ranks matter, so BM25 and cosine scores need no calibration.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    return ordered[:top_k]
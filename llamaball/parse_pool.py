@@ -0,0 +1,211 @@
+"""
+Llamaball - Parser Process Pool
+File Purpose: Isolate document parsing in worker processes with time and memory limits
+Primary Functions: Dispatch files to parser processes, enforce per-file timeouts, replace dead workers
+Inputs: File paths, worker count, timeout, optional memory limit
+Outputs: FileParser-style result dicts ('content', 'error')
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+from typing import Callable, Dict, Optional
+
+from .parsers import parse_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSE_TIMEOUT = float(os.environ.get("LLAMABALL_PARSE_TIMEOUT", "120"))
+_memory_env = os.environ.get("LLAMABALL_PARSE_MEMORY_MB")
+DEFAULT_PARSE_MEMORY_MB: Optional[int] = int(_memory_env) if _memory_env else None
+# Worker start-up (interpreter + imports) is not charged to the first file
+STARTUP_TIMEOUT = 120.0
+_READY = "ready"
+
+
+def default_parse_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _limit_memory(memory_mb: Optional[int]) -> None:
+    """Cap this process's address space; a no-op where rlimits are unavailable."""
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not apply parser memory limit: {e}")
+
+
+def _worker_main(conn, parse: Callable[[str], Dict], memory_mb: Optional[int]) -> None:
+    """Parse paths received on conn until the parent sends None."""
+    _limit_memory(memory_mb)
+    conn.send(_READY)
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+        try:
+            result = parse(path)
+            reply = {"content": result.get("content", ""), "error": result.get("error")}
+        except MemoryError:
+            reply = {
+                "content": "",
+                "error": f"Parser exceeded the {memory_mb} MB memory limit",
+            }
+        except Exception as e:
+            reply = {"content": "", "error": f"Parser failed: {e}"}
+        conn.send(reply)
+
+
+# Process that started multiprocessing's forkserver, once one is in use
+_forkserver_owner: Optional[int] = None
+
+
+def _context():
+    # Worker processes must not inherit the ingest threads via plain fork
+    global _forkserver_owner
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" not in methods:
+        return multiprocessing.get_context("spawn")
+    if _forkserver_owner is None:
+        _forkserver_owner = os.getpid()
+    elif _forkserver_owner != os.getpid():
+        # A forked child (e.g. the prefork writer) cannot reach the
+        # forkserver its parent started
+        return multiprocessing.get_context("spawn")
+    return multiprocessing.get_context("forkserver")
+
+
+class _ParseWorker:
+    """One parser process, started on its first file, and its pipe."""
+
+    def __init__(self, ctx, parse: Callable[[str], Dict], memory_mb: Optional[int]):
+        self.ctx = ctx
+        self.parse_fn = parse
+        self.memory_mb = memory_mb
+        self.process = None
+        self.conn = None
+        self.ready = False
+
+    def start(self) -> None:
+        parent, child = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(child, self.parse_fn, self.memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.conn = parent
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(STARTUP_TIMEOUT):
+            raise RuntimeError("Parser process did not start")
+        self.conn.recv()
+        self.ready = True
+
+    def kill(self) -> None:
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def parse(self, path: str, timeout: float) -> Dict:
+        if self.process is None:
+            self.start()
+        try:
+            self.wait_ready()
+            self.conn.send(path)
+            if not self.conn.poll(timeout):
+                self.kill()
+                self.start()
+                return {"content": "", "error": f"Parsing timed out after {timeout:g}s"}
+            return self.conn.recv()
+        except (EOFError, OSError):
+            # The process died mid-file (segfault, OOM kill, ...)
+            self.process.join(timeout=5)
+            code = self.process.exitcode
+            self.kill()
+            self.start()
+            return {
+                "content": "",
+                "error": f"Parser process crashed (exit code {code})",
+            }
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=2)
+        self.kill()
+
+
+class ParsePool:
+    """
+    A fixed set of parser processes shared by the pipeline's parse threads.
+    Processes start on demand, so a run that parses nothing (an unchanged
+    incremental ingest) never spawns one, and a run only starts as many as
+    it has files in flight at once.
+
+    Each file gets a wall-clock timeout; a worker that times out or dies is
+    killed and replaced, and the file is reported as an error instead of
+    stalling or crashing ingestion. memory_mb caps each worker's address
+    space (RLIMIT_AS) on platforms that support it.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = DEFAULT_PARSE_TIMEOUT,
+        memory_mb: Optional[int] = DEFAULT_PARSE_MEMORY_MB,
+        parse: Callable[[str], Dict] = parse_file,
+    ):
+        self.timeout = timeout
+        ctx = _context()
+        self.workers = [
+            _ParseWorker(ctx, parse, memory_mb)
+            for _ in range(max(1, workers or default_parse_workers()))
+        ]
+        # LIFO, so a warm worker is reused before another is started
+        self._idle: "queue.LifoQueue[_ParseWorker]" = queue.LifoQueue()
+        for worker in reversed(self.workers):
+            self._idle.put(worker)
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def parse_file(self, path: str) -> Dict:
+        """Parse path in the next free worker process."""
+        worker = self._idle.get()
+        try:
+            return worker.parse(str(path), self.timeout)
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
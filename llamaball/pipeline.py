@@ -0,0 +1,460 @@
+"""
+Llamaball - Streaming Ingestion Pipeline
+File Purpose: Overlap file parsing, chunking and embedding with bounded memory
+Primary Functions: Run discover -> parse -> chunk -> embed -> persist stages over bounded queues
+Inputs: Iterable of discovered files (path, rel_path, ...), stage callables, an IngestWriter
+Outputs: Persisted chunks and embeddings, per-stage busy time
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .concurrency import AIMDController
+from .spill import SPILL_DIR, SpillQueue
+
+logger = logging.getLogger(__name__)
+
+# Items buffered between two stages
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_PARSE_WORKERS = 4
+DEFAULT_EMBED_WORKERS = 8
+# Attempts after the first for a batch that failed transiently, and the
+# backoff before each (doubling from RETRY_BASE_SECONDS up to the cap)
+EMBED_RETRIES = 3
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """Raised inside stages once another stage has failed."""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether an embedding failure is worth retrying: connection problems,
+    timeouts, rate limiting and server errors, but not bad requests such
+    as an unknown model.
+    """
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "Connect" in name
+
+
+def _batch_bytes(batch) -> int:
+    # Approximate: one byte per character of chunk text
+    return sum(len(task[1]) for task in batch)
+
+
+class EmbedBatcher:
+    """
+    Pack embed tasks (rel_path, chunk, chunk_idx, n_tokens, ...) into
+    batches of at most batch_size chunks and max_tokens tokens. A chunk
+    that alone exceeds max_tokens forms its own batch.
+    """
+
+    def __init__(self, batch_size: int, max_tokens: int):
+        self.batch_size = max(1, batch_size)
+        self.max_tokens = max_tokens
+        self._batch: List[tuple] = []
+        self._tokens = 0
+
+    def add(self, task: tuple) -> Optional[List[tuple]]:
+        """Add a task; returns the previous batch if the task did not fit."""
+        full = None
+        n_tokens = task[3]
+        if self._batch and (
+            len(self._batch) >= self.batch_size
+            or self._tokens + n_tokens > self.max_tokens
+        ):
+            full = self.flush()
+        self._batch.append(task)
+        self._tokens += n_tokens
+        return full
+
+    def flush(self) -> Optional[List[tuple]]:
+        """Return and reset the current partial batch, if any."""
+        if not self._batch:
+            return None
+        batch, self._batch, self._tokens = self._batch, [], 0
+        return batch
+
+
+class IngestPipeline:
+    """
+    Streaming ingestion over bounded queues:
+
+    discover (1 thread) -> parse (parse_workers threads) -> chunk
+    (1 thread, also queues chunk writes) -> embed (embed_workers threads)
+    -> persist (1 thread)
+
+    Every queue holds at most queue_size items, so memory stays bounded by
+    the number of in-flight files and batches rather than the corpus size.
+    Embedding starts as soon as the first chunks are written, and the
+    chunk stage flushes pending writes early whenever embedders are idle.
+
+    The stage callables carry all ingestion policy:
+
+    - load_file(*item) runs in parse workers for each discovered item,
+      a tuple whose second field is rel_path
+    - chunk_file(loaded) runs on the chunk thread and returns
+      (rel_path, mtime, [(text, n_tokens[, start, end]), ...]) or None to
+      write nothing; start/end are the chunk's character offsets in the
+      file's text
+    - embed(texts) returns one embedding row per text
+
+    Transient embedding failures are retried up to embed_retries times
+    with exponential backoff; batches that still fail go to on_embed_error
+    and their chunks stay in the writer's pending checkpoint.
+
+    An optional AIMDController sets the batch size and the number of embed
+    threads (its ceiling) and sees the depth of the batch queue; embed is
+    expected to run its model requests through controller.call so the
+    controller limits how many are in flight. Without one, embed_workers
+    threads embed batches of batch_size.
+
+    With memory_budget (bytes of queued chunk text) the batch queue stops
+    applying back-pressure: batches past the budget spill to a temporary
+    file under spill_dir and are read back in order (see spill.SpillQueue),
+    so a burst of huge files never waits on the embedder or piles up in
+    memory.
+
+    stage_seconds sums each stage's busy time over all of its threads;
+    embed_active_seconds is the wall-clock time during which at least one
+    embed call was in flight, the denominator for embedding throughput.
+    """
+
+    def __init__(
+        self,
+        load_file: Callable[..., object],
+        chunk_file: Callable[[object], Optional[Tuple[str, float, List[tuple]]]],
+        embed: Callable[[List[str]], np.ndarray],
+        writer,
+        batch_size: int,
+        max_batch_tokens: int,
+        parse_workers: int = DEFAULT_PARSE_WORKERS,
+        embed_workers: int = DEFAULT_EMBED_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        on_file: Optional[Callable[[int, Optional[int], str], None]] = None,
+        on_embedded: Optional[Callable[[List[tuple]], None]] = None,
+        on_embed_error: Optional[Callable[[List[tuple], Exception], None]] = None,
+        embed_retries: int = EMBED_RETRIES,
+        retry_base_seconds: float = RETRY_BASE_SECONDS,
+        retry_max_seconds: float = RETRY_MAX_SECONDS,
+        controller: Optional[AIMDController] = None,
+        memory_budget: Optional[int] = None,
+        spill_dir: Optional[str] = SPILL_DIR,
+    ):
+        self.load_file = load_file
+        self.chunk_file = chunk_file
+        self.embed = embed
+        self.writer = writer
+        self.batcher = EmbedBatcher(batch_size, max_batch_tokens)
+        self.parse_workers = max(1, parse_workers)
+        self.controller = controller or AIMDController.fixed(
+            max(1, embed_workers), batch_size
+        )
+        self.embed_workers = self.controller.ceiling
+        self.on_file = on_file
+        self.on_embedded = on_embedded
+        self.on_embed_error = on_embed_error
+        self.embed_retries = max(0, embed_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._pending: Iterable[tuple] = ()
+
+        self._files = queue.Queue(maxsize=queue_size)
+        self._parsed = queue.Queue(maxsize=queue_size)
+        if memory_budget is not None:
+            self._batches = SpillQueue(memory_budget, _batch_bytes, _DONE, spill_dir)
+        else:
+            self._batches = queue.Queue(maxsize=queue_size)
+        self._embedded = queue.Queue(maxsize=queue_size)
+        self.controller.queue_depth = self._batches.qsize
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._timing_lock = threading.Lock()
+        self._token_counts: Dict[str, List[int]] = {}
+
+        self.discovered = 0
+        self.discovery_done = False
+        self.files_done = 0
+        self.embed_batches = 0
+        self.embed_retries_used = 0
+        self.reused_chunks = 0
+        self.stage_seconds: Dict[str, float] = {
+            "discover": 0.0,
+            "parse": 0.0,
+            "chunk": 0.0,
+            "embed": 0.0,
+            "persist": 0.0,
+        }
+        self.embed_active_seconds = 0.0
+        self._embeds_in_flight = 0
+        self._embed_active_since = 0.0
+
+    def run(self, files: Iterable[tuple], pending: Iterable[tuple] = ()) -> None:
+        """
+        Process every file; re-raises the first stage failure. pending
+        holds embed tasks (rel_path, chunk, chunk_idx, n_tokens, doc_id)
+        for chunks an earlier run stored without a vector; they are
+        embedded first. It is consumed lazily by the chunk stage, so a
+        large backlog streams through the batch queue (and its memory
+        budget) instead of being loaded up front.
+        """
+        self._pending = pending
+        threads = [self._start("discover", self._discover, files)]
+        threads += [
+            self._start("parse", self._parse) for _ in range(self.parse_workers)
+        ]
+        threads.append(self._start("chunk", self._chunk))
+        threads += [
+            self._start("embed", self._embed) for _ in range(self.embed_workers)
+        ]
+        threads.append(self._start("persist", self._persist))
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            if isinstance(self._batches, SpillQueue):
+                self._batches.discard()
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def spilled_batches(self) -> int:
+        return getattr(self._batches, "spilled", 0)
+
+    @property
+    def spilled_bytes(self) -> int:
+        return getattr(self._batches, "spilled_bytes", 0)
+
+    # Plumbing
+
+    def _start(self, name: str, fn: Callable, *args) -> threading.Thread:
+        def target():
+            try:
+                fn(*args)
+            except _Aborted:
+                pass
+            except BaseException as e:
+                logger.error(f"Ingestion {name} stage failed: {e}")
+                if self._error is None:
+                    self._error = e
+                self._abort.set()
+
+        thread = threading.Thread(target=target, name=f"ingest-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _put(self, q: queue.Queue, item) -> None:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _timed(self, stage: str, started: float) -> None:
+        with self._timing_lock:
+            self.stage_seconds[stage] += time.perf_counter() - started
+
+    def _embed_started(self) -> float:
+        started = time.perf_counter()
+        with self._timing_lock:
+            if not self._embeds_in_flight:
+                self._embed_active_since = started
+            self._embeds_in_flight += 1
+        return started
+
+    def _embed_finished(self, started: float) -> None:
+        finished = time.perf_counter()
+        with self._timing_lock:
+            self.stage_seconds["embed"] += finished - started
+            self._embeds_in_flight -= 1
+            if not self._embeds_in_flight:
+                self.embed_active_seconds += finished - self._embed_active_since
+
+    # Stages
+
+    def _discover(self, files: Iterable[tuple]) -> None:
+        iterator = iter(files)
+        while True:
+            started = time.perf_counter()
+            item = next(iterator, _DONE)
+            self._timed("discover", started)
+            if item is _DONE:
+                break
+            self.discovered += 1
+            self._put(self._files, item)
+        self.discovery_done = True
+        for _ in range(self.parse_workers):
+            self._put(self._files, _DONE)
+
+    def _parse(self) -> None:
+        while True:
+            item = self._get(self._files)
+            if item is _DONE:
+                self._put(self._parsed, _DONE)
+                return
+            started = time.perf_counter()
+            loaded = self.load_file(*item)
+            self._timed("parse", started)
+            self._put(self._parsed, (item[1], loaded))
+
+    def _chunk(self) -> None:
+        for task in self._pending:
+            self._add_task(task)
+        remaining = self.parse_workers
+        while remaining:
+            try:
+                item = self._parsed.get_nowait()
+            except queue.Empty:
+                # Parsers are behind; hand what we have to idle embedders
+                if self._batches.empty():
+                    self._flush_chunks(partial=True)
+                item = self._get(self._parsed)
+            if item is _DONE:
+                remaining -= 1
+                continue
+
+            rel_path, loaded = item
+            started = time.perf_counter()
+            result = self.chunk_file(loaded)
+            written = []
+            if result is not None:
+                rel_path, mtime, chunks = result
+                self._token_counts[rel_path] = [chunk[1] for chunk in chunks]
+                offsets = [tuple(chunk[2:4]) or None for chunk in chunks]
+                written = self.writer.replace_file(
+                    rel_path, [chunk[0] for chunk in chunks], mtime, offsets
+                )
+            self._timed("chunk", started)
+            self._queue_tasks(written)
+
+            self.files_done += 1
+            if self.on_file:
+                total = self.discovered if self.discovery_done else None
+                self.on_file(self.files_done, total, rel_path)
+
+        self._flush_chunks(partial=True)
+        if isinstance(self._batches, SpillQueue):
+            # Every embed worker gets _DONE once the spilled batches drain
+            self._batches.close()
+            return
+        for _ in range(self.embed_workers):
+            self._put(self._batches, _DONE)
+
+    def _flush_chunks(self, partial: bool) -> None:
+        started = time.perf_counter()
+        written = self.writer.flush_files()
+        self._timed("chunk", started)
+        self._queue_tasks(written)
+        if partial:
+            batch = self.batcher.flush()
+            if batch:
+                self._put_batch(batch)
+
+    def _queue_tasks(self, written) -> None:
+        """Turn files flushed by the writer into embed tasks carrying doc_ids."""
+        for filename, chunks, doc_ids, to_embed in written:
+            counts = self._token_counts.pop(filename, [])
+            # Chunks whose content is already stored keep their embedding
+            self.reused_chunks += len(chunks) - len(to_embed)
+            for chunk_idx in to_embed:
+                self._add_task(
+                    (
+                        filename,
+                        chunks[chunk_idx],
+                        chunk_idx,
+                        counts[chunk_idx],
+                        doc_ids[chunk_idx],
+                    )
+                )
+
+    def _add_task(self, task: tuple) -> None:
+        # Follow the controller's current batch size
+        self.batcher.batch_size = self.controller.batch_size
+        batch = self.batcher.add(task)
+        if batch:
+            self._put_batch(batch)
+
+    def _put_batch(self, batch: List[tuple]) -> None:
+        self.embed_batches += 1
+        self._put(self._batches, batch)
+
+    def _embed(self) -> None:
+        while True:
+            batch = self._get(self._batches)
+            if batch is _DONE:
+                self._put(self._embedded, _DONE)
+                return
+            embs = self._embed_with_retry(batch)
+            if embs is not None:
+                self._put(self._embedded, (batch, embs))
+
+    def _embed_with_retry(self, batch: List[tuple]) -> Optional[np.ndarray]:
+        texts = [task[1] for task in batch]
+        attempt = 0
+        while True:
+            started = self._embed_started()
+            try:
+                return self.embed(texts)
+            except Exception as e:
+                error = e
+            finally:
+                self._embed_finished(started)
+            if attempt >= self.embed_retries or not is_transient_error(error):
+                logger.error(f"Error embedding batch of {len(batch)} chunks: {error}")
+                if self.on_embed_error:
+                    self.on_embed_error(batch, error)
+                return None
+            delay = min(self.retry_max_seconds, self.retry_base_seconds * 2**attempt)
+            attempt += 1
+            logger.warning(
+                f"Embedding batch of {len(batch)} chunks failed ({error}); "
+                f"retry {attempt}/{self.embed_retries} in {delay:g}s"
+            )
+            with self._timing_lock:
+                self.embed_retries_used += 1
+            # Back off without holding up shutdown if another stage fails
+            if self._abort.wait(delay):
+                raise _Aborted()
+
+    def _persist(self) -> None:
+        remaining = self.embed_workers
+        while remaining:
+            item = self._get(self._embedded)
+            if item is _DONE:
+                remaining -= 1
+                continue
+            batch, embs = item
+            started = time.perf_counter()
+            self.writer.add_embeddings([task[4] for task in batch], embs)
+            self._timed("persist", started)
+            if self.on_embedded:
+                self.on_embedded(batch)
+        started = time.perf_counter()
+        self.writer.flush_embeddings()
+        self._timed("persist", started)
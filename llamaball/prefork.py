@@ -0,0 +1,196 @@
+"""
+Llamaball - Prefork Server
+File Purpose: Multi-process web server sharing one read-only vector index
+Primary Functions: serve_prefork, writer_loop
+Inputs: Flask app, listening address, worker count, database path
+Outputs: N forked HTTP worker processes plus one ingestion writer process
+
+The parent loads the vector index and publishes its generation before
+forking, so workers start with the index already mapped (the sidecar's
+pages live in the shared page cache; a SQLite-built matrix is shared
+copy-on-write). Workers serve requests and never write the index: upload
+and ingest jobs are forwarded to a single writer process, and job status and
+chat sessions are kept in a manager every worker can reach, so requests of
+one conversation may land on any worker. Every index
+generation the writer commits is published atomically (see
+index.publish_index) and workers switch to it on their next search
+without restarting.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from multiprocessing.managers import SyncManager
+from typing import Optional
+
+from . import core
+from . import web_server as web
+from .index import get_vector_index, publish_index, serve_published_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("LLAMABALL_WEB_WORKERS", "4"))
+# Seconds between checks for exited children
+SUPERVISE_INTERVAL = 1.0
+
+
+def _child_signals() -> None:
+    # The parent handles Ctrl+C and stops children with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def writer_loop(jobs, db_path: str) -> None:
+    """
+    Feed jobs forwarded by workers, as (job_id, kind, params) tuples, to
+    this process's web_server.ingest_jobs runner thread. None stops the
+    loop once queued jobs have finished.
+    """
+    _child_signals()
+    logger.info(f"Ingestion writer started (pid {os.getpid()})")
+    queue = web.ingest_jobs
+    queue.forward = None
+    while True:
+        job = jobs.get()
+        if job is None:
+            queue.close()
+            return
+        # ingest_files bumps the generation, which republishes the index
+        queue.enqueue(*job)
+
+
+def start_writer(ctx, jobs, db_path: str):
+    """
+    Start writer_loop in its own process. It is not daemonic: ingestion
+    runs parsers in child processes, which daemonic processes may not
+    start. Stop it by putting None on jobs and joining it.
+    """
+    proc = ctx.Process(target=writer_loop, args=(jobs, db_path), daemon=False)
+    proc.start()
+    return proc
+
+
+def _serve_worker(app, listener_fd: int, host: str, port: int, ssl_context) -> None:
+    from werkzeug.serving import make_server
+
+    _child_signals()
+    server = make_server(
+        host,
+        port,
+        app,
+        threaded=True,
+        request_handler=web.WSGIRequestHandler,
+        ssl_context=ssl_context,
+        fd=listener_fd,
+    )
+    logger.info(f"Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    listener.set_inheritable(True)
+    return listener
+
+
+def serve_prefork(
+    app=None,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    workers: int = DEFAULT_WORKERS,
+    db_path: Optional[str] = None,
+    ssl_context=None,
+) -> None:
+    """
+    Serve app from `workers` forked processes sharing one listening socket,
+    with ingestion in a dedicated writer process. Exited children are
+    restarted; SIGINT/SIGTERM stop everything. Requires os.fork (POSIX).
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError(
+            "The prefork server needs os.fork; use --asgi on this platform"
+        )
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    app = app or web.app
+    db_path = db_path or web.DEFAULT_DB_PATH
+
+    ctx = multiprocessing.get_context("fork")
+    manager = SyncManager(ctx=ctx)
+    manager.start(_child_signals)
+    jobs = ctx.Queue()
+    web.ingest_jobs.store = manager.dict()
+    web.ingest_jobs.forward = jobs
+    web.share_chat_sessions(manager)
+
+    # Publish and load generation N before forking so every worker shares it
+    core.init_db(db_path).close()
+    generation = publish_index(db_path)
+    serve_published_index()
+    index = get_vector_index(db_path)
+    logger.info(
+        f"Loaded index generation {generation} ({len(index)} vectors) for {workers} workers"
+    )
+
+    listener = _bind(host, port)
+
+    def spawn_worker():
+        proc = ctx.Process(
+            target=_serve_worker,
+            args=(app, listener.fileno(), host, port, ssl_context),
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    previous = {
+        sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)
+    }
+    writer = start_writer(ctx, jobs, db_path)
+    procs = [spawn_worker() for _ in range(workers)]
+    try:
+        while not stopping:
+            time.sleep(SUPERVISE_INTERVAL)
+            if stopping:
+                break
+            if not writer.is_alive():
+                logger.warning(
+                    f"Ingestion writer exited ({writer.exitcode}); restarting"
+                )
+                writer = start_writer(ctx, jobs, db_path)
+            for i, proc in enumerate(procs):
+                if not proc.is_alive():
+                    logger.warning(
+                        f"Worker {proc.pid} exited ({proc.exitcode}); restarting"
+                    )
+                    procs[i] = spawn_worker()
+    finally:
+        logger.info("Stopping prefork server")
+        for proc in procs:
+            proc.terminate()
+        # Let the writer finish its current job before exiting
+        jobs.put(None)
+        writer.join(timeout=30)
+        if writer.is_alive():
+            writer.terminate()
+        for proc in procs:
+            proc.join(timeout=5)
+        listener.close()
+        web.ingest_jobs.forward = None
+        web.ingest_jobs.store = {}
+        web.share_chat_sessions(None)
+        manager.shutdown()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
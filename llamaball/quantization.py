@@ -0,0 +1,95 @@
+"""
+Llamaball - Embedding Quantization
+File Purpose: Compact float16 / int8 storage formats for embeddings
+Primary Functions: Encode and decode embedding BLOBs, quantize index rows
+Inputs: float32 embedding vectors
+Outputs: Compact codes, per-vector scales, dequantized float32 vectors
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+DEFAULT_EMBEDDING_DTYPE = "float32"
+# Candidates re-ranked against dequantized float32 rows for compact formats
+DEFAULT_RESCORE = 200
+
+# int8 BLOBs start with the float32 scale for that vector
+_SCALE_BYTES = 4
+
+
+def validate_dtype(dtype: str) -> str:
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(
+            f"Unsupported embedding dtype '{dtype}'. "
+            f"Choose one of: {', '.join(EMBEDDING_DTYPES)}"
+        )
+    return dtype
+
+
+def quantize_rows(
+    matrix: np.ndarray, dtype: str
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert float32 rows to (codes, scales). Scales are only used for int8,
+    where each row is scaled so its largest magnitude maps to 127.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return np.ascontiguousarray(matrix), None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    validate_dtype(dtype)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.empty(0)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales == 0, 1.0, scales)
+    codes = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_rows(
+    codes: np.ndarray, scales: Optional[np.ndarray], dtype: str
+) -> np.ndarray:
+    """Reconstruct float32 rows from codes produced by quantize_rows."""
+    rows = np.asarray(codes).astype(np.float32)
+    if dtype == "int8":
+        rows *= np.asarray(scales, dtype=np.float32)[:, None]
+    return rows
+
+
+def encode_embedding(vector: np.ndarray, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> bytes:
+    """Serialize one embedding for the embeddings table."""
+    row = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    codes, scales = quantize_rows(row, dtype)
+    if dtype == "int8":
+        return scales.tobytes() + codes.tobytes()
+    return codes.tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> np.ndarray:
+    """Inverse of encode_embedding, returning a float32 vector."""
+    if dtype == "float32":
+        return np.frombuffer(blob, dtype=np.float32)
+    if dtype == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    scale = np.frombuffer(blob[:_SCALE_BYTES], dtype=np.float32)
+    codes = np.frombuffer(blob[_SCALE_BYTES:], dtype=np.int8)
+    return codes.astype(np.float32) * scale[0]
+
+
+def decode_embeddings(
+    blobs: List[bytes], dtype: str = DEFAULT_EMBEDDING_DTYPE
+) -> np.ndarray:
+    """Decode equally sized BLOBs into a float32 matrix in one pass."""
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    joined = b"".join(blobs)
+    if dtype == "int8":
+        width = len(blobs[0])
+        raw = np.frombuffer(joined, dtype=np.uint8).reshape(len(blobs), width)
+        scales = raw[:, :_SCALE_BYTES].copy().view(np.float32).ravel()
+        codes = raw[:, _SCALE_BYTES:].view(np.int8)
+        return dequantize_rows(codes, scales, dtype)
+    item = np.float32 if dtype == "float32" else np.float16
+    return np.frombuffer(joined, dtype=item).reshape(len(blobs), -1).astype(np.float32)
@@ -0,0 +1,162 @@
+"""
+Llamaball - Spilling Batch Queue
+File Purpose: Keep queued embedding work under a memory budget by spilling to disk
+Primary Functions: SpillQueue, peak_rss_mb
+Inputs: Embed batches from the chunk stage, a budget in bytes of chunk text
+Outputs: The same batches, in order, for the embed workers; spill and RSS figures
+
+A burst of huge files can chunk far faster than the model embeds. Batches
+are kept in memory until their text reaches the budget; after that they
+are appended to an anonymous temporary file as JSON lines and read back
+in order, so parsing and chunking never stall on the embedder and memory
+stays flat. Once the file drains it is truncated and batches go back to
+memory.
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_budget_env = os.environ.get("LLAMABALL_INGEST_MEMORY_MB")
+# Queued chunk text kept in memory before spilling; None keeps a bounded queue
+DEFAULT_MEMORY_BUDGET_MB: Optional[int] = int(_budget_env) if _budget_env else None
+# Where spill files go (default: the system temporary directory)
+SPILL_DIR = os.environ.get("LLAMABALL_SPILL_DIR") or None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, or None where unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+class SpillQueue:
+    """
+    FIFO of JSON-serializable items with a memory budget.
+
+    size_of(item) estimates an item's memory in bytes. put() never blocks:
+    an item goes to memory while the queued total stays within budget and
+    nothing is waiting on disk, otherwise to the spill file, which keeps
+    the order intact. After close(), get() returns ``sentinel`` to every
+    caller once the queue is empty. put/get/qsize/empty mirror queue.Queue.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        size_of: Callable[[object], int],
+        sentinel: object = None,
+        directory: Optional[str] = SPILL_DIR,
+    ):
+        self.budget_bytes = max(0, budget_bytes)
+        self.size_of = size_of
+        self.sentinel = sentinel
+        self.directory = directory
+        self.memory_bytes = 0
+        self.peak_memory_bytes = 0
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self._memory = deque()
+        self._file = None
+        self._read_pos = 0
+        self._write_pos = 0
+        self._on_disk = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None) -> None:
+        size = self.size_of(item)
+        with self._cond:
+            if self._closed:
+                raise ValueError("put() on a closed SpillQueue")
+            if not self._on_disk and (
+                not self._memory or self.memory_bytes + size <= self.budget_bytes
+            ):
+                self._memory.append((item, size))
+                self.memory_bytes += size
+                self.peak_memory_bytes = max(self.peak_memory_bytes, self.memory_bytes)
+            else:
+                self._spill(item, size)
+            self._cond.notify()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        """Next item in order; raises queue.Empty if none arrives in time."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._memory and not self._on_disk:
+                if self._closed:
+                    return self.sentinel
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            if self._memory:
+                item, size = self._memory.popleft()
+                self.memory_bytes -= size
+                return item
+            return self._unspill()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._memory) + self._on_disk
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def close(self) -> None:
+        """No more items; waiting and later get() calls receive the sentinel."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def discard(self) -> None:
+        """Release the spill file."""
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._on_disk = 0
+
+    def _spill(self, item, size: int) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(
+                prefix="llamaball-spill-", dir=self.directory
+            )
+            logger.info(
+                f"Embedding queue over its {self.budget_bytes / 2**20:.0f} MB budget; "
+                f"spilling batches to disk"
+            )
+        self._file.seek(self._write_pos)
+        self._file.write(json.dumps(item).encode("utf-8") + b"\n")
+        self._write_pos = self._file.tell()
+        self._on_disk += 1
+        self.spilled += 1
+        self.spilled_bytes += size
+
+    def _unspill(self):
+        self._file.seek(self._read_pos)
+        line = self._file.readline()
+        self._read_pos = self._file.tell()
+        self._on_disk -= 1
+        if not self._on_disk:
+            # Drained: reuse the file from the start
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_pos = self._write_pos = 0
+        return json.loads(line)
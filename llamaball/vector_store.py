@@ -0,0 +1,289 @@
+"""
+Llamaball - Memory-Mapped Vector Store
+File Purpose: Append-only vector sidecar kept next to the SQLite database
+Primary Functions: Append embeddings during ingestion, memory-map them for readers, check and rebuild
+Inputs: doc_ids and embeddings, SQLite embeddings table
+Outputs: Memory-mapped id and vector arrays, consistency reports
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .quantization import (
+    DEFAULT_EMBEDDING_DTYPE,
+    decode_embeddings,
+    quantize_rows,
+    validate_dtype,
+)
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+VECTOR_SUFFIX = ".vectors"
+IDS_SUFFIX = ".ids"
+SCALES_SUFFIX = ".scales"
+HEADER_SUFFIX = ".vectors.json"
+_ITEM_SIZES = {"float32": 4, "float16": 2, "int8": 1}
+
+
+class MappedVectors(NamedTuple):
+    """Memory-mapped sidecar contents."""
+
+    ids: np.ndarray
+    codes: np.ndarray
+    scales: Optional[np.ndarray]
+    dtype: str
+
+
+class VectorStore:
+    """
+    Sidecar files for a database at ``db_path``:
+
+    - ``<db>.vectors``: unit-normalized rows in the storage dtype, appended
+      in write order
+    - ``<db>.ids``: int64 doc_id for each row
+    - ``<db>.scales``: float32 per-row scales (int8 storage only)
+    - ``<db>.vectors.json``: header with the vector dimension and dtype
+
+    The row count is derived from file sizes, so a torn append is simply
+    ignored. Each write of the header gets a new build id; open() re-reads
+    the header after mapping and gives up if it changed, so a reader can
+    never pair files from before and after a rebuild. A doc_id that appears twice resolves to its latest row, and rows
+    whose doc_id is no longer in the embeddings table are treated as dead.
+    """
+
+    def __init__(self, db_path: str, dtype: str = DEFAULT_EMBEDDING_DTYPE):
+        self.db_path = db_path
+        self.dtype = validate_dtype(dtype)
+        self.vectors_path = db_path + VECTOR_SUFFIX
+        self.ids_path = db_path + IDS_SUFFIX
+        self.scales_path = db_path + SCALES_SUFFIX
+        self.header_path = db_path + HEADER_SUFFIX
+        self._lock = threading.Lock()
+
+    def _paths(self) -> Tuple[str, ...]:
+        return (self.vectors_path, self.ids_path, self.scales_path, self.header_path)
+
+    def exists(self) -> bool:
+        return all(
+            os.path.exists(p)
+            for p in (self.vectors_path, self.ids_path, self.header_path)
+        )
+
+    def read_header(self) -> Optional[Dict]:
+        try:
+            with open(self.header_path, "r") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if header.get("version") != STORE_VERSION:
+            return None
+        return header
+
+    def _write_header(self, dim: int, dtype: str) -> None:
+        tmp_path = self.header_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            header = {"version": STORE_VERSION, "dim": dim, "dtype": dtype}
+            json.dump(dict(header, build=uuid.uuid4().hex), f)
+        os.replace(tmp_path, self.header_path)
+
+    def row_count(self, header: Optional[Dict] = None) -> int:
+        """Number of complete rows present in every sidecar file."""
+        header = header or self.read_header()
+        if not header:
+            return 0
+        row_bytes = header["dim"] * _ITEM_SIZES[header["dtype"]]
+        try:
+            counts = [
+                os.path.getsize(self.vectors_path) // row_bytes,
+                os.path.getsize(self.ids_path) // 8,
+            ]
+            if header["dtype"] == "int8":
+                counts.append(os.path.getsize(self.scales_path) // 4)
+        except OSError:
+            return 0
+        return min(counts)
+
+    def reset(self) -> None:
+        """Remove all sidecar files."""
+        with self._lock:
+            for path in self._paths():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def append(
+        self,
+        doc_ids: Union[Sequence[int], np.ndarray],
+        vectors: np.ndarray,
+    ) -> None:
+        """
+        Append embeddings for doc_ids. Vectors are normalized, then stored
+        in the sidecar's dtype.
+        """
+        from .index import normalize_rows
+
+        ids = np.asarray(doc_ids, dtype=np.int64).ravel()
+        rows = np.array(vectors, dtype=np.float32, copy=True).reshape(len(ids), -1)
+        if len(ids) == 0:
+            return
+        rows = normalize_rows(rows)
+        dim = rows.shape[1]
+
+        with self._lock:
+            header = self.read_header()
+            if header is None:
+                header = {"dim": dim, "dtype": self.dtype}
+                self._write_header(dim, self.dtype)
+            elif header["dim"] != dim or header["dtype"] != self.dtype:
+                raise ValueError(
+                    f"Vectors ({dim}-d {self.dtype}) do not match the sidecar "
+                    f"({header['dim']}-d {header['dtype']}); rebuild the database "
+                    "with --force"
+                )
+            codes, scales = quantize_rows(rows, self.dtype)
+            # Truncate any torn tail so all files stay row-aligned
+            count = self.row_count(header)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(count * codes.shape[1] * codes.itemsize)
+                f.write(codes.tobytes())
+            if scales is not None:
+                with open(self.scales_path, "ab") as f:
+                    f.truncate(count * 4)
+                    f.write(scales.tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.truncate(count * 8)
+                f.write(ids.tobytes())
+
+    def open(self) -> Optional[MappedVectors]:
+        """Memory-map the sidecar, or return None if it does not exist."""
+        header = self.read_header()
+        if not header or not self.exists():
+            return None
+        dim, dtype = header["dim"], header["dtype"]
+        count = self.row_count(header)
+        if count == 0:
+            return MappedVectors(
+                np.empty(0, dtype=np.int64),
+                np.empty((0, dim), dtype=dtype),
+                np.empty(0, dtype=np.float32) if dtype == "int8" else None,
+                dtype,
+            )
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(count,))
+        codes = np.memmap(self.vectors_path, dtype=dtype, mode="r", shape=(count, dim))
+        scales = None
+        if dtype == "int8":
+            scales = np.memmap(
+                self.scales_path, dtype=np.float32, mode="r", shape=(count,)
+            )
+        if self.read_header() != header:
+            # A rebuild swapped files while they were being mapped
+            return None
+        return MappedVectors(ids, codes, scales, dtype)
+
+    def live_mask(
+        self, ids: np.ndarray, db_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (mask, missing): which sidecar rows are current, and which
+        database doc_ids have no row in the sidecar.
+        """
+        # Keep only the last occurrence of each doc_id
+        reversed_ids = ids[::-1]
+        _, first_from_end = np.unique(reversed_ids, return_index=True)
+        latest = np.zeros(len(ids), dtype=bool)
+        latest[len(ids) - 1 - first_from_end] = True
+        mask = latest & np.isin(ids, db_ids)
+        missing = np.setdiff1d(db_ids, ids[mask], assume_unique=True)
+        return mask, missing
+
+    def check(self, conn: sqlite3.Connection) -> Dict[str, Union[bool, int]]:
+        """Compare the sidecar against the embeddings table."""
+        db_ids = np.fromiter(
+            (r[0] for r in conn.execute("SELECT doc_id FROM embeddings")),
+            dtype=np.int64,
+        )
+        opened = self.open()
+        if opened is None:
+            return {
+                "consistent": len(db_ids) == 0,
+                "sidecar_rows": 0,
+                "live_rows": 0,
+                "stale_rows": 0,
+                "missing_rows": int(len(db_ids)),
+                "database_rows": int(len(db_ids)),
+            }
+        mask, missing = self.live_mask(np.asarray(opened.ids), db_ids)
+        live = int(mask.sum())
+        return {
+            "consistent": len(missing) == 0,
+            "sidecar_rows": int(len(opened.ids)),
+            "live_rows": live,
+            "stale_rows": int(len(opened.ids) - live),
+            "missing_rows": int(len(missing)),
+            "database_rows": int(len(db_ids)),
+        }
+
+    def rebuild(self, conn: sqlite3.Connection, batch_size: int = 4096) -> int:
+        """
+        Rewrite the sidecar from the embeddings table, whose BLOBs are
+        stored in self.dtype. New files are written aside and swapped in.
+        """
+        from .index import normalize_rows
+
+        tmp_vectors = self.vectors_path + ".tmp"
+        tmp_ids = self.ids_path + ".tmp"
+        tmp_scales = self.scales_path + ".tmp"
+        dim = None
+        total = 0
+        cursor = conn.execute(
+            "SELECT doc_id, embedding FROM embeddings ORDER BY doc_id"
+        )
+        with open(tmp_vectors, "wb") as vf, open(tmp_ids, "wb") as idf, open(
+            tmp_scales, "wb"
+        ) as sf:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                ids = np.array([r[0] for r in rows], dtype=np.int64)
+                matrix = normalize_rows(
+                    decode_embeddings([r[1] for r in rows], self.dtype)
+                )
+                codes, scales = quantize_rows(matrix, self.dtype)
+                dim = matrix.shape[1]
+                vf.write(codes.tobytes())
+                idf.write(ids.tobytes())
+                if scales is not None:
+                    sf.write(scales.tobytes())
+                total += len(ids)
+
+        with self._lock:
+            if dim is None:
+                for path in (tmp_vectors, tmp_ids, tmp_scales) + self._paths():
+                    if os.path.exists(path):
+                        os.remove(path)
+                return 0
+            # Readers find no sidecar until the new header is written; ids
+            # go last so a doc_id never points at a row of the old vectors
+            try:
+                os.remove(self.header_path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_vectors, self.vectors_path)
+            if self.dtype == "int8":
+                os.replace(tmp_scales, self.scales_path)
+            else:
+                os.remove(tmp_scales)
+            os.replace(tmp_ids, self.ids_path)
+            self._write_header(dim, self.dtype)
+        logger.info(f"Rebuilt vector sidecar with {total} vectors")
+        return total
@@ -0,0 +1,360 @@
+"""
+Llamaball - Ingestion Writer
+File Purpose: Single write path for ingestion with batched SQLite transactions
+Primary Functions: Open WAL connections, buffer chunk and embedding writes, flush with executemany
+Inputs: Per-file chunk lists, (doc_id, embedding) batches
+Outputs: Content-addressed chunk rows, file mappings, embeddings, vector sidecar appends,
+    the pending-embeddings checkpoint and per-file status
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .quantization import DEFAULT_EMBEDDING_DTYPE, encode_embedding
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered before a transaction is committed
+CHUNK_FLUSH_ROWS = 512
+EMBEDDING_FLUSH_ROWS = 256
+# Bound parameters per IN (...) lookup, below SQLite's variable limit
+LOOKUP_BATCH = 500
+# Pending chunks read back per query when resuming
+PENDING_PAGE_ROWS = 1000
+
+# files.status values: every chunk embedded, chunks still queued, and
+# chunks whose embedding failed (retried by the next run)
+FILE_COMPLETE = "complete"
+FILE_PENDING = "pending"
+FILE_FAILED = "failed"
+
+
+def open_connection(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Connect with WAL journaling so readers never block the writer, and
+    synchronous=NORMAL so each commit costs one fsync at checkpoint time.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, timeout=30.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def content_hash(text: str) -> bytes:
+    """Key identical chunks share across files (and the embedding cache)."""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+
+def lookup_chunk_ids(
+    cursor: sqlite3.Cursor, hashes: Sequence[bytes]
+) -> Dict[bytes, int]:
+    """Map content hashes to their documents.id."""
+    unique = list(dict.fromkeys(hashes))
+    ids: Dict[bytes, int] = {}
+    for start in range(0, len(unique), LOOKUP_BATCH):
+        part = unique[start : start + LOOKUP_BATCH]
+        rows = cursor.execute(
+            f"SELECT hash, id FROM documents WHERE hash IN ({','.join('?' * len(part))})",
+            part,
+        )
+        ids.update((bytes(h), i) for h, i in rows)
+    return ids
+
+
+def delete_orphan_chunks(cursor: sqlite3.Cursor, doc_ids: Set[int]) -> int:
+    """Delete chunks (and embeddings) among doc_ids that no file references any more."""
+    orphans = [
+        doc_id
+        for doc_id in doc_ids
+        if cursor.execute(
+            "SELECT 1 FROM file_chunks WHERE doc_id = ? LIMIT 1", (doc_id,)
+        ).fetchone()
+        is None
+    ]
+    cursor.executemany(
+        "DELETE FROM embeddings WHERE doc_id = ?", [(i,) for i in orphans]
+    )
+    cursor.executemany(
+        "DELETE FROM pending_embeddings WHERE doc_id = ?", [(i,) for i in orphans]
+    )
+    cursor.executemany("DELETE FROM documents WHERE id = ?", [(i,) for i in orphans])
+    return len(orphans)
+
+
+class FileChunks(NamedTuple):
+    """
+    Chunks persisted for one file with the doc_id of each. to_embed lists
+    the chunk indexes whose content is new to the database; the rest reuse
+    an existing chunk and its embedding.
+    """
+
+    filename: str
+    chunks: List[str]
+    doc_ids: List[int]
+    to_embed: List[int]
+
+
+class IngestWriter:
+    """
+    Owns the one connection that writes during ingestion.
+
+    File replacements and embeddings are buffered and flushed in batched
+    transactions. Methods are thread-safe so embedding workers can hand
+    results straight to the writer.
+
+    Chunks that need a vector are recorded in pending_embeddings in the
+    same transaction that writes them, and removed in the transaction that
+    stores their embedding, so an interrupted ingest leaves an exact list
+    of the work still to do (see pending_tasks).
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        dtype: str = DEFAULT_EMBEDDING_DTYPE,
+        chunk_flush_rows: int = CHUNK_FLUSH_ROWS,
+        embedding_flush_rows: int = EMBEDDING_FLUSH_ROWS,
+    ):
+        self.db_path = db_path
+        self.dtype = dtype
+        self.chunk_flush_rows = chunk_flush_rows
+        self.embedding_flush_rows = embedding_flush_rows
+        self.conn = open_connection(db_path, check_same_thread=False)
+        self.store = VectorStore(db_path, dtype)
+        self.transactions = 0
+        self._lock = threading.RLock()
+        self._files = []
+        self._file_rows = 0
+        self._doc_ids: List[int] = []
+        self._vectors: List[np.ndarray] = []
+        # Chunks handed out for embedding, so duplicates are embedded once
+        self._queued: Set[int] = set()
+
+    def file_mtimes(self) -> dict:
+        """Recorded mtime of every ingested file."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT filename, mtime FROM files"))
+
+    def replace_file(
+        self,
+        filename: str,
+        chunks: Sequence[str],
+        mtime: float,
+        offsets: Optional[Sequence[Optional[Tuple[int, int]]]] = None,
+    ) -> List[FileChunks]:
+        """
+        Queue a file's new chunk list, with each chunk's (start, end)
+        character offsets in the file if known. Returns the files written
+        if this call triggered a flush (their doc_ids are only known
+        afterwards).
+        """
+        offsets = list(offsets) if offsets is not None else [None] * len(chunks)
+        with self._lock:
+            self._files.append((filename, list(chunks), mtime, offsets))
+            self._file_rows += max(1, len(chunks))
+            if self._file_rows >= self.chunk_flush_rows:
+                return self.flush_files()
+            return []
+
+    def flush_files(self) -> List[FileChunks]:
+        """
+        Write queued files in one transaction. Chunks are stored once per
+        content hash; each file's (chunk_idx -> doc_id) mapping is replaced,
+        chunks it no longer shares with any file are deleted with their
+        embeddings, and its mtime is stored.
+        """
+        with self._lock:
+            if not self._files:
+                return []
+            files, self._files, self._file_rows = self._files, [], 0
+            written = []
+            cursor = self.conn.cursor()
+            with self.conn:
+                for filename, chunks, mtime, offsets in files:
+                    previous = {
+                        row[0]
+                        for row in cursor.execute(
+                            "SELECT doc_id FROM file_chunks WHERE filename = ?",
+                            (filename,),
+                        )
+                    }
+                    cursor.execute(
+                        "DELETE FROM file_chunks WHERE filename = ?", (filename,)
+                    )
+                    hashes = [content_hash(text) for text in chunks]
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO documents (hash, content) VALUES (?, ?)",
+                        zip(hashes, chunks),
+                    )
+                    ids = lookup_chunk_ids(cursor, hashes)
+                    doc_ids = [ids[h] for h in hashes]
+                    cursor.executemany(
+                        "INSERT INTO file_chunks (filename, chunk_idx, doc_id, char_start, char_end) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (filename, idx, doc_id) + (span or (None, None))
+                            for idx, (doc_id, span) in enumerate(zip(doc_ids, offsets))
+                        ],
+                    )
+                    delete_orphan_chunks(cursor, previous - set(doc_ids))
+                    to_embed = []
+                    waiting = False
+                    for idx, doc_id in enumerate(doc_ids):
+                        if doc_id in self._queued:
+                            waiting = True
+                            continue
+                        if cursor.execute(
+                            "SELECT 1 FROM embeddings WHERE doc_id = ?", (doc_id,)
+                        ).fetchone():
+                            continue
+                        self._queued.add(doc_id)
+                        to_embed.append(idx)
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO pending_embeddings (doc_id) VALUES (?)",
+                        [(doc_ids[idx],) for idx in to_embed],
+                    )
+                    status = FILE_PENDING if to_embed or waiting else FILE_COMPLETE
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO files (filename, mtime, status) VALUES (?, ?, ?)",
+                        (filename, mtime, status),
+                    )
+                    written.append(FileChunks(filename, chunks, doc_ids, to_embed))
+            self.transactions += 1
+            return written
+
+    def add_embeddings(self, doc_ids: Sequence[int], vectors: np.ndarray) -> None:
+        """Queue embeddings for doc_ids, flushing once enough are buffered."""
+        with self._lock:
+            self._doc_ids.extend(int(d) for d in doc_ids)
+            self._vectors.append(np.asarray(vectors, dtype=np.float32))
+            if len(self._doc_ids) >= self.embedding_flush_rows:
+                self.flush_embeddings()
+
+    def flush_embeddings(self) -> int:
+        """
+        Insert queued embeddings in one transaction, then append them to the
+        vector sidecar. Returns the number of rows written.
+        """
+        with self._lock:
+            if not self._doc_ids:
+                return 0
+            doc_ids, self._doc_ids = self._doc_ids, []
+            vectors = np.vstack(self._vectors)
+            self._vectors = []
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+                    [
+                        (doc_id, encode_embedding(vec, self.dtype))
+                        for doc_id, vec in zip(doc_ids, vectors)
+                    ],
+                )
+                self.conn.executemany(
+                    "DELETE FROM pending_embeddings WHERE doc_id = ?",
+                    [(doc_id,) for doc_id in doc_ids],
+                )
+            self.transactions += 1
+            self.store.append(doc_ids, vectors)
+            logger.debug(f"Flushed {len(doc_ids)} embeddings")
+            return len(doc_ids)
+
+    def pending_pages(
+        self, page_rows: int = PENDING_PAGE_ROWS
+    ) -> Iterator[List[Tuple[str, str, int, int]]]:
+        """
+        Chunks left without a vector by earlier runs, as lists of at most
+        page_rows (filename, content, chunk_idx, doc_id) for one file that
+        uses each, read lazily in doc_id order so a large backlog is never
+        held in memory at once. Yielded chunks are marked as queued so
+        files re-chunked in this run do not embed them twice.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    """
+                    SELECT MIN(fc.filename), d.content, fc.chunk_idx, p.doc_id
+                    FROM pending_embeddings p
+                    JOIN documents d ON d.id = p.doc_id
+                    JOIN file_chunks fc ON fc.doc_id = p.doc_id
+                    WHERE p.doc_id > ?
+                    GROUP BY p.doc_id
+                    ORDER BY p.doc_id
+                    LIMIT ?
+                    """,
+                    (last_id, page_rows),
+                ).fetchall()
+                tasks = [
+                    (f, content or "", idx, doc_id) for f, content, idx, doc_id in rows
+                ]
+                self._queued.update(task[3] for task in tasks)
+            if not tasks:
+                return
+            yield tasks
+            last_id = tasks[-1][3]
+
+    def pending_tasks(self) -> Iterator[Tuple[str, str, int, int]]:
+        """pending_pages, one chunk at a time."""
+        for page in self.pending_pages():
+            yield from page
+
+    def record_embed_failure(self, doc_ids: Sequence[int], error: str) -> None:
+        """Count a failed attempt for chunks that stay pending."""
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE pending_embeddings SET attempts = attempts + 1, last_error = ? "
+                    "WHERE doc_id = ?",
+                    [(error, int(doc_id)) for doc_id in doc_ids],
+                )
+            self.transactions += 1
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM pending_embeddings"
+            ).fetchone()[0]
+
+    def refresh_file_status(self) -> None:
+        """Settle the status of files that had chunks waiting for vectors."""
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    """
+                    UPDATE files SET status = CASE
+                        WHEN EXISTS (
+                            SELECT 1 FROM file_chunks fc
+                            JOIN pending_embeddings p ON p.doc_id = fc.doc_id
+                            WHERE fc.filename = files.filename AND p.attempts > 0
+                        ) THEN ?
+                        WHEN EXISTS (
+                            SELECT 1 FROM file_chunks fc
+                            JOIN pending_embeddings p ON p.doc_id = fc.doc_id
+                            WHERE fc.filename = files.filename
+                        ) THEN ?
+                        ELSE ?
+                    END
+                    WHERE status != ?
+                    """,
+                    (FILE_FAILED, FILE_PENDING, FILE_COMPLETE, FILE_COMPLETE),
+                )
+            self.transactions += 1
+
+    def flush(self) -> List[FileChunks]:
+        """Flush every buffered write."""
+        with self._lock:
+            written = self.flush_files()
+            self.flush_embeddings()
+            return written
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self.refresh_file_status()
+            self.conn.close()
@@ -0,0 +1,22 @@
+"""
+Shared test configuration.
+"""
+
+import pytest
+
+from llamaball import core
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(tmp_path, monkeypatch):
+    """Keep ingestion tests from reading or writing the user's embedding cache."""
+    monkeypatch.setenv("LLAMABALL_EMBED_CACHE", str(tmp_path / "embed-cache.db"))
+
+
+@pytest.fixture(autouse=True)
+def empty_search_caches():
+    """Search tests patch get_embedding, so cached queries must not leak between them."""
+    core.query_embedding_cache.clear()
+    core.search_result_cache.clear()
+    core.chat_response_cache.clear()
+    yield
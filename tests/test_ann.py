@@ -0,0 +1,76 @@
+"""
+Tests for the IVF approximate nearest neighbour index.
+"""
+
+import numpy as np
+import pytest
+
+from llamaball import core
+from llamaball import index as index_module
+from llamaball.ann import IVFIndex, ann_index_path
+from llamaball.index import VectorIndex, normalize_rows, update_ann_index
+
+
+def _clustered(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(10, dim))
+    data = centers[rng.integers(0, 10, size=n)] + 0.05 * rng.normal(size=(n, dim))
+    return normalize_rows(data.astype(np.float32))
+
+
+class TestIVFIndex:
+    """Test IVF training, probing and persistence."""
+
+    def test_probe_all_lists_is_exact(self, monkeypatch):
+        monkeypatch.setattr(index_module, "ANN_MIN_VECTORS", 0)
+        data = _clustered(500)
+        ids = np.arange(1, 501, dtype=np.int64)
+        index = VectorIndex(ids, data)
+        exact = index.search(data[3], 10, nprobe=0)
+        index.attach_ann(IVFIndex.train(ids, data, nlist=16))
+        assert index.search(data[3], 10, nprobe=16) == exact
+        approx = index.search(data[3], 10, nprobe=2)
+        assert approx[0][0] == 4
+
+    def test_save_and_load(self, tmp_path):
+        data = _clustered(200)
+        ids = np.arange(200, dtype=np.int64)
+        ivf = IVFIndex.train(ids, data, nlist=8)
+        path = str(tmp_path / "x.ivf.npz")
+        ivf.save(path)
+        loaded = IVFIndex.load(path)
+        assert loaded.nlist == 8
+        assert sorted(loaded.doc_ids()) == list(ids)
+
+    def test_update_is_incremental(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        data = _clustered(300)
+        for doc_id, vec in enumerate(data[:200], start=1):
+            conn.execute(
+                "INSERT INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+                (doc_id, vec.tobytes()),
+            )
+        conn.commit()
+        assert update_ann_index(db_path, min_vectors=1000) is None
+
+        ivf = update_ann_index(db_path, min_vectors=100)
+        assert len(ivf) == 200 and ivf.trained_on == 200
+        for doc_id, vec in enumerate(data[200:], start=201):
+            conn.execute(
+                "INSERT INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+                (doc_id, vec.tobytes()),
+            )
+        conn.execute("DELETE FROM embeddings WHERE doc_id = 1")
+        conn.commit()
+        ivf = update_ann_index(db_path, min_vectors=100)
+        assert len(ivf) == 299 and ivf.trained_on == 200
+        assert 1 not in set(ivf.doc_ids())
+        conn.close()
+
+        core.init_db(db_path, reset=True).close()
+        assert IVFIndex.load(ann_index_path(db_path)) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,136 @@
+"""
+Tests for the optional ASGI server.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("flask")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient
+
+from llamaball import asgi, core, web_server
+from tests.test_core import add_chunk, stream_reply
+from tests.test_web_server import parse_events
+
+
+class FakeOllama:
+    """Stands in for ollama.AsyncClient, streaming a fixed reply."""
+
+    def __init__(self, *parts):
+        self.parts = parts
+        self.chat_calls = []
+        self.closed = 0
+
+    async def embed(self, model, input):
+        return {"embeddings": [[1.0, 0.0, 0.0]]}
+
+    async def chat(self, **kwargs):
+        self.chat_calls.append(kwargs)
+
+        async def stream():
+            try:
+                for chunk in stream_reply(*self.parts):
+                    yield chunk
+            finally:
+                self.closed += 1
+
+        return stream()
+
+    async def list(self):
+        raise ConnectionError("ollama is not running")
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    conn = core.init_db(path)
+    add_chunk(conn, "a.txt", "llamas hum", [1, 0, 0])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(web_server, "DEFAULT_DB_PATH", path)
+    web_server.chat_sessions.clear()
+    return path
+
+
+class TestAsgiServer:
+    """Test async routes, cancellation and per-route limits."""
+
+    def test_chat_stream_events(self, db_path):
+        app = asgi.create_app()
+        app.state.ollama = FakeOllama("They ", "hum.")
+        with TestClient(app) as client:
+            response = client.post(
+                "/api/chat/stream",
+                json={"message": "Do llamas hum?", "session_id": "s"},
+            )
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["retrieval", "token", "token", "done"]
+        assert events[0][1]["results"][0]["filename"] == "a.txt"
+        assert events[-1][1]["timings"]["tokens"] == 2
+        assert web_server.chat_sessions["s"]["history"][-1] == {
+            "role": "assistant",
+            "content": "They hum.",
+        }
+
+    def test_closing_tokens_closes_ollama_stream(self, db_path):
+        app = asgi.create_app()
+        fake = app.state.ollama = FakeOllama("a", "b", "c")
+
+        async def first_token():
+            tokens = asgi.chat_tokens(app, "q", [], "m", [], {})
+            token = await tokens.__anext__()
+            await tokens.aclose()
+            return token
+
+        assert asyncio.run(first_token()) == "a"
+        assert fake.closed == 1
+
+    def test_busy_route_group_does_not_block_others(self, db_path):
+        app = asgi.create_app(limits={"search": 0}, queue_timeout=0.01)
+        app.state.ollama = FakeOllama()
+        with TestClient(app) as client:
+            busy = client.post("/api/search", json={"query": "llamas"})
+            health = client.get("/api/health")
+            stats = client.get("/api/stats").json()
+        assert busy.status_code == 503 and busy.headers["Retry-After"] == "1"
+        assert health.status_code == 200 and health.json()["ollama"] == "disconnected"
+        assert stats["limits"]["search"]["rejected"] == 1
+
+    def test_queued_chats_wait_for_a_generation_slot(self, db_path):
+        app = asgi.create_app(limits={"chat": 1}, queue_timeout=0.01)
+        fake = app.state.ollama = FakeOllama("ok")
+        generating = []
+
+        async def slow_chat(**kwargs):
+            generating.append(app.state.limiter.active["chat"])
+            await asyncio.sleep(0.02)
+            return await FakeOllama.chat(fake, **kwargs)
+
+        fake.chat = slow_chat
+
+        async def answer(i):
+            return "".join(
+                [t async for t in asgi.chat_tokens(app, f"q{i}", [], "m", [], {})]
+            )
+
+        async def many_chats():
+            return await asyncio.gather(*(answer(i) for i in range(20)))
+
+        # Each waits far longer than the general queue timeout, and none is refused
+        assert asyncio.run(many_chats()) == ["ok"] * 20
+        assert generating == [1] * 20
+        assert app.state.limiter.stats()["chat"]["rejected"] == 0
+
+    def test_chat_connections_over_bound_are_refused(self, db_path):
+        app = asgi.create_app(limits={"chat_open": 0})
+        app.state.ollama = FakeOllama("ok")
+        with TestClient(app) as client:
+            busy = client.post("/api/chat", json={"message": "hi"})
+            stream = client.post("/api/chat/stream", json={"message": "hi"})
+        assert busy.status_code == 503
+        assert "chat_open" in busy.json()["error"]
+        assert [name for name, _ in parse_events(stream.text)] == ["error"]
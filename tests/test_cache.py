@@ -0,0 +1,131 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from llamaball.cache import EmbeddingCache, LRUCache, QueryEmbeddingCache, ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Test lookups, partial hits and eviction."""
+
+    def test_only_misses_are_embedded(self, cache):
+        calls = []
+
+        def embed(texts):
+            calls.append(list(texts))
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+        first = cache.embed("ollama:m", ["a", "bb"], embed)
+        second = cache.embed("ollama:m", ["bb", "ccc", "a"], embed)
+        assert calls == [["a", "bb"], ["ccc"]]
+        np.testing.assert_array_equal(second, [[2, 1], [3, 1], [1, 1]])
+        np.testing.assert_array_equal(first, second[[2, 0]])
+        assert (cache.hits, cache.misses) == (2, 3)
+
+    def test_models_do_not_share_entries(self, cache):
+        cache.put_many("ollama:a", ["x"], np.ones((1, 2)))
+        assert cache.get_many("ollama:b", ["x"]) == {}
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        first = EmbeddingCache(path)
+        first.put_many("m", ["x"], np.ones((1, 4)))
+        first.close()
+        second = EmbeddingCache(path)
+        assert list(second.get_many("m", ["x"])) == [0]
+        second.close()
+
+    def test_lru_eviction(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "cache.db"), max_mb=1)
+        cache.put_many("m", ["keep"], np.ones((1, 1024)))
+        for start in range(0, 600, 100):
+            cache.get_many("m", ["keep"])  # keep it recently used
+            texts = [f"t{i}" for i in range(start, start + 100)]
+            cache.put_many("m", texts, np.ones((100, 1024)))
+        assert cache.evicted > 0
+        assert cache.get_many("m", ["keep"])
+        assert not cache.get_many("m", ["t0"])
+        cache.close()
+
+
+class TestQueryCaches:
+    """Test the in-memory query-time caches."""
+
+    def test_lru_evicts_least_recent(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None and cache.get("c") == 3
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+    def test_query_embeddings_normalize_and_persist(self, tmp_path):
+        calls = []
+
+        def embed(text):
+            calls.append(text)
+            return np.array([[1.0, 2.0]])
+
+        path = str(tmp_path / "cache.db")
+        first = QueryEmbeddingCache(persist=True, path=path)
+        first.get_embedding("m", "what  is\tthis?", embed)
+        first.get_embedding("m", " what is this? ", embed)
+        assert calls == ["what is this?"]
+
+        # A fresh process finds the query on disk instead of re-embedding
+        second = QueryEmbeddingCache(persist=True, path=path)
+        np.testing.assert_array_equal(
+            second.get_embedding("m", "what is this?", embed), [[1, 2]]
+        )
+        assert calls == ["what is this?"] and second.disk_hits == 1
+
+    def test_response_cache_matches_similar_questions(self):
+        cache = ResponseCache(threshold=0.95, ttl=60)
+        docs = frozenset({("a.txt", "h1")})
+        cache.put("k", np.array([1.0, 0.0]), docs, 1, "answer")
+        assert cache.get("k", np.array([1.0, 0.05]), docs, 1) == "answer"
+        # Dissimilar question, other chunks, other key or a new generation miss
+        assert cache.get("k", np.array([0.0, 1.0]), docs, 1) is None
+        assert cache.get("k", np.array([1.0, 0.0]), frozenset(), 1) is None
+        assert cache.get("other", np.array([1.0, 0.0]), docs, 1) is None
+        assert cache.get("k", np.array([1.0, 0.0]), docs, 2) is None
+        assert cache.stats()["size"] == 0
+
+    def test_response_cache_generations_are_per_database(self):
+        cache = ResponseCache(threshold=0.95, ttl=60)
+        docs = frozenset()
+        cache.put(("a.db", "chat"), np.ones(2), docs, 1, "from a")
+        cache.put(("b.db", "chat"), np.ones(2), docs, 5, "from b")
+        # Alternating lookups on each database's own generation keep both
+        for _ in range(2):
+            assert cache.get(("b.db", "chat"), np.ones(2), docs, 5) == "from b"
+            assert cache.get(("a.db", "chat"), np.ones(2), docs, 1) == "from a"
+        # A re-index of b only expires b's answers
+        assert cache.get(("b.db", "chat"), np.ones(2), docs, 6) is None
+        assert cache.get(("a.db", "chat"), np.ones(2), docs, 1) == "from a"
+        assert cache.stats()["size"] == 1
+
+    def test_response_cache_expires(self, monkeypatch):
+        cache = ResponseCache(ttl=10)
+        docs = frozenset()
+        cache.put("k", np.ones(2), docs, 0, "answer")
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        assert cache.get("k", np.ones(2), docs, 0) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
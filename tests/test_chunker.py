@@ -0,0 +1,56 @@
+"""
+Tests for the token chunker.
+"""
+
+from llamaball.chunker import DEFAULT_CHUNK_TOKENS, Chunker, chunk_budget
+from tests.test_core import ByteEncoder
+
+
+def _chunker(chunk_tokens, overlap_tokens):
+    return Chunker(chunk_tokens, overlap_tokens, encoder=ByteEncoder())
+
+
+class TestChunker:
+    """Test packing, overlap, offsets and oversize paragraphs."""
+
+    def test_paragraphs_are_packed_with_offsets(self):
+        content = "alpha one\n\nbeta two\n\n\ngamma three"
+        chunks = _chunker(20, 0).chunk(content)
+
+        assert [c.text for c in chunks] == ["alpha one\n\nbeta two", "gamma three"]
+        for chunk in chunks:
+            assert content[chunk.start : chunk.end] == chunk.text
+            assert chunk.n_tokens <= 20
+
+    def test_chunks_overlap(self):
+        content = "\n\n".join(f"para{i:02d}" for i in range(6))
+        chunks = _chunker(14, 4).chunk(content)
+
+        assert len(chunks) > 1
+        for previous, chunk in zip(chunks, chunks[1:]):
+            # Each chunk repeats the tail of the one before it
+            assert chunk.start < previous.end
+            assert previous.text.endswith(content[chunk.start : previous.end])
+            assert previous.end - chunk.start == 4
+        assert chunks[-1].end == len(content)
+
+    def test_oversize_paragraph_is_split(self):
+        content = "short\n\n" + "x" * 95 + "é"
+        chunks = _chunker(30, 5).chunk(content)
+
+        assert all(c.n_tokens <= 30 for c in chunks)
+        assert all(content[c.start : c.end] == c.text for c in chunks)
+        # Consecutive pieces overlap and together cover the whole paragraph
+        assert len(chunks) >= 4
+        assert all(
+            p.start < c.start < p.end < c.end for p, c in zip(chunks, chunks[1:])
+        )
+        assert chunks[-1].end == len(content)
+
+    def test_model_budgets(self):
+        assert chunk_budget("mxbai-embed-large:latest") == (400, 64)
+        assert chunk_budget("nomic-embed-text")[0] == DEFAULT_CHUNK_TOKENS
+        sized = Chunker.for_model("all-minilm", encoder=ByteEncoder())
+        assert (sized.chunk_tokens, sized.overlap_tokens) == (200, 32)
+        custom = Chunker.for_model("all-minilm", 64, 0, encoder=ByteEncoder())
+        assert (custom.chunk_tokens, custom.overlap_tokens) == (64, 0)
@@ -0,0 +1,93 @@
+"""
+Tests for the adaptive embedding concurrency controller.
+"""
+
+import threading
+import time
+
+import pytest
+
+from llamaball.concurrency import AIMDController
+
+
+def _window(controller, seconds=0.01, chunks=1, error=None):
+    for _ in range(max(4, controller.limit)):
+        controller.record(seconds, chunks, error)
+
+
+class TestAIMDController:
+    """Test additive increase, multiplicative decrease and slot gating."""
+
+    def test_grows_only_while_batches_are_queued(self):
+        depth = [0]
+        controller = AIMDController(1, 8, 2, batch_size=8, queue_depth=lambda: depth[0])
+        _window(controller)
+        assert controller.limit == 2
+
+        depth[0] = 5
+        _window(controller)
+        _window(controller)
+        assert controller.limit == 4
+        assert controller.adjustments == 2
+        assert "healthy" in controller.decisions[-1]["reason"]
+
+    def test_timeouts_halve_limit_and_batch_size(self):
+        controller = AIMDController(1, 16, 8, batch_size=32)
+        _window(controller, error=TimeoutError("slow"))
+        assert (controller.limit, controller.batch_size) == (4, 16)
+
+        # Healthy windows grow the batch back toward its ceiling
+        _window(controller)
+        assert controller.batch_size == 20
+
+    def test_latency_over_baseline_backs_off(self):
+        controller = AIMDController(1, 16, 8, batch_size=4, queue_depth=lambda: 10)
+        _window(controller, seconds=0.01)
+        assert controller.limit == 9
+        _window(controller, seconds=0.1)
+        assert controller.limit == 4
+        assert "latency" in controller.decisions[-1]["reason"]
+
+    def test_limits_respect_floor_and_ceiling(self):
+        controller = AIMDController(2, 3, 3, batch_size=4, queue_depth=lambda: 10)
+        _window(controller)
+        assert controller.limit == 3
+        for _ in range(3):
+            _window(controller, error=RuntimeError("boom"))
+        assert controller.limit == 2
+
+    def test_fixed_controller_never_adjusts(self):
+        controller = AIMDController.fixed(4, 16)
+        _window(controller, error=TimeoutError("slow"))
+        assert (controller.limit, controller.batch_size, controller.adjustments) == (
+            4,
+            16,
+            0,
+        )
+
+    def test_call_gates_in_flight_requests(self):
+        controller = AIMDController.fixed(2, 1)
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def request(items):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return items
+
+        threads = [
+            threading.Thread(target=controller.call, args=(request, [i]))
+            for i in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 2
+
+        with pytest.raises(ValueError):
+            controller.call(lambda items: int("x"), ["a"])
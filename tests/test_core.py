@@ -3,22 +3,300 @@ Tests for llamaball core functionality.
 
 This module contains unit tests for the core RAG system functionality.
 """
+
 import os
+import sqlite3
 import tempfile
-import pytest
 from unittest.mock import Mock, patch
-from llamaball import core
+
+import numpy as np
+import pytest
+
+from llamaball import chunker, core
+from llamaball.index import bump_index_generation
+from llamaball.writer import content_hash
+
+
+class ByteEncoder:
+    """Offline stand-in for a tiktoken encoding: one token per byte."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8")
+
+    def encode_ordinary_batch(self, texts):
+        return [list(text.encode("utf-8")) for text in texts]
+
+    def decode_with_offsets(self, tokens):
+        text = bytes(tokens).decode("utf-8")
+        offsets, chars = [], 0
+        for byte in tokens:
+            continuation = 0x80 <= byte < 0xC0
+            offsets.append(max(0, chars - continuation))
+            chars += not continuation
+        return text, offsets
+
+
+def add_chunk(conn, filename, content, vec, chunk_idx=0):
+    """Insert one file chunk (storing its content once) with an embedding."""
+    conn.execute(
+        "INSERT OR IGNORE INTO documents (hash, content) VALUES (?, ?)",
+        (content_hash(content), content),
+    )
+    doc_id = conn.execute(
+        "SELECT id FROM documents WHERE hash = ?", (content_hash(content),)
+    ).fetchone()[0]
+    conn.execute(
+        "INSERT INTO file_chunks (filename, chunk_idx, doc_id) VALUES (?, ?, ?)",
+        (filename, chunk_idx, doc_id),
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+        (doc_id, np.asarray(vec, dtype=np.float32).tobytes()),
+    )
+    return doc_id
+
+
+def fake_embed(model, input):
+    texts = input if isinstance(input, list) else [input]
+    return {"embeddings": [[len(t), 1.0, 0.5] for t in texts]}
+
+
+def stream_reply(*parts, tool_calls=None):
+    """Chunks as streamed by ollama.chat(stream=True)."""
+    chunks = [{"message": {"content": part}, "done": False} for part in parts]
+    if tool_calls:
+        chunks.append(
+            {"message": {"content": "", "tool_calls": tool_calls}, "done": False}
+        )
+    chunks.append({"message": {"content": ""}, "done": True, "eval_count": len(parts)})
+    return chunks
 
 
 class TestCoreIngestion:
     """Test document ingestion functionality."""
 
-    def test_ingest_files_basic(self):
+    def test_ingest_files_basic(self, tmp_path):
         """Test basic file ingestion without actual embedding calls."""
-        # TODO: Implement test for file ingestion
-        # This would test the file discovery and chunking logic
-        # without requiring Ollama to be running
-        pass
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        for i in range(5):
+            (docs / f"note{i}.txt").write_text(f"note number {i}")
+        db_path = str(tmp_path / "test.db")
+
+        with patch.object(
+            chunker.tiktoken, "get_encoding", return_value=ByteEncoder()
+        ), patch.object(core.ollama, "embed", side_effect=fake_embed) as embed:
+            stats = core.ingest_files(
+                str(docs),
+                db_path,
+                "m",
+                "ollama",
+                False,
+                progress_callback=lambda *a: None,
+                embed_batch_size=2,
+            )
+
+        assert stats["processed_files"] == 5
+        assert stats["embedded_chunks"] == 5
+        # Batches never exceed the batch size, even when flushed early
+        assert stats["embed_batches"] == embed.call_count >= 3
+        assert all(len(call.kwargs["input"]) <= 2 for call in embed.call_args_list)
+        assert stats["chunks_per_second"] >= stats["ingest_chunks_per_second"] > 0
+        assert stats["spilled_batches"] == 0 and stats["peak_rss_mb"] > 0
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 5
+        assert conn.execute(
+            "SELECT char_start, char_end FROM file_chunks WHERE filename = 'note3.txt'"
+        ).fetchone() == (0, len("note number 3"))
+        conn.close()
+
+    def test_ingest_files_incremental(self, tmp_path):
+        """Only new or changed files are re-embedded; others keep their rows."""
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        (docs / "a.txt").write_text("alpha")
+        (docs / "b.txt").write_text("beta")
+        db_path = str(tmp_path / "test.db")
+
+        def ingest(**kwargs):
+            with patch.object(
+                chunker.tiktoken, "get_encoding", return_value=ByteEncoder()
+            ), patch.object(core.ollama, "embed", side_effect=fake_embed):
+                return core.ingest_files(
+                    str(docs),
+                    db_path,
+                    "m",
+                    "ollama",
+                    False,
+                    progress_callback=lambda *a: None,
+                    **kwargs,
+                )
+
+        def rows():
+            conn = sqlite3.connect(db_path)
+            result = dict(
+                conn.execute(
+                    "SELECT f.filename, f.doc_id FROM file_chunks f JOIN embeddings e ON e.doc_id = f.doc_id"
+                ).fetchall()
+            )
+            conn.close()
+            return result
+
+        ingest()
+        before = rows()
+        (docs / "b.txt").write_text("beta, revised")
+        os.utime(docs / "b.txt", (0, 12345))
+        (docs / "c.txt").write_text("gamma")
+
+        stats = ingest()
+        after = rows()
+        assert stats["skipped_files"] == 1 and stats["embedded_chunks"] == 2
+        assert after["a.txt"] == before["a.txt"]
+        assert after["b.txt"] != before["b.txt"]
+        assert set(after) == {"a.txt", "b.txt", "c.txt"}
+
+        with pytest.raises(ValueError, match="--force"):
+            ingest(quantization="int8")
+        stats = ingest(force=True, quantization="int8")
+        assert stats["embedded_chunks"] == 3
+        # Every chunk was embedded before, so the forced rebuild hits the cache
+        assert stats["cache_hits"] == 3 and stats["cache_hit_rate"] == 1.0
+        # Without a format, re-ingesting keeps the database's int8 storage
+        (docs / "d.txt").write_text("delta")
+        assert ingest()["embedded_chunks"] == 1
+        conn = sqlite3.connect(db_path)
+        assert core.get_embedding_config(conn)["dtype"] == "int8"
+        conn.close()
+
+    def test_ingest_files_resumes_failed_chunks(self, tmp_path):
+        """Chunks whose embedding failed stay pending and are embedded by the next run."""
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        (docs / "a.txt").write_text("alpha")
+        (docs / "b.txt").write_text("beta")
+        db_path = str(tmp_path / "test.db")
+
+        def flaky_embed(model, input):
+            if any("beta" in text for text in input):
+                raise ValueError("input rejected")
+            return fake_embed(model=model, input=input)
+
+        def ingest(embed):
+            with patch.object(
+                chunker.tiktoken, "get_encoding", return_value=ByteEncoder()
+            ), patch.object(core.ollama, "embed", side_effect=embed):
+                return core.ingest_files(
+                    str(docs),
+                    db_path,
+                    "m",
+                    "ollama",
+                    False,
+                    progress_callback=lambda *a: None,
+                    embed_batch_size=1,
+                )
+
+        stats = ingest(flaky_embed)
+        assert stats["pending_chunks"] == 1 and stats["embed_retries"] == 0
+        run = core.get_ingest_run(db_path)
+        assert run["status"] == "complete" and run["pending_chunks"] == 1
+        assert run["directory"] == str(docs)
+        conn = sqlite3.connect(db_path)
+        assert dict(conn.execute("SELECT filename, status FROM files")) == {
+            "a.txt": "complete",
+            "b.txt": "failed",
+        }
+        conn.close()
+
+        # Nothing changed on disk, but the pending chunk is retried
+        stats = ingest(fake_embed)
+        assert stats["skipped_files"] == 2
+        assert stats["resumed_chunks"] == 1 and stats["embedded_chunks"] == 1
+        assert stats["pending_chunks"] == 0
+        conn = sqlite3.connect(db_path)
+        assert (
+            conn.execute(
+                "SELECT status FROM files WHERE filename = 'b.txt'"
+            ).fetchone()[0]
+            == "complete"
+        )
+        conn.close()
+
+    def test_ingest_files_deduplicates_chunks(self, tmp_path):
+        """Identical chunks are stored and embedded once, and found in every file."""
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        for name in ["a.txt", "copy.txt", "vendored.txt"]:
+            (docs / name).write_text("shared text")
+        (docs / "other.txt").write_text("something else")
+        db_path = str(tmp_path / "test.db")
+
+        with patch.object(
+            chunker.tiktoken, "get_encoding", return_value=ByteEncoder()
+        ), patch.object(core.ollama, "embed", side_effect=fake_embed) as embed:
+            stats = core.ingest_files(
+                str(docs),
+                db_path,
+                "m",
+                "ollama",
+                False,
+                progress_callback=lambda *a: None,
+                use_embed_cache=False,
+            )
+        assert sum(len(c.kwargs["input"]) for c in embed.call_args_list) == 2
+        assert stats["embedded_chunks"] == 2 and stats["deduplicated_chunks"] == 2
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM file_chunks").fetchone()[0] == 4
+        conn.close()
+
+        query = np.array([[11, 1.0, 0.5]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query):
+            results = core.search_embeddings("q", db_path, "m", 1)
+        assert [r[0] for r in results] == ["a.txt", "copy.txt", "vendored.txt"]
+        assert len({r[2] for r in results}) == 1
+
+    def test_init_db_migrates_legacy_layout(self, tmp_path):
+        """Per-file document rows are folded into unique chunks on open."""
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, "
+            "chunk_idx INTEGER, content TEXT, UNIQUE(filename, chunk_idx))"
+        )
+        conn.execute(
+            "CREATE TABLE embeddings (doc_id INTEGER PRIMARY KEY, embedding BLOB)"
+        )
+        conn.execute("CREATE TABLE files (filename TEXT PRIMARY KEY, mtime REAL)")
+        for doc_id, (fname, content) in enumerate(
+            [("a.txt", "same"), ("b.txt", "same"), ("c.txt", "other")], start=1
+        ):
+            conn.execute(
+                "INSERT INTO documents (filename, chunk_idx, content) VALUES (?, 0, ?)",
+                (fname, content),
+            )
+            conn.execute(
+                "INSERT INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+                (doc_id, np.array([doc_id, 1, 0], dtype=np.float32).tobytes()),
+            )
+        conn.commit()
+        conn.close()
+
+        conn = core.init_db(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM file_chunks").fetchone()[0] == 3
+        conn.close()
+        assert core.check_vector_store(db_path)["consistent"]
+
+    def test_pack_embed_batches(self):
+        """Batches respect both the chunk count and the token budget."""
+        tasks = [("f", "x", i, n) for i, n in enumerate([10, 10, 10, 50, 10])]
+        batches = core.pack_embed_batches(tasks, batch_size=3, max_tokens=40)
+        assert [[t[2] for t in b] for b in batches] == [[0, 1, 2], [3], [4]]
 
     def test_chunk_text(self):
         """Test text chunking functionality."""
@@ -30,15 +308,88 @@ class TestCoreIngestion:
 class TestCoreSearch:
     """Test search and retrieval functionality."""
 
-    def test_search_embeddings_empty_db(self):
+    def _make_db(self, tmp_path, vectors):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        for i, vec in enumerate(vectors):
+            add_chunk(conn, f"file{i}.txt", f"content {i}", vec)
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def test_search_embeddings_empty_db(self, tmp_path):
         """Test search behavior with empty database."""
-        # TODO: Implement test for empty database search
-        pass
+        db_path = self._make_db(tmp_path, [])
+        with patch.object(
+            core, "get_embedding", return_value=np.ones((1, 3), np.float32)
+        ):
+            assert core.search_embeddings("q", db_path, "m", 3) == []
 
-    def test_search_embeddings_basic(self):
+    def test_search_embeddings_basic(self, tmp_path):
         """Test basic embedding search functionality."""
-        # TODO: Implement test for basic search
-        pass
+        db_path = self._make_db(tmp_path, [[1, 0, 0], [0, 1, 0], [1, 1, 0]])
+        query = np.array([[1, 0.1, 0]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query):
+            results = core.search_embeddings("q", db_path, "m", 2)
+        assert [r[0] for r in results] == ["file0.txt", "file2.txt"]
+        assert results[0][1] == "content 0"
+        assert results[0][2] > results[1][2]
+
+    def test_search_results_cached_per_generation(self, tmp_path):
+        """Repeated searches skip embedding until the index generation changes."""
+        db_path = self._make_db(tmp_path, [[1, 0, 0], [0, 1, 0]])
+        query = np.array([[1, 0, 0]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query) as embed:
+            first = core.search_embeddings("what is x", db_path, "m", 1)
+            assert core.search_embeddings("what  is x", db_path, "m", 1) == first
+            assert embed.call_count == 1
+            assert core.search_result_cache.stats()["hits"] == 1
+
+            conn = sqlite3.connect(db_path)
+            bump_index_generation(conn)
+            conn.close()
+            assert core.search_embeddings("what is x", db_path, "m", 1) == first
+            # New generation: results recomputed, but the query embedding is reused
+            assert embed.call_count == 1
+            assert core.search_cache_stats()["search_results"]["misses"] == 2
+
+    def test_search_modes_find_exact_identifiers(self, tmp_path):
+        """Hybrid and prefilter modes surface lexical matches vector search misses."""
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        add_chunk(conn, "near.txt", "generic connection notes", [1, 0, 0])
+        add_chunk(conn, "far.txt", "raised ERR_CONN-42 on connect", [0, 1, 0])
+        add_chunk(conn, "other.txt", "unrelated", [0.9, 0.1, 0])
+        conn.commit()
+        conn.close()
+
+        query = np.array([[1, 0, 0]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query):
+            vector = core.search_embeddings("ERR_CONN-42", db_path, "m", 1)
+            hybrid = core.search_embeddings(
+                "ERR_CONN-42", db_path, "m", 2, mode="hybrid"
+            )
+            prefilter = core.search_embeddings(
+                "ERR_CONN-42", db_path, "m", 1, mode="prefilter"
+            )
+            with pytest.raises(ValueError, match="search mode"):
+                core.search_embeddings("q", db_path, "m", 1, mode="bogus")
+        assert vector[0][0] == "near.txt"
+        assert hybrid[0][0] == "far.txt" and "near.txt" in {r[0] for r in hybrid}
+        assert [r[0] for r in prefilter] == ["far.txt"]
+
+    def test_search_embeddings_sees_new_generation(self, tmp_path):
+        """Resident index reloads after ingestion bumps the generation."""
+        db_path = self._make_db(tmp_path, [[1, 0, 0]])
+        query = np.array([[0, 1, 0]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query):
+            assert core.search_embeddings("q", db_path, "m", 1)[0][0] == "file0.txt"
+            conn = sqlite3.connect(db_path)
+            add_chunk(conn, "new.txt", "x", [0, 1, 0])
+            conn.commit()
+            bump_index_generation(conn)
+            conn.close()
+            assert core.search_embeddings("q", db_path, "m", 1)[0][0] == "new.txt"
 
 
 class TestCoreChat:
@@ -55,7 +406,88 @@ class TestCoreChat:
         # TODO: Implement test for context-aware chat
         pass
 
+    def test_chat_response_cache(self, tmp_path):
+        """A rephrased question over the same chunks reuses the cached answer."""
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        add_chunk(conn, "a.txt", "llamas hum", [1, 0, 0])
+        conn.commit()
+        conn.close()
+
+        query = np.array([[1, 0, 0]], dtype=np.float32)
+        with patch.object(core, "get_embedding", return_value=query), patch.object(
+            core.ollama,
+            "chat",
+            side_effect=lambda **kw: iter(stream_reply("They hum.")),
+        ) as ollama_chat:
+            first = core.chat(db_path, user_input="Do llamas hum?", response_cache=True)
+            second = core.chat(
+                db_path, user_input="do llamas  hum", response_cache=True
+            )
+            assert second == first and ollama_chat.call_count == 1
+            # Different sampling options generate afresh
+            core.chat(
+                db_path,
+                user_input="Do llamas hum?",
+                temperature=0.1,
+                response_cache=True,
+            )
+            assert ollama_chat.call_count == 2
+            # Disabled by default
+            core.chat(db_path, user_input="Do llamas hum?")
+            assert ollama_chat.call_count == 3
+
+    def test_chat_stream_yields_tokens_and_timings(self, tmp_path):
+        """Tokens stream through the tool-call follow-up and timings are reported."""
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        tool_call = {
+            "function": {"name": "run_python_code", "arguments": {"code": "print(2)"}}
+        }
+        replies = iter(
+            [
+                stream_reply("Let me check. ", tool_calls=[tool_call]),
+                stream_reply("It ", "is 2."),
+            ]
+        )
+        stats = {}
+        with patch.object(
+            core.ollama, "chat", side_effect=lambda **kw: iter(next(replies))
+        ) as ollama_chat:
+            tokens = list(
+                core.chat_stream(db_path, user_input="what?", docs=[], stats=stats)
+            )
+        assert tokens == ["Let me check. ", "It ", "is 2."]
+        followup = ollama_chat.call_args_list[1].kwargs
+        assert "tools" not in followup
+        assert followup["messages"][-1] == {
+            "role": "tool",
+            "name": "run_python_code",
+            "content": "2\n",
+        }
+        assert stats["used_tools"] and stats["tokens"] == 3
+        assert stats["first_token_seconds"] <= stats["total_seconds"]
+        assert "tokens_per_second" in stats
+
+    def test_chat_stream_close_cancels_upstream(self, tmp_path):
+        """Closing the generator closes the Ollama stream."""
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        closed = []
+
+        def upstream(**kwargs):
+            try:
+                yield from stream_reply("a", "b", "c")
+            finally:
+                closed.append(True)
+
+        with patch.object(core.ollama, "chat", side_effect=upstream):
+            stream = core.chat_stream(db_path, user_input="q", docs=[])
+            assert next(stream) == "a"
+            stream.close()
+        assert closed == [True]
+
 
 # Placeholder for future tests
 if __name__ == "__main__":
-    pytest.main([__file__]) 
\ No newline at end of file
+    pytest.main([__file__])
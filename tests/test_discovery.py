@@ -0,0 +1,81 @@
+"""
+Tests for the scandir-based file walker.
+"""
+
+import os
+
+import pytest
+
+from llamaball.discovery import IgnoreSpec, is_ignored, parse_ignore_lines, walk_files
+
+
+def _touch(root, rel, text="x"):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel in [
+        "a.md",
+        "notes.log",
+        "image.bin",
+        "docs/b.txt",
+        "docs/build/c.txt",
+        "docs/keep.log",
+        "node_modules/pkg/readme.md",
+        ".git/HEAD.txt",
+        "temp_draft.txt",
+    ]:
+        _touch(tmp_path, rel)
+    _touch(tmp_path, ".gitignore", "# comment\n*.log\nbuild/\n")
+    _touch(tmp_path, "docs/.llamaballignore", "!keep.log\n")
+    return tmp_path
+
+
+def _rel_paths(files):
+    return sorted(f.rel_path.replace(os.sep, "/") for f in files)
+
+
+class TestWalkFiles:
+    """Test pruning, ignore files and exclude patterns."""
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_recursive(self, tree, workers):
+        files = list(
+            walk_files(str(tree), True, exclude_patterns=["temp*"], workers=workers)
+        )
+        assert _rel_paths(files) == ["a.md", "docs/b.txt", "docs/keep.log"]
+
+    def test_reuses_stat(self, tree):
+        (entry,) = [f for f in walk_files(str(tree), True) if f.rel_path == "a.md"]
+        assert entry.mtime == os.path.getmtime(tree / "a.md")
+        assert entry.size == 1
+
+    def test_non_recursive_without_ignore_files(self, tree):
+        files = walk_files(str(tree), False, use_ignore_files=False)
+        assert _rel_paths(files) == ["a.md", "notes.log", "temp_draft.txt"]
+
+
+class TestIgnoreRules:
+    """Test gitignore pattern semantics."""
+
+    def test_anchored_and_globstar(self):
+        specs = (
+            IgnoreSpec("", parse_ignore_lines(["/top.txt", "**/cache/**", "*.tmp"])),
+        )
+        assert is_ignored(specs, "top.txt", False)
+        assert not is_ignored(specs, "sub/top.txt", False)
+        assert is_ignored(specs, "a/cache/b/c.txt", False)
+        assert is_ignored(specs, "deep/x.tmp", False)
+
+    def test_nested_spec_is_relative(self):
+        specs = (IgnoreSpec("docs", parse_ignore_lines(["/draft.md"])),)
+        assert is_ignored(specs, "docs/draft.md", False)
+        assert not is_ignored(specs, "draft.md", False)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,46 @@
+"""
+Tests for the resident vector index.
+
+Checks that matrix-based top-k ranking matches the previous per-row cosine loop.
+"""
+
+import numpy as np
+import pytest
+
+from llamaball.index import VectorIndex, normalize_rows, top_k_indices
+
+
+def _reference_ranking(matrix, query, top_k):
+    scores = []
+    for doc_id, emb in enumerate(matrix, start=1):
+        sim = np.dot(query, emb) / (np.linalg.norm(query) * np.linalg.norm(emb))
+        scores.append((doc_id, float(sim)))
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return [doc_id for doc_id, _ in scores[:top_k]]
+
+
+class TestVectorIndex:
+    """Test ranking behaviour of VectorIndex."""
+
+    def test_matches_cosine_loop(self):
+        rng = np.random.default_rng(0)
+        raw = rng.normal(size=(200, 16)).astype(np.float32)
+        query = rng.normal(size=16).astype(np.float32)
+        index = VectorIndex(
+            np.arange(1, 201, dtype=np.int64), normalize_rows(raw.copy())
+        )
+        for k in (1, 5, 50, 300):
+            got = [doc_id for doc_id, _ in index.search(query, k)]
+            assert got == _reference_ranking(raw, query, k)
+
+    def test_ties_keep_doc_order(self):
+        scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1], dtype=np.float32)
+        assert list(top_k_indices(scores, 3)) == [1, 0, 2]
+
+    def test_empty_index(self):
+        index = VectorIndex(np.empty(0, np.int64), np.empty((0, 0), np.float32))
+        assert index.search(np.ones(4, np.float32), 3) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
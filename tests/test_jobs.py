@@ -0,0 +1,74 @@
+"""
+Tests for the background ingestion job queue.
+"""
+
+import threading
+
+from llamaball.jobs import COMPLETED, FAILED, JobQueue
+
+
+class TestJobQueue:
+    """Test coalescing, ordering and error reporting."""
+
+    def test_upload_burst_is_coalesced(self):
+        passes = []
+        release = threading.Event()
+
+        def run_upload(batch, progress):
+            release.wait(5)
+            passes.append([f for params in batch for f in params["files"]])
+            return {"processed_files": len(passes[-1])}
+
+        jobs = JobQueue({"upload": run_upload}, coalesce_seconds=0)
+        first = jobs.submit("upload", {"files": ["a"]})
+        # Uploads arriving while the first pass runs share the next one
+        later = [jobs.submit("upload", {"files": [name]}) for name in "bc"]
+        release.set()
+        jobs.close(timeout=5)
+
+        assert passes in ([["a"], ["b", "c"]], [["a", "b", "c"]])
+        last = jobs.get(later[1]["id"])
+        assert last["state"] == COMPLETED
+        assert set(last["coalesced_jobs"]) >= {later[0]["id"], later[1]["id"]}
+        assert jobs.get(first["id"])["result"]["processed_files"] >= 1
+
+    def test_jobs_run_in_order_without_overtaking(self):
+        order = []
+        jobs = JobQueue(
+            {
+                "upload": lambda batch, progress: order.append(("upload", len(batch))),
+                "directory": lambda batch, progress: order.append(
+                    ("directory", len(batch))
+                ),
+            },
+            coalesce_seconds=0,
+        )
+        with jobs._cond:
+            # Queue everything before the runner thread can take a batch
+            for kind in ("directory", "upload", "directory", "upload"):
+                params = {"files": []} if kind == "upload" else {"directory": "d"}
+                jobs.submit(kind, params)
+        jobs.close(timeout=5)
+        assert [kind for kind, _ in order] == [
+            "directory",
+            "upload",
+            "directory",
+            "upload",
+        ]
+
+    def test_failure_is_recorded(self):
+        def fail(batch, progress):
+            raise RuntimeError("embedding server unreachable")
+
+        jobs = JobQueue({"directory": fail}, coalesce_seconds=0, history=1)
+        old = jobs.submit("directory", {"directory": "a"})
+        jobs.close(timeout=5)
+        new = jobs.submit("directory", {"directory": "b"})
+        jobs.close(timeout=5)
+
+        job = jobs.get(new["id"])
+        assert job["state"] == FAILED
+        assert job["error"] == "embedding server unreachable"
+        assert "run_seconds" in job["timings"]
+        # Only the newest finished job is kept
+        assert jobs.get(old["id"]) is None
@@ -0,0 +1,75 @@
+"""
+Tests for FTS5 lexical search and rank fusion.
+"""
+
+import sqlite3
+
+import pytest
+
+from llamaball import core
+from llamaball.lexical import bm25_search, match_expression, reciprocal_rank_fusion
+from llamaball.writer import IngestWriter
+
+
+class TestLexicalSearch:
+    """Test the FTS5 index maintained by ingestion writes."""
+
+    def test_index_follows_chunk_writes(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        writer = IngestWriter(db_path)
+        writer.replace_file(
+            "a.txt", ["raised ERR_CONN-42 on connect", "nothing here"], 1.0
+        )
+        writer.replace_file("b.txt", ["connect retries"], 1.0)
+        a, b = writer.flush_files()
+
+        conn = sqlite3.connect(db_path)
+        hits = bm25_search(conn, "ERR_CONN-42", 10)
+        assert [doc_id for doc_id, _ in hits] == [a.doc_ids[0]]
+        assert {d for d, _ in bm25_search(conn, "connect", 10)} == {
+            a.doc_ids[0],
+            b.doc_ids[0],
+        }
+
+        # Replaced chunks leave the index with their rows
+        writer.replace_file("a.txt", ["rewritten"], 2.0)
+        writer.flush_files()
+        writer.close()
+        assert bm25_search(conn, "ERR_CONN-42", 10) == []
+        conn.close()
+
+    def test_search_without_index_does_not_write(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY, hash BLOB, content TEXT)"
+        )
+        conn.execute("INSERT INTO documents (hash, content) VALUES (x'00', 'connect')")
+        conn.commit()
+        schema = conn.execute("SELECT name FROM sqlite_master").fetchall()
+
+        assert bm25_search(conn, "connect", 10) == []
+        assert conn.execute("SELECT name FROM sqlite_master").fetchall() == schema
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        conn.close()
+
+        # Ingestion's init_db builds and backfills the index
+        core.init_db(db_path).close()
+        conn = sqlite3.connect(db_path)
+        assert [doc_id for doc_id, _ in bm25_search(conn, "connect", 10)] == [1]
+        conn.close()
+
+    def test_match_expression_quotes_terms(self):
+        assert match_expression('foo.bar "x" --') == '"foo.bar" OR """x"""'
+        assert match_expression("  !! ") is None
+
+    def test_reciprocal_rank_fusion(self):
+        lexical = [(1, 9.0), (2, 5.0)]
+        vector = [(3, 0.9), (1, 0.8)]
+        fused = reciprocal_rank_fusion([lexical, vector], top_k=2)
+        assert [doc_id for doc_id, _ in fused] == [1, 3]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,71 @@
+"""
+Tests for the isolated parser process pool.
+"""
+
+import os
+import time
+
+import pytest
+
+from llamaball.parse_pool import ParsePool
+
+
+def slow_or_crashing_parse(path):
+    """Parser stand-in whose behaviour is chosen by the file name."""
+    name = os.path.basename(path)
+    if name == "hang":
+        time.sleep(60)
+    if name == "crash":
+        os._exit(3)
+    if name == "huge":
+        bytearray(4 * 1024 * 1024 * 1024)
+    return {"content": f"parsed {name}", "error": None}
+
+
+@pytest.fixture
+def pool():
+    pool = ParsePool(
+        workers=1, timeout=2.0, memory_mb=1024, parse=slow_or_crashing_parse
+    )
+    yield pool
+    pool.close()
+
+
+class TestParsePool:
+    """Test that bad files are reported without stopping the pool."""
+
+    def test_parses_in_worker(self, pool):
+        assert pool.parse_file("/x/ok") == {"content": "parsed ok", "error": None}
+
+    def test_workers_start_on_demand(self):
+        pool = ParsePool(workers=4, parse=slow_or_crashing_parse)
+        try:
+            assert all(worker.process is None for worker in pool.workers)
+            for name in ("a", "b", "c"):
+                assert pool.parse_file(f"/x/{name}")["content"] == f"parsed {name}"
+            # Sequential files keep reusing the one warm worker
+            assert sum(worker.process is not None for worker in pool.workers) == 1
+        finally:
+            pool.close()
+
+    def test_timeout_replaces_worker(self, pool):
+        started = time.monotonic()
+        result = pool.parse_file("/x/hang")
+        assert "timed out" in result["error"]
+        assert time.monotonic() - started < 10
+        assert pool.parse_file("/x/ok")["content"] == "parsed ok"
+
+    def test_crash_replaces_worker(self, pool):
+        result = pool.parse_file("/x/crash")
+        assert "crashed" in result["error"] and "3" in result["error"]
+        assert pool.parse_file("/x/ok")["content"] == "parsed ok"
+
+    @pytest.mark.skipif(os.name != "posix", reason="RLIMIT_AS is POSIX-only")
+    def test_memory_limit(self, pool):
+        result = pool.parse_file("/x/huge")
+        assert "memory limit" in result["error"]
+        assert pool.parse_file("/x/ok")["content"] == "parsed ok"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
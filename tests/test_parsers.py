@@ -0,0 +1,29 @@
+"""
+Tests for text normalization in the file parser.
+"""
+
+import re
+
+from llamaball.parsers import FileParser
+
+
+class TestCleanText:
+    """Test that cleaning keeps line and paragraph structure."""
+
+    def test_structure_is_preserved(self):
+        text = "  Title\t \r\n\r\nFirst  line\x00 of\tpara\nsecond line \n \n\n\nNext\x0cPage two\u2029End  "
+        assert FileParser()._clean_text(text) == (
+            "Title\n\nFirst line of para\nsecond line\n\nNext\n\nPage two\n\nEnd"
+        )
+
+    def test_control_characters_are_removed(self):
+        clean = FileParser()._clean_text
+        assert clean("a\x00b \x07 c\x7f") == "ab c"
+        assert clean("a\n\x01\x02\nb") == "a\n\nb"
+        assert clean("\x00 \t ") == ""
+
+    def test_text_files_keep_paragraphs(self, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_text("one\n\n\n  two   words\n\nthree\n")
+        content = FileParser().parse_file(path)["content"]
+        assert re.split(r"\n\s*\n", content) == ["one", "two words", "three"]
@@ -0,0 +1,264 @@
+"""
+Tests for the streaming ingestion pipeline.
+"""
+
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from llamaball import core
+from llamaball.pipeline import EmbedBatcher, IngestPipeline
+from llamaball.writer import IngestWriter
+
+
+def _pipeline(db_path, load_file, embed, **kwargs):
+    core.init_db(db_path).close()
+    writer = IngestWriter(db_path, chunk_flush_rows=1000)
+    pipeline = IngestPipeline(
+        load_file=load_file,
+        chunk_file=lambda loaded: (loaded, 1.0, [(f"text of {loaded}", 3)]),
+        embed=embed,
+        writer=writer,
+        batch_size=4,
+        max_batch_tokens=100,
+        **kwargs,
+    )
+    return pipeline, writer
+
+
+def _embed(texts):
+    return np.ones((len(texts), 3), dtype=np.float32)
+
+
+class TestIngestPipeline:
+    """Test streaming behaviour of the staged pipeline."""
+
+    def test_embedding_overlaps_parsing(self, tmp_path):
+        first_embedded = threading.Event()
+
+        def load_file(path, rel_path):
+            # The last file only parses once something has been embedded,
+            # which a two-phase ingest could never satisfy
+            if rel_path == "f9" and not first_embedded.wait(timeout=5):
+                raise AssertionError("embedding did not start during parsing")
+            return rel_path
+
+        def embed(texts):
+            first_embedded.set()
+            return _embed(texts)
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"), load_file, embed, queue_size=2, parse_workers=1
+        )
+        pipeline.run((f"/x/f{i}", f"f{i}") for i in range(10))
+        writer.close()
+
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 10
+        conn.close()
+        assert pipeline.files_done == 10 and pipeline.discovered == 10
+
+    def test_embed_active_time_counts_overlap_once(self, tmp_path):
+        def embed(texts):
+            time.sleep(0.05)
+            return _embed(texts)
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"), lambda path, rel: rel, embed, embed_workers=3
+        )
+        started = time.perf_counter()
+        pipeline.run((f"/x/f{i}", f"f{i}") for i in range(12))
+        elapsed = time.perf_counter() - started
+        writer.close()
+
+        # Thread time sums concurrent calls; active time never exceeds the run
+        assert 0.05 <= pipeline.embed_active_seconds <= elapsed
+        assert pipeline.embed_active_seconds <= pipeline.stage_seconds["embed"] + 1e-6
+
+    def test_stage_failure_is_raised(self, tmp_path):
+        def embed(texts):
+            raise KeyboardInterrupt  # not an Exception, so not a per-batch error
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"), lambda path, rel: rel, embed, queue_size=1
+        )
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run((f"/x/f{i}", f"f{i}") for i in range(50))
+        writer.close()
+
+    def test_embed_errors_are_reported(self, tmp_path):
+        failures = []
+
+        def embed(texts):
+            raise RuntimeError("model unavailable")
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"),
+            lambda path, rel: rel,
+            embed,
+            on_embed_error=lambda batch, e: failures.extend(batch),
+        )
+        pipeline.run((f"/x/f{i}", f"f{i}") for i in range(6))
+        writer.close()
+        assert sorted(task[0] for task in failures) == [f"f{i}" for i in range(6)]
+
+    def test_transient_errors_are_retried(self, tmp_path):
+        calls = []
+
+        def embed(texts):
+            calls.append(len(texts))
+            if len(calls) <= 2:
+                raise ConnectionError("ollama restarting")
+            return _embed(texts)
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"),
+            lambda path, rel: rel,
+            embed,
+            embed_workers=1,
+            retry_base_seconds=0.01,
+        )
+        pipeline.run([("/x/f0", "f0")])
+        writer.close()
+        assert pipeline.embed_retries_used == 2
+        assert len(calls) == 3
+
+    def test_interrupted_run_resumes_pending_chunks(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        embedded = []
+
+        def embed(texts):
+            if embedded:
+                raise KeyboardInterrupt  # the process dies mid-ingest
+            embedded.append(len(texts))
+            return _embed(texts)
+
+        pipeline, writer = _pipeline(
+            db_path, lambda path, rel: rel, embed, embed_workers=1, queue_size=1
+        )
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run((f"/x/f{i}", f"f{i}") for i in range(12))
+        writer.close()
+
+        writer = IngestWriter(db_path)
+        pending = [
+            (f, text, idx, 3, doc_id) for f, text, idx, doc_id in writer.pending_tasks()
+        ]
+        assert pending
+        resumed = IngestPipeline(
+            load_file=lambda path, rel: rel,
+            chunk_file=lambda loaded: None,
+            embed=_embed,
+            writer=writer,
+            batch_size=4,
+            max_batch_tokens=100,
+        )
+        resumed.run([], pending)
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        assert (
+            conn.execute("SELECT COUNT(*) FROM pending_embeddings").fetchone()[0] == 0
+        )
+        assert (
+            conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            == conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        )
+        assert {row[0] for row in conn.execute("SELECT status FROM files")} == {
+            "complete"
+        }
+        conn.close()
+
+    def test_pending_chunks_are_read_as_they_are_queued(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        pipeline, writer = _pipeline(
+            db_path,
+            lambda path, rel: rel,
+            lambda texts: 1 / 0,
+            on_embed_error=lambda batch, e: None,
+        )
+        pipeline.run((f"/x/f{i}", f"f{i}") for i in range(20))
+        writer.close()
+
+        writer = IngestWriter(db_path)
+        pages_read = []
+
+        def pending():
+            for page in writer.pending_pages(page_rows=2):
+                pages_read.append(len(page))
+                yield from ((f, text, idx, 3, doc_id) for f, text, idx, doc_id in page)
+
+        read_at_first_embed = []
+
+        def embed(texts):
+            read_at_first_embed.append(sum(pages_read))
+            return _embed(texts)
+
+        resumed = IngestPipeline(
+            load_file=lambda path, rel: rel,
+            chunk_file=lambda loaded: None,
+            embed=embed,
+            writer=writer,
+            batch_size=4,
+            max_batch_tokens=100,
+            embed_workers=1,
+            queue_size=1,
+        )
+        resumed.run([], pending())
+        writer.close()
+
+        assert sum(pages_read) == 20
+        # The backlog was still being read when embedding started
+        assert read_at_first_embed[0] < 20
+
+    def test_batches_spill_over_memory_budget(self, tmp_path):
+        chunked = threading.Event()
+        embedded = []
+
+        def embed(texts):
+            # Without spilling the chunk stage would block on the full queue
+            if not chunked.wait(timeout=5):
+                raise AssertionError("chunking stalled behind the embedder")
+            embedded.extend(texts)
+            return _embed(texts)
+
+        def on_file(done, total, rel_path):
+            if done == 20:
+                chunked.set()
+
+        pipeline, writer = _pipeline(
+            str(tmp_path / "test.db"),
+            lambda path, rel: rel,
+            embed,
+            embed_workers=1,
+            parse_workers=1,
+            queue_size=1,
+            memory_budget=40,
+            spill_dir=str(tmp_path),
+            on_file=on_file,
+        )
+        pipeline.run((f"/x/f{i}", f"f{i}") for i in range(20))
+        writer.close()
+
+        assert pipeline.spilled_batches > 0
+        # Spilled batches are embedded in the order they were queued
+        assert embedded == [f"text of f{i}" for i in range(20)]
+
+
+class TestEmbedBatcher:
+    """Test incremental batch packing."""
+
+    def test_oversized_chunk_is_alone(self):
+        batcher = EmbedBatcher(batch_size=10, max_tokens=5)
+        assert batcher.add(("a", "", 0, 2)) is None
+        assert batcher.add(("b", "", 0, 9)) == [("a", "", 0, 2)]
+        assert batcher.add(("c", "", 0, 1)) == [("b", "", 0, 9)]
+        assert batcher.flush() == [("c", "", 0, 1)]
+        assert batcher.flush() is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+"""
+Tests for the prefork server's writer process and shared chat sessions.
+"""
+
+import multiprocessing
+import os
+from multiprocessing.managers import SyncManager
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from llamaball import chunker, core, web_server
+from llamaball.jobs import COMPLETED, JobQueue
+from llamaball.prefork import start_writer
+from tests.test_core import ByteEncoder, fake_embed
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+
+
+@pytest.fixture
+def manager():
+    manager = SyncManager(ctx=multiprocessing.get_context("fork"))
+    manager.start()
+    yield manager
+    manager.shutdown()
+
+
+class TestPrefork:
+    """Test jobs run by the writer process and sessions shared by workers."""
+
+    def test_writer_process_runs_ingest_job(self, tmp_path, manager):
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        for i in range(3):
+            (docs / f"note{i}.txt").write_text(f"note number {i}")
+        db_path = str(tmp_path / "test.db")
+        ctx = multiprocessing.get_context("fork")
+        jobs = ctx.Queue()
+        queue = JobQueue(
+            web_server.ingest_jobs.runners, store=manager.dict(), coalesce_seconds=0
+        )
+        queue.forward = jobs
+
+        # Patches are inherited by the forked writer
+        with patch.object(web_server, "ingest_jobs", queue), patch.object(
+            web_server, "DEFAULT_DB_PATH", db_path
+        ), patch.object(web_server, "DEFAULT_MODEL", "m"), patch.object(
+            chunker.tiktoken, "get_encoding", return_value=ByteEncoder()
+        ), patch.object(
+            core.ollama, "embed", side_effect=fake_embed
+        ):
+            writer = start_writer(ctx, jobs, db_path)
+            job = queue.submit(
+                "directory", {"directory": str(docs), "recursive": True, "force": False}
+            )
+            jobs.put(None)
+            writer.join(timeout=60)
+
+        assert writer.exitcode == 0
+        job = queue.get(job["id"])
+        assert job["state"] == COMPLETED, job["error"]
+        assert job["result"]["processed_files"] == 3
+        assert job["result"]["error_files"] == 0, job["result"]["error_messages"]
+
+    def test_chat_sessions_shared_between_processes(self, manager):
+        web_server.share_chat_sessions(manager)
+        try:
+            ctx = multiprocessing.get_context("fork")
+
+            def exchange(text):
+                session = web_server.get_chat_session("s", "chat-model")
+                web_server.record_exchange(session, text, f"re: {text}")
+
+            for text in ("first", "second"):
+                # Each turn of the conversation lands on a different worker
+                proc = ctx.Process(target=exchange, args=(text,))
+                proc.start()
+                proc.join(timeout=10)
+                assert proc.exitcode == 0
+            history = web_server.chat_sessions["s"]["history"]
+        finally:
+            web_server.share_chat_sessions(None)
+
+        assert [m["content"] for m in history] == [
+            "first",
+            "re: first",
+            "second",
+            "re: second",
+        ]
@@ -0,0 +1,135 @@
+"""
+Tests for float16 / int8 embedding storage and rescored search.
+"""
+
+import numpy as np
+import pytest
+
+from llamaball import core
+from llamaball.index import (
+    VectorIndex,
+    check_embedding_config,
+    record_embedding_config,
+)
+from llamaball.quantization import (
+    decode_embedding,
+    decode_embeddings,
+    encode_embedding,
+)
+from llamaball.vector_store import VectorStore
+
+
+def _corpus(n=300, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def _populate(db_path, vectors, dtype, sidecar=False):
+    conn = core.init_db(db_path)
+    record_embedding_config(conn, "embed-model", dtype, vectors.shape[1])
+    store = VectorStore(db_path, dtype)
+    for doc_id, vec in enumerate(vectors, start=1):
+        conn.execute(
+            "INSERT INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+            (doc_id, encode_embedding(vec, dtype)),
+        )
+        if sidecar:
+            store.append([doc_id], vec)
+    conn.commit()
+    return conn
+
+
+class TestEncoding:
+    """Test BLOB round trips."""
+
+    @pytest.mark.parametrize(
+        "dtype,size", [("float32", 64), ("float16", 32), ("int8", 20)]
+    )
+    def test_round_trip(self, dtype, size):
+        vec = np.linspace(-1, 1, 16).astype(np.float32)
+        blob = encode_embedding(vec, dtype)
+        assert len(blob) == size
+        np.testing.assert_allclose(decode_embedding(blob, dtype), vec, atol=1e-2)
+        np.testing.assert_allclose(
+            decode_embeddings([blob, blob], dtype)[1], vec, atol=1e-2
+        )
+
+
+class TestQuantizedSearch:
+    """Test that compact storage keeps rankings close to float32."""
+
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    @pytest.mark.parametrize("sidecar", [False, True])
+    def test_rescored_top_k_matches_exact(self, tmp_path, dtype, sidecar):
+        vectors = _corpus()
+        query = vectors[7] + 0.1 * _corpus(1, seed=1)[0]
+
+        exact_conn = _populate(str(tmp_path / "exact.db"), vectors, "float32")
+        exact = VectorIndex.from_connection(exact_conn).search(query, 10)
+        exact_conn.close()
+
+        db_path = str(tmp_path / f"{dtype}.db")
+        conn = _populate(db_path, vectors, dtype, sidecar=sidecar)
+        conn.close()
+        index = VectorIndex.load(db_path)
+        assert index.dtype == dtype
+        assert (index.scales is not None) == (dtype == "int8")
+
+        results = index.search(query, 10)
+        assert results[0][0] == exact[0][0]
+        # Near-ties may swap, but recall against exact search stays high
+        overlap = {d for d, _ in results} & {d for d, _ in exact}
+        assert len(overlap) >= 8
+        assert results[0][1] == pytest.approx(exact[0][1], abs=2e-2)
+        # Without rescoring the best hit is still found
+        assert index.search(query, 1, rescore=0)[0][0] == exact[0][0]
+
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    def test_codes_scored_without_dequantizing(self, tmp_path, dtype, monkeypatch):
+        monkeypatch.setattr("llamaball.index.SCORE_BLOCK_ROWS", 64)
+        conn = _populate(str(tmp_path / "test.db"), _corpus(), dtype)
+        index = VectorIndex.from_connection(conn)
+        conn.close()
+        query = _corpus(1, seed=2)[0]
+        query /= np.linalg.norm(query)
+
+        every_row = np.arange(len(index.doc_ids))
+        np.testing.assert_allclose(
+            index.scores(query), index.vectors(every_row) @ query, atol=1e-5
+        )
+        rows = every_row[::3]
+        np.testing.assert_allclose(
+            index._dot(query, rows), index.vectors(rows) @ query, atol=1e-5
+        )
+
+
+class TestEmbeddingConfig:
+    """Test that databases reject mixed models and formats."""
+
+    def test_mismatch_rejected(self, tmp_path):
+        conn = core.init_db(str(tmp_path / "test.db"))
+        check_embedding_config(conn, "any-model", "int8")
+        record_embedding_config(conn, "embed-model", "int8", 32)
+        check_embedding_config(conn, "embed-model", "int8")
+        with pytest.raises(ValueError, match="--force"):
+            check_embedding_config(conn, "other-model")
+        with pytest.raises(ValueError, match="float16"):
+            check_embedding_config(conn, "embed-model", "float16")
+        conn.close()
+
+    def test_search_with_wrong_model_raises(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _populate(db_path, _corpus(5), "float16").close()
+        with pytest.raises(ValueError):
+            core.search_embeddings("q", db_path, "other-model", 3)
+
+    def test_init_db_clears_config(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _populate(db_path, _corpus(5), "int8").close()
+        conn = core.init_db(db_path, reset=True)
+        check_embedding_config(conn, "other-model", "float32")
+        conn.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,62 @@
+"""
+Tests for the memory-budgeted spilling queue.
+"""
+
+import queue
+import threading
+
+import pytest
+
+from llamaball.spill import SpillQueue, peak_rss_mb
+
+_DONE = object()
+
+
+def _queue(tmp_path, budget=10):
+    return SpillQueue(budget, lambda item: len(item[0]), _DONE, str(tmp_path))
+
+
+class TestSpillQueue:
+    """Test ordering across memory and disk, draining and shutdown."""
+
+    def test_order_is_kept_across_memory_and_disk(self, tmp_path):
+        spill = _queue(tmp_path)
+        for word in ["aaaa", "bbbb", "cccc", "dddd"]:
+            spill.put([word, 1])
+        assert spill.spilled == 2 and spill.qsize() == 4
+        assert spill.memory_bytes <= 10
+
+        assert spill.get() == ["aaaa", 1]
+        # Items queue behind the spilled ones until the file drains
+        spill.put(["eeee", 2])
+        assert [spill.get()[0] for _ in range(4)] == ["bbbb", "cccc", "dddd", "eeee"]
+        assert spill.empty()
+
+        # Drained: new items stay in memory again
+        spill.put(["ffff", 3])
+        assert spill.spilled == 3
+        spill.discard()
+
+    def test_close_releases_every_waiting_consumer(self, tmp_path):
+        spill = _queue(tmp_path)
+        with pytest.raises(queue.Empty):
+            spill.get(timeout=0.01)
+
+        results = []
+        consumers = [
+            threading.Thread(target=lambda: results.append(spill.get()))
+            for _ in range(3)
+        ]
+        for consumer in consumers:
+            consumer.start()
+        spill.put(["x", 0])
+        spill.close()
+        for consumer in consumers:
+            consumer.join(timeout=5)
+        assert sorted(results, key=lambda r: r is _DONE) == [["x", 0], _DONE, _DONE]
+        with pytest.raises(ValueError):
+            spill.put(["y", 0])
+
+    def test_peak_rss_is_reported(self):
+        peak = peak_rss_mb()
+        assert peak is None or peak > 0
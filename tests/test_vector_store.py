@@ -0,0 +1,168 @@
+"""
+Tests for the memory-mapped vector sidecar.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from llamaball import core
+from llamaball.index import (
+    VectorIndex,
+    bump_index_generation,
+    get_vector_index,
+    publish_index,
+    read_published_manifest,
+    serve_published_index,
+)
+from llamaball.vector_store import VectorStore
+
+
+def _insert(conn, doc_id, vec):
+    conn.execute(
+        "INSERT OR REPLACE INTO embeddings (doc_id, embedding) VALUES (?, ?)",
+        (doc_id, np.asarray(vec, dtype=np.float32).tobytes()),
+    )
+    conn.commit()
+
+
+class TestVectorStore:
+    """Test append, consistency checking and rebuild."""
+
+    def test_append_and_map(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        store = VectorStore(db_path)
+        for doc_id, vec in enumerate([[3, 4], [0, 2]], start=1):
+            _insert(conn, doc_id, vec)
+            store.append([doc_id], np.array([vec], dtype=np.float32))
+
+        assert store.check(conn)["consistent"]
+        index = VectorIndex.from_store(store, conn)
+        assert index is not None
+        assert isinstance(index.matrix, np.memmap)
+        np.testing.assert_allclose(index.matrix[0], [0.6, 0.8])
+        assert index.search(np.array([0, 1.0]), 1)[0][0] == 2
+        conn.close()
+
+    def test_superseded_rows_are_masked(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        store = VectorStore(db_path)
+        _insert(conn, 1, [1, 0])
+        store.append([1], np.array([[1, 0]]))
+        _insert(conn, 1, [0, 1])
+        store.append([1], np.array([[0, 1]]))
+
+        report = store.check(conn)
+        assert report["consistent"] and report["stale_rows"] == 1
+        index = VectorIndex.from_store(store, conn)
+        assert index.search(np.array([0, 1.0]), 5) == [(1, pytest.approx(1.0))]
+        conn.close()
+
+    def test_missing_rows_detected_and_rebuilt(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        store = VectorStore(db_path)
+        _insert(conn, 1, [1, 0])
+        store.append([1], np.array([[1, 0]]))
+        _insert(conn, 2, [0, 1])
+
+        assert not store.check(conn)["consistent"]
+        assert VectorIndex.from_store(store, conn) is None
+        assert store.rebuild(conn) == 2
+        assert store.check(conn) == {
+            "consistent": True,
+            "sidecar_rows": 2,
+            "live_rows": 2,
+            "stale_rows": 0,
+            "missing_rows": 0,
+            "database_rows": 2,
+        }
+        conn.close()
+
+    def test_readers_never_see_a_half_swapped_rebuild(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        store = VectorStore(db_path)
+        _insert(conn, 1, [1, 0])
+        store.append([1], np.array([[1, 0]]))
+        _insert(conn, 2, [0, 1])
+        before = store.open()
+        seen = []
+        replace = os.replace
+
+        def replace_then_read(src, dst):
+            replace(src, dst)
+            seen.append(VectorStore(db_path).open())
+
+        monkeypatch.setattr("llamaball.vector_store.os.replace", replace_then_read)
+        store.rebuild(conn)
+        monkeypatch.undo()
+
+        # Every open between two swaps finds no sidecar; the last sees the new one
+        assert seen[:-1] == [None] * (len(seen) - 1)
+        assert list(seen[-1].ids) == [1, 2]
+        # A mapping taken before the rebuild still reads the old files
+        assert list(before.ids) == [1]
+        # One taken across a swap notices that the header changed
+        headers = [store.read_header(), dict(store.read_header(), build="next")]
+        monkeypatch.setattr(store, "read_header", lambda: headers.pop(0))
+        assert store.open() is None
+        conn.close()
+
+    def test_init_db_resets_sidecar(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        store = VectorStore(db_path)
+        store.append([1], np.array([[1, 0]]))
+        assert store.exists()
+        core.init_db(db_path).close()
+        assert store.exists()
+        core.init_db(db_path, reset=True).close()
+        assert not store.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+
+class TestPublishedIndex:
+    """Test generation publishing for prefork workers."""
+
+    def test_workers_keep_published_generation_until_next_publish(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        store = VectorStore(db_path)
+        _insert(conn, 1, [1, 0])
+        store.append([1], np.array([[1, 0]]))
+        first = publish_index(db_path)
+
+        serve_published_index()
+        try:
+            assert get_vector_index(db_path).generation == first
+            # Writes that bump the generation republish it for readers
+            _insert(conn, 2, [0, 1])
+            store.append([2], np.array([[0, 1]]))
+            assert [
+                d for d, _ in get_vector_index(db_path).search(np.array([0, 1.0]), 5)
+            ] == [1]
+            second = bump_index_generation(conn)
+            assert read_published_manifest(db_path)["generation"] == second
+            index = get_vector_index(db_path)
+            assert index.generation == second
+            assert index.search(np.array([0, 1.0]), 1)[0][0] == 2
+        finally:
+            serve_published_index(False)
+        conn.close()
+
+    def test_publish_refuses_incomplete_sidecar(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = core.init_db(db_path)
+        VectorStore(db_path).append([1], np.array([[1, 0]]))
+        _insert(conn, 1, [1, 0])
+        _insert(conn, 2, [0, 1])
+        assert publish_index(db_path) is None
+        assert read_published_manifest(db_path) is None
+        conn.close()
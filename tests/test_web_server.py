@@ -0,0 +1,127 @@
+"""
+Tests for the Flask web server API.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from llamaball import core, web_server
+from llamaball.jobs import JobQueue
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client():
+    web_server.chat_sessions.clear()
+    return web_server.app.test_client()
+
+
+class TestChatStream:
+    """Test the Server-Sent Events chat endpoint."""
+
+    def test_streams_retrieval_tokens_then_timings(self, client):
+        docs = [("a.txt", "llamas hum", 0.9)]
+
+        def fake_stream(**kwargs):
+            assert kwargs["docs"] == docs
+            kwargs["stats"].update(first_token_seconds=0.1, tokens=2)
+            yield "They "
+            yield "hum."
+
+        with patch.object(core, "search_embeddings", return_value=docs), patch.object(
+            core, "chat_stream", side_effect=fake_stream
+        ):
+            response = client.post(
+                "/api/chat/stream",
+                json={"message": "Do llamas hum?", "session_id": "s"},
+            )
+            events = parse_events(response.get_data(as_text=True))
+
+        assert response.mimetype == "text/event-stream"
+        assert [name for name, _ in events] == ["retrieval", "token", "token", "done"]
+        assert events[0][1]["results"][0]["filename"] == "a.txt"
+        done = events[-1][1]
+        assert done["timings"]["tokens"] == 2
+        assert done["timings"]["first_token_seconds"] >= 0.1
+        assert web_server.chat_sessions["s"]["history"] == [
+            {"role": "user", "content": "Do llamas hum?"},
+            {"role": "assistant", "content": "They hum."},
+        ]
+
+    def test_disconnect_cancels_stream_without_history(self, client):
+        closed = []
+
+        def fake_stream(**kwargs):
+            try:
+                yield "a"
+                yield "b"
+            finally:
+                closed.append(True)
+
+        with patch.object(core, "search_embeddings", return_value=[]), patch.object(
+            core, "chat_stream", side_effect=fake_stream
+        ):
+            response = client.post(
+                "/api/chat/stream",
+                json={"message": "q", "session_id": "s"},
+                buffered=False,
+            )
+            chunks = response.response
+            next(chunks)  # retrieval
+            next(chunks)  # first token
+            response.close()
+
+        assert closed == [True]
+        assert web_server.chat_sessions["s"]["history"] == []
+
+    def test_rejects_unknown_mode(self, client):
+        response = client.post(
+            "/api/chat/stream", json={"message": "q", "mode": "bogus"}
+        )
+        assert response.status_code == 400
+
+
+class TestIngestionJobs:
+    """Test the ingestion job endpoints."""
+
+    def test_ingest_returns_job_with_status(self, client):
+        def run_directory(batch, progress):
+            progress(1, 1, "a.txt")
+            return {"processed_files": 1, "stage_seconds": {"embed": 0.5}}
+
+        jobs = JobQueue({"directory": run_directory}, coalesce_seconds=0)
+        with patch.object(web_server, "ingest_jobs", jobs):
+            resp = client.post("/api/ingest", json={"directory": "docs"})
+            job_id = resp.get_json()["job_id"]
+            jobs.close(timeout=5)
+            job = client.get(f"/api/jobs/{job_id}").get_json()
+            assert client.get("/api/jobs/missing").status_code == 404
+        assert job["state"] == "completed"
+        assert job["params"] == {"directory": "docs", "recursive": True, "force": False}
+        assert job["progress"]["files_done"] == 1
+        assert job["timings"]["stage_seconds"] == {"embed": 0.5}
+
+    def test_jobs_forwarded_to_writer_process(self):
+        forwarded = []
+
+        class FakeQueue:
+            def put(self, job):
+                forwarded.append(job)
+
+        jobs = JobQueue({"upload": None})
+        jobs.forward = FakeQueue()
+        job = jobs.submit("upload", {"files": []})
+        assert forwarded == [(job["id"], "upload", {"files": []})]
+        assert jobs.get(job["id"])["state"] == "queued"
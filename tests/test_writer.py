@@ -0,0 +1,81 @@
+"""
+Tests for the batched ingestion writer.
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from llamaball import core
+from llamaball.writer import IngestWriter
+
+
+class TestIngestWriter:
+    """Test buffered file and embedding writes."""
+
+    def test_files_flush_in_batches_with_doc_ids(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        writer = IngestWriter(db_path, chunk_flush_rows=4)
+
+        assert writer.replace_file("a.txt", ["a0", "a1"], 1.0) == []
+        written = writer.replace_file("b.txt", ["b0", "b1"], 2.0)
+        assert [(f.filename, f.chunks) for f in written] == [
+            ("a.txt", ["a0", "a1"]),
+            ("b.txt", ["b0", "b1"]),
+        ]
+        assert writer.transactions == 1
+
+        writer.add_embeddings(written[0].doc_ids, np.eye(2, 3, dtype=np.float32))
+        assert writer.flush_embeddings() == 2
+        assert writer.file_mtimes() == {"a.txt": 1.0, "b.txt": 2.0}
+
+        # Replacing a file drops its old chunks and embeddings together
+        writer.replace_file("a.txt", ["a0 v2"], 3.0)
+        (rewritten,) = writer.flush_files()
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        rows = conn.execute(
+            "SELECT d.id, d.content FROM file_chunks f JOIN documents d ON d.id = f.doc_id "
+            "WHERE f.filename = 'a.txt'"
+        ).fetchall()
+        assert rows == [(rewritten.doc_ids[0], "a0 v2")]
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 0
+        conn.close()
+
+    def test_identical_chunks_are_shared(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        core.init_db(db_path).close()
+        writer = IngestWriter(db_path)
+
+        writer.replace_file("a.txt", ["same", "a only", "same"], 1.0)
+        writer.replace_file("b.txt", ["same"], 1.0)
+        a, b = writer.flush_files()
+        assert a.doc_ids[0] == a.doc_ids[2] == b.doc_ids[0]
+        # Each distinct chunk is handed out for embedding once
+        assert (a.to_embed, b.to_embed) == ([0, 1], [])
+        writer.add_embeddings(a.doc_ids[:2], np.eye(2, 3, dtype=np.float32))
+        writer.flush_embeddings()
+
+        # Dropping the chunk from one file keeps it for the other
+        writer.replace_file("a.txt", ["a only"], 2.0)
+        (a,) = writer.flush_files()
+        assert a.to_embed == []
+        writer.replace_file("b.txt", ["new"], 2.0)
+        (b,) = writer.flush_files()
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        contents = [
+            r[0] for r in conn.execute("SELECT content FROM documents ORDER BY id")
+        ]
+        assert contents == ["a only", "new"]
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 1
+        conn.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])